@@ -0,0 +1,357 @@
+import os
+import json
+import mmap
+import struct
+import argparse
+import threading
+from problem import Problem
+from util import FileStore
+from typing import Dict, Iterator, List, Set
+
+
+# Append-only file of (key, value) records:
+#   MAGIC, then for every record: <key length: u32><value length: u32><key><value>
+# The index key -> (offset, length) of the value is rebuilt on open by walking the record headers,
+# a later record with the same key replaces the earlier one. Values are read through mmap.
+# A record cut short by a crash is ignored and overwritten by the next write.
+class PackedArchive:
+    MAGIC = b"AIBENCH-PACK-1\n"
+    HEADER = struct.Struct("<II")
+
+    class InvalidArchive(Exception):
+        def __init__(self, path: str):
+            self.message = f"File {path} is not a packed archive"
+            super().__init__(self.message)
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.index: Dict[str, tuple[int, int]] = {}
+        self.file = open(path, "a+b")
+        self.mmap: mmap.mmap | None = None
+        self.mapped_size = 0
+
+        self.file.seek(0, os.SEEK_END)
+        if self.file.tell() == 0:
+            self.file.write(PackedArchive.MAGIC)
+            self.file.flush()
+        self.end = self._build_index()
+        # drop a partially written record, if any
+        self.file.truncate(self.end)
+
+    def _remap(self) -> None:
+        size = os.fstat(self.file.fileno()).st_size
+        if self.mmap is not None and size == self.mapped_size:
+            return
+        if self.mmap is not None:
+            self.mmap.close()
+        self.mmap = mmap.mmap(self.file.fileno(), size, access=mmap.ACCESS_READ)
+        self.mapped_size = size
+
+    def _build_index(self) -> int:
+        self._remap()
+        data = self.mmap
+        if data[: len(PackedArchive.MAGIC)] != PackedArchive.MAGIC:
+            raise PackedArchive.InvalidArchive(self.path)
+        offset = len(PackedArchive.MAGIC)
+        while offset + PackedArchive.HEADER.size <= len(data):
+            key_length, value_length = PackedArchive.HEADER.unpack_from(data, offset)
+            key_offset = offset + PackedArchive.HEADER.size
+            value_offset = key_offset + key_length
+            if value_offset + value_length > len(data):
+                break
+            key = data[key_offset:value_offset].decode()
+            self.index[key] = (value_offset, value_length)
+            offset = value_offset + value_length
+        return offset
+
+    def write(self, key: str, value: bytes) -> None:
+        encoded_key = key.encode()
+        record = (
+            PackedArchive.HEADER.pack(len(encoded_key), len(value))
+            + encoded_key
+            + value
+        )
+        with self.lock:
+            self.file.seek(self.end)
+            self.file.write(record)
+            self.file.flush()
+            self.index[key] = (
+                self.end + PackedArchive.HEADER.size + len(encoded_key),
+                len(value),
+            )
+            self.end += len(record)
+
+    def read(self, key: str) -> bytes:
+        with self.lock:
+            offset, length = self.index[key]
+            if offset + length > self.mapped_size:
+                self._remap()
+            return self.mmap[offset : offset + length]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.index
+
+    def keys(self, prefix: str = "") -> List[str]:
+        with self.lock:
+            return [key for key in self.index if key.startswith(prefix)]
+
+    # streams (key, value) of the current records with the prefix, in the order they were written
+    def items(self, prefix: str = "") -> Iterator[tuple[str, bytes]]:
+        keys = sorted(self.keys(prefix), key=lambda key: self.index[key][0])
+        for key in keys:
+            yield key, self.read(key)
+
+    def close(self) -> None:
+        with self.lock:
+            if self.mmap is not None:
+                self.mmap.close()
+                self.mmap = None
+            self.file.close()
+
+
+# FileStore backed by packed archives. Paths are stored relative to the root directory of the problem.
+# Generated files of the problem are packed once into an archive shared by all runs, the archive of a run
+# keeps only the files written during the run (model outputs), which replace generated files of the same path.
+class PackedStore(FileStore):
+    DEFAULT_RUN = "run"
+    EXTENSION = ".pack"
+    # archive of the generated files, hidden so that it is not mistaken for the archive of a run
+    GENERATED_ARCHIVE = ".generated" + EXTENSION
+    # generated directories packed into the shared archive
+    PACKED_DIRS = ["in", "prompt_in", "out"]
+    # record of the hashes of the generated files the archive was filled with (see Problem.generate_prompts),
+    # not a file of the problem
+    GENERATION_KEY = "\0generation"
+
+    def __init__(
+        self,
+        root: str,
+        archive: PackedArchive,
+        generated: PackedArchive | None = None,
+    ):
+        self.root = root
+        self.archive = archive
+        self.generated = generated
+        self.lock = threading.Lock()
+        self.directories: Dict[str, Set[str]] = {}
+        for source in self.archives():
+            for key in source.keys():
+                if key != PackedStore.GENERATION_KEY:
+                    self._add_to_directory(key)
+
+    @staticmethod
+    def get_archive_path(problem_path: str, run: str = DEFAULT_RUN) -> str:
+        return os.path.join(problem_path, f"{run}{PackedStore.EXTENSION}")
+
+    # hashes of the generated files of the problem, recorded in its manifest
+    @staticmethod
+    def get_generation(problem_path: str) -> bytes:
+        files = Problem(problem_path).read_manifest().get("files", {})
+        return json.dumps(files, sort_keys=True).encode()
+
+    @staticmethod
+    def read_generation(archive: PackedArchive) -> bytes | None:
+        if PackedStore.GENERATION_KEY not in archive:
+            return None
+        return archive.read(PackedStore.GENERATION_KEY)
+
+    # opens the shared archive of the generated files, it is packed again when the problem is regenerated.
+    # A new archive is packed into a temporary file and moved into place, so that runs opening it
+    # concurrently never see it half-written
+    @staticmethod
+    def open_generated(problem_path: str) -> PackedArchive:
+        path = os.path.join(problem_path, PackedStore.GENERATED_ARCHIVE)
+        generation = PackedStore.get_generation(problem_path)
+        if os.path.exists(path):
+            archive = PackedArchive(path)
+            if PackedStore.read_generation(archive) == generation:
+                return archive
+            archive.close()
+
+        temporary_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        archive = PackedArchive(temporary_path)
+        PackedStore(problem_path, archive).pack_directories(
+            [Problem.dirs[dir_key] for dir_key in PackedStore.PACKED_DIRS]
+        )
+        archive.write(PackedStore.GENERATION_KEY, generation)
+        archive.close()
+        os.replace(temporary_path, path)
+        return PackedArchive(path)
+
+    # first free path for a stale archive of the run, {run}-stale-{i}.pack
+    @staticmethod
+    def get_stale_path(path: str) -> str:
+        name, extension = os.path.splitext(path)
+        i = 1
+        while os.path.exists(f"{name}-stale-{i}{extension}"):
+            i += 1
+        return f"{name}-stale-{i}{extension}"
+
+    # opens the archive of the run. An archive filled before the problem was regenerated holds outputs
+    # for other prompts, it is kept under a stale name (see get_stale_path) and the run starts a new one
+    @staticmethod
+    def open_run(problem_path: str, run: str = DEFAULT_RUN) -> "PackedStore":
+        generated = PackedStore.open_generated(problem_path)
+        generation = PackedStore.read_generation(generated)
+        path = PackedStore.get_archive_path(problem_path, run)
+        archive = PackedArchive(path)
+        if archive.keys() and PackedStore.read_generation(archive) != generation:
+            archive.close()
+            stale_path = PackedStore.get_stale_path(path)
+            os.rename(path, stale_path)
+            print(
+                f"Archive {path} was filled before the problem was regenerated, kept as {stale_path}"
+            )
+            archive = PackedArchive(path)
+        if not archive.keys():
+            archive.write(PackedStore.GENERATION_KEY, generation)
+        return PackedStore(problem_path, archive, generated)
+
+    # opens the archive of the run as it is, also a stale one. The generated files are read from the shared
+    # archive only if they are the ones the run was filled with
+    @staticmethod
+    def open_existing(problem_path: str, run: str = DEFAULT_RUN) -> "PackedStore":
+        archive = PackedArchive(PackedStore.get_archive_path(problem_path, run))
+        generated_path = os.path.join(problem_path, PackedStore.GENERATED_ARCHIVE)
+        generated = None
+        if os.path.exists(generated_path):
+            generated = PackedArchive(generated_path)
+            if PackedStore.read_generation(generated) != PackedStore.read_generation(
+                archive
+            ):
+                generated.close()
+                generated = None
+        return PackedStore(problem_path, archive, generated)
+
+    # archives read by the store, files written during the run come first
+    def archives(self) -> List[PackedArchive]:
+        return [self.archive] + ([self.generated] if self.generated else [])
+
+    # paths of all files of the store, relative to the root
+    def keys(self) -> List[str]:
+        with self.lock:
+            return [
+                os.path.join(directory, filename)
+                for directory, filenames in self.directories.items()
+                for filename in filenames
+            ]
+
+    def _key(self, path: str) -> str:
+        return os.path.relpath(path, self.root)
+
+    def _add_to_directory(self, key: str) -> None:
+        directory, filename = os.path.split(key)
+        with self.lock:
+            self.directories.setdefault(directory, set()).add(filename)
+
+    def listdir(self, directory: str) -> List[str]:
+        with self.lock:
+            return list(self.directories.get(self._key(directory), ()))
+
+    def exists(self, path: str) -> bool:
+        key = self._key(path)
+        with self.lock:
+            return (
+                any(key in archive for archive in self.archives())
+                or key in self.directories
+            )
+
+    def makedirs(self, directory: str) -> None:
+        with self.lock:
+            self.directories.setdefault(self._key(directory), set())
+
+    def read(self, path: str) -> str:
+        key = self._key(path)
+        for archive in self.archives():
+            if key in archive:
+                return archive.read(key).decode()
+        raise FileNotFoundError(path)
+
+    def write(self, path: str, content: str) -> None:
+        key = self._key(path)
+        self.archive.write(key, content.encode())
+        self._add_to_directory(key)
+
+    # copies files of the directories (relative to the root) into the archive
+    def pack_directories(self, directories: List[str]) -> None:
+        for directory in directories:
+            path = os.path.join(self.root, directory)
+            if not os.path.isdir(path):
+                continue
+            self.makedirs(path)
+            for filename in FileStore().listdir(path):
+                with open(os.path.join(path, filename), "r") as f:
+                    self.write(os.path.join(path, filename), f.read())
+
+    # writes every file of the store back to the directory layout
+    def export(self, destination: str | None = None) -> int:
+        destination = destination or self.root
+        exported = set()
+        # files of the run are written last, they replace generated files of the same path
+        for archive in reversed(self.archives()):
+            for key, value in archive.items():
+                if key == PackedStore.GENERATION_KEY:
+                    continue
+                path = os.path.join(destination, key)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "wb") as f:
+                    f.write(value)
+                exported.add(key)
+        return len(exported)
+
+    def close(self) -> None:
+        for archive in self.archives():
+            archive.close()
+
+
+# returns the store of the problem files, plain directories if run is None, otherwise the packed archive of the run
+def get_store(problem_path: str, run: str | None = None) -> FileStore:
+    return FileStore() if run is None else PackedStore.open_run(problem_path, run)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Pack problem files into a run archive or export an archive back to directories"
+    )
+    parser.add_argument("command", choices=["pack", "export"], help="Operation")
+    parser.add_argument(
+        "path", type=str, help="Path to problem or directory of problems"
+    )
+    parser.add_argument(
+        "--folder",
+        "-f",
+        action="store_true",
+        help="Path is the path to problems directory",
+    )
+    parser.add_argument(
+        "--run", type=str, help="Name of the run", default=PackedStore.DEFAULT_RUN
+    )
+    parser.add_argument(
+        "--output",
+        "-o",
+        type=str,
+        help="Directory to export a single problem into (defaults to the problem directory)",
+        default=None,
+    )
+
+    args = parser.parse_args()
+
+    problems = (
+        Problem.read_problems_from_dir(args.path)
+        if args.folder
+        else [Problem(args.path)]
+    )
+    for problem in problems:
+        if args.command == "pack":
+            store = PackedStore.open_run(problem.id, args.run)
+            print(f"PROBLEM {problem.id} PACKED: {len(store.keys())} files")
+        else:
+            store = PackedStore.open_existing(problem.id, args.run)
+            count = store.export(None if args.folder else args.output)
+            print(f"PROBLEM {problem.id} EXPORTED: {count} files")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+import os
+import json
+import argparse
+from problem import Problem
+from typing import Dict, List
+from util import create_additional_files, natural_sort_key, FileStore
+
+# Offline evaluation through the batch endpoints of the providers.
+# Requests are written in the OpenAI batch format, one chat completion request per prompt file:
+#   {"custom_id": ..., "method": "POST", "url": "/v1/chat/completions", "body": {...}}
+# and results are read from the matching output format:
+#   {"custom_id": ..., "response": {"status_code": 200, "body": {"choices": [...]}}, "error": null}
+# Outputs are kept in the namespace of the model and system prompt in model-out/ (see eval.get_namespace),
+# so that outputs of other models or runs are not taken for completions of the batch. The custom id records
+# the namespace and the completion indices requested for the prompt, only these are written on import:
+#   {problem path}::{namespace}::{prompt filename}::{index},{index},...
+
+# batch format of the files, models of other providers are refused (see registry.Backend.batch_format)
+BATCH_FORMAT = "openai"
+CUSTOM_ID_SEPARATOR = "::"
+BATCH_URL = "/v1/chat/completions"
+
+
+def make_custom_id(
+    problem_path: str, namespace: str, prompt_filename: str, indices: List[int]
+) -> str:
+    return CUSTOM_ID_SEPARATOR.join(
+        [problem_path, namespace, prompt_filename, ",".join(map(str, indices))]
+    )
+
+
+def parse_custom_id(custom_id: str) -> tuple[str, str, str, List[int]]:
+    problem_path, namespace, prompt_filename, indices = custom_id.rsplit(
+        CUSTOM_ID_SEPARATOR, 3
+    )
+    return problem_path, namespace, prompt_filename, list(map(int, indices.split(",")))
+
+
+# returns the indices of the completions of the prompt file which are not in the namespace of model-out/ yet
+def missing_completions(
+    problem_path: str, namespace: str, prompt_filename: str, num_tests: int
+) -> List[int]:
+    model_out_dir = Problem.get_model_out_dir(problem_path, namespace)
+    return [
+        i
+        for i, filename in enumerate(
+            create_additional_files(prompt_filename, num_tests)
+        )
+        if not os.path.exists(os.path.join(model_out_dir, filename))
+    ]
+
+
+# writes a request for every prompt which is missing some of its num_tests completions. Returns the number of requests.
+def export_batch(
+    problems: List[Problem],
+    model: str,
+    system_prompt: str,
+    namespace: str,
+    num_tests: int,
+    path: str,
+    temperature: float = 0.2,
+) -> int:
+    count = 0
+    with open(path, "w") as batch_file:
+        for problem in problems:
+            prompt_in_dir = os.path.join(problem.id, Problem.dirs["prompt_in"])
+            if not os.path.exists(prompt_in_dir):
+                raise Problem.PromptsNotGenerated(problem.id)
+
+            for prompt_filename in sorted(os.listdir(prompt_in_dir)):
+                missing = missing_completions(
+                    problem.id, namespace, prompt_filename, num_tests
+                )
+                if not missing:
+                    continue
+                with open(os.path.join(prompt_in_dir, prompt_filename), "r") as f:
+                    message = f.read()
+                request = {
+                    "custom_id": make_custom_id(
+                        problem.id, namespace, prompt_filename, missing
+                    ),
+                    "method": "POST",
+                    "url": BATCH_URL,
+                    "body": {
+                        "model": model,
+                        "messages": [
+                            {"role": "system", "content": system_prompt},
+                            {"role": "user", "content": message},
+                        ],
+                        "temperature": temperature,
+                        "n": len(missing),
+                    },
+                }
+                batch_file.write(json.dumps(request) + "\n")
+                count += 1
+    return count
+
+
+# writes completions from the results file into the namespace of model-out/ directories.
+# Completions fill the indices requested by the export in order. Raises ValueError for results of another namespace.
+# Returns the number of written completions per problem.
+def import_batch(path: str, namespace: str) -> Dict[str, int]:
+    imported: Dict[str, int] = {}
+    with open(path, "r") as results_file:
+        for line in results_file:
+            if not line.strip():
+                continue
+            result = json.loads(line)
+            problem_path, result_namespace, prompt_filename, indices = parse_custom_id(
+                result["custom_id"]
+            )
+            if result_namespace != namespace:
+                raise ValueError(
+                    f"Request {result['custom_id']} was exported for {result_namespace}, not {namespace}"
+                )
+            response = result.get("response") or {}
+            if result.get("error") or response.get("status_code", 200) != 200:
+                print(f"Request {result['custom_id']} failed: {result.get('error')}")
+                continue
+
+            contents = [
+                choice["message"]["content"] for choice in response["body"]["choices"]
+            ]
+            filenames = create_additional_files(prompt_filename, max(indices) + 1)
+
+            model_out_dir = Problem.get_model_out_dir(problem_path, namespace)
+            store = FileStore()
+            store.makedirs(model_out_dir)
+            for index, content in zip(indices, contents):
+                store.write(os.path.join(model_out_dir, filenames[index]), content)
+            imported[problem_path] = imported.get(problem_path, 0) + min(
+                len(indices), len(contents)
+            )
+    return imported
+
+
+# returns prompt filename -> solution output of the problem, prompts and outputs are matched in sorted order
+def read_expected_outputs(problem_path: str) -> Dict[str, str]:
+    prompt_in_dir = os.path.join(problem_path, Problem.dirs["prompt_in"])
+    solution_out_dir = os.path.join(problem_path, Problem.dirs["out"])
+    expected = {}
+    for prompt_filename, solution_out_filename in zip(
+        sorted(os.listdir(prompt_in_dir), key=natural_sort_key),
+        sorted(os.listdir(solution_out_dir), key=natural_sort_key),
+    ):
+        with open(os.path.join(solution_out_dir, solution_out_filename), "r") as f:
+            expected[prompt_filename] = f.read()
+    return expected
+
+
+# Local stand-in for a provider batch endpoint. Answers every request of the requests file
+# with a constant or, with oracle set, with the expected solution output, and writes the results file.
+def respond_to_batch(
+    requests_path: str, results_path: str, answer: str = "0", oracle: bool = False
+) -> int:
+    expected: Dict[str, Dict[str, str]] = {}
+    count = 0
+    with open(requests_path, "r") as requests_file, open(
+        results_path, "w"
+    ) as results_file:
+        for line in requests_file:
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            problem_path, _, prompt_filename, _ = parse_custom_id(request["custom_id"])
+            if oracle and problem_path not in expected:
+                expected[problem_path] = read_expected_outputs(problem_path)
+            content = (
+                expected[problem_path][prompt_filename].strip() if oracle else answer
+            )
+            result = {
+                "custom_id": request["custom_id"],
+                "response": {
+                    "status_code": 200,
+                    "body": {
+                        "model": request["body"]["model"],
+                        "choices": [
+                            {
+                                "index": i,
+                                "message": {"role": "assistant", "content": content},
+                            }
+                            for i in range(request["body"].get("n", 1))
+                        ],
+                    },
+                },
+                "error": None,
+            }
+            results_file.write(json.dumps(result) + "\n")
+            count += 1
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Local stand-in for a provider batch endpoint. Turns a batch requests file into a batch results file."
+    )
+    parser.add_argument("requests", type=str, help="Path to batch requests JSONL")
+    parser.add_argument("results", type=str, help="Path to write batch results JSONL")
+    parser.add_argument(
+        "--answer", type=str, help="Answer to every request", default="0"
+    )
+    parser.add_argument(
+        "--oracle",
+        action="store_true",
+        help="Answer with the expected solution outputs instead of a constant",
+    )
+
+    args = parser.parse_args()
+
+    count = respond_to_batch(args.requests, args.results, args.answer, args.oracle)
+    print(f"Answered {count} requests")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,389 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import resource
+import contextlib
+from eval import score_test
+from problem import Problem
+from print_results import print_results_for_problem
+from util import process_files, create_additional_files
+from typing import Callable, Dict, List
+
+# Benchmark of the pipeline on synthetic tasks. Run from the tasks/ directory, like gen.py and eval.py:
+#   python3 ../bench.py --problems 50 --tests 100 --size 1000 --output bench.json --baseline baseline.json
+# Every task asks for the sum of a list of `size` random integers.
+
+BENCH_TASKS_DIR = "bench-tasks"
+STAGES = [
+    "compile",
+    "generate_tests",
+    "generate_solutions",
+    "render_prompts",
+    "process_files",
+    "score",
+    "print_results",
+]
+
+GEN_SOURCE = """#include <algorithm>
+#include <cmath>
+#include <fstream>
+#include <iostream>
+#include <random>
+#include <string>
+#include <sys/stat.h>
+
+// synthetic task generated by bench.py, parameter size=X scales the number of values by X
+const int TESTS = @TESTS@;
+const int SIZE = @SIZE@;
+
+int main(int argc, char *argv[]) {
+    unsigned seed;
+    std::cin >> seed;
+    double scale = 1;
+    for (int i = 1; i < argc; i++) {
+        std::string argument = argv[i];
+        if (argument.rfind("size=", 0) == 0) {
+            scale = std::stod(argument.substr(5));
+        }
+    }
+    const int size = std::max(1, static_cast<int>(std::lround(SIZE * scale)));
+    std::mt19937 rng(seed * 1000003u + @INDEX@u);
+    mkdir("in", 0755);
+    mkdir("solution-in", 0755);
+    for (int test = 0; test < TESTS; test++) {
+        std::ofstream prompt_in("in/" + std::to_string(test) + ".in");
+        std::ofstream solution_in("solution-in/" + std::to_string(test) + ".in");
+        prompt_in << "{";
+        solution_in << size << "\\n";
+        for (int i = 0; i < size; i++) {
+            unsigned value = static_cast<unsigned>(rng() % 1000u);
+            prompt_in << (i ? ", " : "") << value;
+            solution_in << value << (i + 1 < size ? " " : "\\n");
+        }
+        prompt_in << "}\\n";
+    }
+}
+"""
+
+SOLUTION_SOURCE = """#include <iostream>
+
+int main() {
+    int size;
+    std::cin >> size;
+    long long sum = 0;
+    for (int i = 0; i < size; i++) {
+        long long value;
+        std::cin >> value;
+        sum += value;
+    }
+    std::cout << sum << "\\n";
+}
+"""
+
+# solution answering all tests of a problem in a single run (flag --batch-protocol)
+BATCH_SOLUTION_SOURCE = """#include <cstring>
+#include <iostream>
+#include <sstream>
+#include <string>
+
+// AI_BENCH_BATCH_PROTOCOL: run with --batch, the solution reads the number of tests and then
+// every test preceded by its length in bytes, and prints one answer per line
+long long solve(std::istream &in) {
+    int size;
+    in >> size;
+    long long sum = 0;
+    for (int i = 0; i < size; i++) {
+        long long value;
+        in >> value;
+        sum += value;
+    }
+    return sum;
+}
+
+int main(int argc, char *argv[]) {
+    if (argc > 1 && std::strcmp(argv[1], "--batch") == 0) {
+        int tests;
+        std::cin >> tests;
+        for (int test = 0; test < tests; test++) {
+            std::streamsize length;
+            std::cin >> length;
+            // the newline after the length
+            std::cin.get();
+            std::string input(static_cast<std::size_t>(length), '\\0');
+            std::cin.read(&input[0], length);
+            std::istringstream test_in(input);
+            std::cout << solve(test_in) << "\\n";
+        }
+        return 0;
+    }
+    std::cout << solve(std::cin) << "\\n";
+}
+"""
+
+STATEMENT = """```cpp
+long long sum(const vector<int> &values) {
+    long long result = 0;
+    for (int value : values) {
+        result += value;
+    }
+    return result;
+}
+
+assert(sum(@IN_1) == @ANS);
+```
+"""
+
+
+# writes `problems` synthetic tasks into the directory, replacing the previous ones.
+# With batch_protocol set, their solutions answer all tests in a single run
+def generate_bench_tasks(
+    directory: str, problems: int, tests: int, size: int, batch_protocol: bool = False
+) -> None:
+    shutil.rmtree(directory, ignore_errors=True)
+    for index in range(problems):
+        problem_path = os.path.join(directory, f"bench-{index}")
+        os.makedirs(problem_path)
+        sources = {
+            Problem.INGEN_SOURCE: GEN_SOURCE.replace("@TESTS@", str(tests))
+            .replace("@SIZE@", str(size))
+            .replace("@INDEX@", str(index)),
+            Problem.SOLUTION_SOURCE: (
+                BATCH_SOLUTION_SOURCE if batch_protocol else SOLUTION_SOURCE
+            ),
+            "problem-statement.md": STATEMENT,
+        }
+        for filename, content in sources.items():
+            with open(os.path.join(problem_path, filename), "w") as f:
+                f.write(content)
+
+
+# removes executables and cmake objects of the problems, so that compilation is measured from scratch
+def clean_build(problems: List[Problem]) -> None:
+    for problem in problems:
+        shutil.rmtree(os.path.join(problem.id, "bin"), ignore_errors=True)
+        for target, _, _ in Problem.get_build_targets(problem.id):
+            shutil.rmtree(
+                os.path.join("CMakeFiles", f"{target}.dir"), ignore_errors=True
+            )
+
+
+# answers of a simulated model: the first completion of every prompt is wrong, the others are correct,
+# so the accuracy of a correctly scored run is (completions - 1) / completions
+def simulate_completions(prompt: str, completions: int) -> List[str]:
+    values = prompt[prompt.rindex("{") + 1 : prompt.rindex("}")].split(",")
+    answer = sum(int(value) for value in values)
+    return [f"The answer is {answer + 1}"] + [f"The sum is\n{answer}"] * (
+        completions - 1
+    )
+
+
+# returns the result of the function
+def time_stage(
+    timings: Dict[str, float], stage: str, function: Callable[[], object]
+) -> object:
+    start = time.perf_counter()
+    result = function()
+    timings[stage] = time.perf_counter() - start
+    return result
+
+
+# returns the time of every stage and the accuracy of the simulated answers
+def run_benchmark(
+    problems: List[Problem], seed: int, completions: int, parallel: int
+) -> tuple[Dict[str, float], float]:
+    timings: Dict[str, float] = {}
+    scores = []
+    problem_ids = [problem.id for problem in problems]
+
+    clean_build(problems)
+    if not time_stage(
+        timings, "compile", lambda: Problem.compile_cpp(problem_ids, parallel)
+    ):
+        sys.exit("Benchmark aborted, the synthetic tasks did not compile")
+    time_stage(
+        timings,
+        "generate_tests",
+        lambda: [problem.generate_tests(seed) for problem in problems],
+    )
+    time_stage(
+        timings,
+        "generate_solutions",
+        lambda: [problem.generate_solution_files(parallel) for problem in problems],
+    )
+    time_stage(
+        timings,
+        "render_prompts",
+        lambda: [problem.generate_prompt_files() for problem in problems],
+    )
+
+    def write_model_outputs() -> None:
+        for problem in problems:
+            process_files(
+                input_dir=os.path.join(problem.id, Problem.dirs["prompt_in"]),
+                output_dir=Problem.get_model_out_dir(problem.id),
+                modify_content=lambda prompt: simulate_completions(prompt, completions),
+                modify_filename=lambda filename: create_additional_files(
+                    filename, completions
+                ),
+            )
+
+    time_stage(timings, "process_files", write_model_outputs)
+    time_stage(
+        timings,
+        "score",
+        lambda: scores.extend(
+            score_test(problem.id, completions) for problem in problems
+        ),
+    )
+
+    def print_all_results() -> None:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            for problem in problems:
+                print_results_for_problem(problem.id)
+
+    time_stage(timings, "print_results", print_all_results)
+    correct = sum(score for _, score, _ in scores)
+    total = sum(total for _, _, total in scores)
+    return timings, correct / total if total else 0.0
+
+
+# prints the stages of the run compared with the baseline, returns the stages slower than the baseline by more than tolerance
+def compare_with_baseline(
+    timings: Dict[str, float], baseline: Dict[str, float], tolerance: float
+) -> List[str]:
+    regressions = []
+    print(f"{'STAGE':<20}{'BASELINE':>12}{'CURRENT':>12}{'RATIO':>8}")
+    for stage in STAGES:
+        if stage not in timings or stage not in baseline:
+            continue
+        ratio = timings[stage] / baseline[stage] if baseline[stage] else float("inf")
+        if ratio > 1 + tolerance:
+            regressions.append(stage)
+        print(
+            f"{stage:<20}{baseline[stage]:>11.3f}s{timings[stage]:>11.3f}s{ratio:>8.2f}"
+            + (" REGRESSION" if stage in regressions else "")
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the stages of the pipeline on synthetic tasks. Run from the tasks directory."
+    )
+    parser.add_argument(
+        "--problems", "-p", type=int, help="Number of problems", default=20
+    )
+    parser.add_argument(
+        "--tests", "-t", type=int, help="Number of tests per problem", default=20
+    )
+    parser.add_argument(
+        "--size",
+        type=int,
+        help="Number of integers in the input of every test",
+        default=100,
+    )
+    parser.add_argument(
+        "--completions",
+        "-c",
+        type=int,
+        help="Number of simulated model completions per prompt",
+        default=5,
+    )
+    parser.add_argument(
+        "--parallel",
+        "-j",
+        type=int,
+        help="Number of cpus to use for compilation and solutions",
+        default=1,
+    )
+    parser.add_argument("--seed", type=int, help="Seed of the tests", default=1)
+    parser.add_argument(
+        "--output",
+        "-o",
+        type=str,
+        help="Path to write the results JSON",
+        default="bench.json",
+    )
+    parser.add_argument(
+        "--baseline",
+        type=str,
+        help="Path to results JSON of an earlier run to compare with",
+        default=None,
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        help="Relative slowdown of a stage against the baseline reported as a regression",
+        default=0.2,
+    )
+    parser.add_argument(
+        "--batch-protocol",
+        action="store_true",
+        help="Solutions answer all tests of a problem in a single run (see the solution batch protocol in README.md)",
+    )
+    parser.add_argument(
+        "--keep",
+        action="store_true",
+        help=f"Keep the generated tasks in {BENCH_TASKS_DIR}/",
+    )
+
+    args = parser.parse_args()
+
+    generate_bench_tasks(
+        BENCH_TASKS_DIR, args.problems, args.tests, args.size, args.batch_protocol
+    )
+    problems = Problem.read_problems_from_dir(BENCH_TASKS_DIR)
+    try:
+        timings, accuracy = run_benchmark(
+            problems, args.seed, args.completions, args.parallel
+        )
+    finally:
+        if not args.keep:
+            shutil.rmtree(BENCH_TASKS_DIR, ignore_errors=True)
+
+    results = {
+        "config": {
+            "problems": args.problems,
+            "tests": args.tests,
+            "size": args.size,
+            "completions": args.completions,
+            "parallel": args.parallel,
+            "seed": args.seed,
+            "batch_protocol": args.batch_protocol,
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "timestamp": time.time(),
+        "stages": timings,
+        # (completions - 1) / completions unless scoring pairs outputs with wrong tests
+        "accuracy": accuracy,
+        # max resident set size of the benchmark in KiB
+        "max_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    for stage in STAGES:
+        print(f"STAGE {stage} TIME: {timings[stage]:.3f}s")
+    print(f"ACCURACY: {accuracy:.3f}")
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        if baseline.get("config") != results["config"]:
+            print("Baseline was run with a different configuration")
+        regressions = compare_with_baseline(timings, baseline["stages"], args.tolerance)
+        if regressions:
+            print(f"Regressions: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from chat import Chat
+from journal import Journal
+from typing import List
+
+
+# Disk-backed store of model completions.
+# A completion is addressed by the model name, the system prompt, the temperature,
+# the hash of the prompt and the index of the completion.
+class ResponseCache:
+    DEFAULT_PATH = ".cache/completions.sqlite3"
+    DEFAULT_MAX_SIZE = 512 * 1024 * 1024
+
+    def __init__(self, path: str = DEFAULT_PATH, max_size: int = DEFAULT_MAX_SIZE):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("""CREATE TABLE IF NOT EXISTS completions (
+                key TEXT NOT NULL,
+                completion_index INTEGER NOT NULL,
+                content TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (key, completion_index)
+            )""")
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS completions_last_access ON completions (last_access)"
+        )
+        self.connection.commit()
+
+    # completions cut off by a stop pattern are kept apart from the full ones
+    @staticmethod
+    def make_key(
+        model: str,
+        system_prompt: str,
+        temperature: float,
+        message: str,
+        stop_pattern: str | None = None,
+    ) -> str:
+        prompt_hash = hashlib.sha256(message.encode()).hexdigest()
+        system_prompt_hash = hashlib.sha256(system_prompt.encode()).hexdigest()
+        if stop_pattern is not None:
+            stop_hash = hashlib.sha256(stop_pattern.encode()).hexdigest()
+            return f"{model}:{system_prompt_hash}:{temperature!r}:{stop_hash}:{prompt_hash}"
+        return f"{model}:{system_prompt_hash}:{temperature!r}:{prompt_hash}"
+
+    # returns a dictionary completion_index -> content of the cached completions with indices in range(completions)
+    def get(self, key: str, completions: int) -> dict[int, str]:
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT completion_index, content FROM completions WHERE key = ? AND completion_index < ?",
+                (key, completions),
+            ).fetchall()
+            if rows:
+                self.connection.execute(
+                    "UPDATE completions SET last_access = ? WHERE key = ? AND completion_index < ?",
+                    (time.time(), key, completions),
+                )
+                self.connection.commit()
+        return dict(rows)
+
+    def put(self, key: str, contents: dict[int, str]) -> None:
+        now = time.time()
+        with self.lock:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO completions VALUES (?, ?, ?, ?, ?)",
+                [
+                    (key, index, content, len(content.encode()), now)
+                    for index, content in contents.items()
+                ],
+            )
+            self.connection.commit()
+            self._evict()
+
+    def size(self) -> int:
+        return self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM completions"
+        ).fetchone()[0]
+
+    # removes least recently used completions until the cache fits in max_size
+    def _evict(self) -> None:
+        excess = self.size() - self.max_size
+        if excess <= 0:
+            return
+        freed = 0
+        evicted = []
+        for key, index, size in self.connection.execute(
+            "SELECT key, completion_index, size FROM completions ORDER BY last_access"
+        ):
+            if freed >= excess:
+                break
+            evicted.append((key, index))
+            freed += size
+        self.connection.executemany(
+            "DELETE FROM completions WHERE key = ? AND completion_index = ?", evicted
+        )
+        self.connection.commit()
+
+
+# Chat which serves completions from the cache and asks the wrapped chat only for the missing ones.
+# With refresh set, completions cached before this chat was created are ignored, but the new ones are still stored.
+# With journal set, fetched completions are also written to the journal, and completions already
+# in the journal (of a resumed run) are served from it before the cache.
+class CachedChat(Chat):
+    def __init__(
+        self,
+        chat: Chat,
+        cache: ResponseCache,
+        refresh: bool = False,
+        journal: Journal | None = None,
+    ):
+        self.chat = chat
+        self.cache = cache
+        self.refresh = refresh
+        self.journal = journal
+        # indices of the completions fetched by this chat, they are served from the cache even with refresh set
+        self.fetched: dict[str, set[int]] = {}
+        self.client = chat.client
+        self.model = chat.model
+        self.system_prompt = chat.system_prompt
+        self.PROVIDER = chat.PROVIDER
+        self.stop_rule = chat.stop_rule
+
+    def _lookup(
+        self, message: str, completions: int, temperature: float
+    ) -> tuple[str, dict[int, str], List[int]]:
+        key = ResponseCache.make_key(
+            self.model,
+            self.system_prompt,
+            temperature,
+            message,
+            self.stop_rule.pattern if self.stop_rule is not None else None,
+        )
+        cached = self.cache.get(key, completions)
+        if self.refresh:
+            fetched = self.fetched.get(key, set())
+            cached = {i: content for i, content in cached.items() if i in fetched}
+        if self.journal is not None:
+            cached.update(self.journal.get(key, completions))
+        missing = [i for i in range(completions) if i not in cached]
+        return key, cached, missing
+
+    def _merge(
+        self,
+        key: str,
+        cached: dict[int, str],
+        missing: List[int],
+        responses: List[str],
+    ) -> List[str]:
+        fetched = dict(zip(missing, responses))
+        if fetched:
+            self.cache.put(key, fetched)
+            self.fetched.setdefault(key, set()).update(fetched)
+            if self.journal is not None:
+                self.journal.append(key, fetched)
+        cached.update(fetched)
+        return [cached[i] for i in sorted(cached)]
+
+    def prompt(
+        self, message: str, completions: int = 1, temperature: float = 0.2
+    ) -> List[str]:
+        key, cached, missing = self._lookup(message, completions, temperature)
+        responses = (
+            self.chat.prompt(message, len(missing), temperature=temperature)
+            if missing
+            else []
+        )
+        return self._merge(key, cached, missing, responses)
+
+    async def aprompt(
+        self, message: str, completions: int = 1, temperature: float = 0.2
+    ) -> List[str]:
+        key, cached, missing = self._lookup(message, completions, temperature)
+        responses = (
+            await self.chat.aprompt(message, len(missing), temperature=temperature)
+            if missing
+            else []
+        )
+        return self._merge(key, cached, missing, responses)
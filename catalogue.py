@@ -0,0 +1,250 @@
+import os
+import json
+import fnmatch
+import argparse
+from problem import Problem
+from dataclasses import dataclass
+from typing import Dict, Iterator, List
+
+# Catalogue of problems: a JSONL file of Problem.to_dict records (statement and sources, as problems.jsonl)
+# with an index {path}.idx of the byte offset, length and tags of every record by id.
+# Selecting problems reads only the index, a problem is parsed when it is accessed, and it can be
+# written out into a task folder on demand. The index is rebuilt when the JSONL file changes.
+#   python3 ../catalogue.py build ../catalogue.jsonl --from assert-tasks
+#   python3 ../catalogue.py materialize ../catalogue.jsonl --tag graphs --glob '*/graph-*'
+
+
+@dataclass
+class IndexEntry:
+    id: str
+    offset: int
+    length: int
+    tags: List[str]
+
+
+class Catalogue:
+    INDEX_SUFFIX = ".idx"
+    # tasks directory of materialized problems, built by tasks/CMakeLists.txt
+    DEFAULT_TASKS_DIR = "catalogue-tasks"
+
+    def __init__(self, path: str):
+        self.path = path
+        self.index_path = path + Catalogue.INDEX_SUFFIX
+        self.entries: Dict[str, IndexEntry] = {}
+        if not self._load_index():
+            self._build_index()
+
+    # size and modification time of the JSONL file the index was built for
+    def _data_version(self) -> List[int]:
+        stat = os.stat(self.path)
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def _load_index(self) -> bool:
+        if not os.path.exists(self.index_path):
+            return False
+        with open(self.index_path, "r") as f:
+            index = json.load(f)
+        if index["data"] != self._data_version():
+            return False
+        self.entries = {entry[0]: IndexEntry(*entry) for entry in index["entries"]}
+        return True
+
+    # reads every record once, to find its offset, id and tags
+    def _build_index(self) -> None:
+        self.entries = {}
+        with open(self.path, "rb") as f:
+            offset = 0
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    self.entries[record["id"]] = IndexEntry(
+                        record["id"], offset, len(line), record.get("tags", [])
+                    )
+                offset += len(line)
+        self._write_index()
+
+    def _write_index(self) -> None:
+        index = {
+            "data": self._data_version(),
+            "entries": [
+                [entry.id, entry.offset, entry.length, entry.tags]
+                for entry in self.entries.values()
+            ],
+        }
+        with open(self.index_path, "w") as f:
+            json.dump(index, f)
+
+    # writes the problems (statements and sources) into a new catalogue
+    @staticmethod
+    def write(problems: List[Problem], path: str) -> "Catalogue":
+        Problem.write_problems_to_jsonl_file(problems, path)
+        return Catalogue(path)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, id: str) -> bool:
+        return id in self.entries
+
+    def ids(self) -> List[str]:
+        return list(self.entries)
+
+    # ids of the problems with any of the tags and an id matching the glob pattern
+    def select(
+        self, tags: List[str] | None = None, pattern: str | None = None
+    ) -> List[str]:
+        return [
+            entry.id
+            for entry in self.entries.values()
+            if (not tags or any(tag in entry.tags for tag in tags))
+            and (pattern is None or fnmatch.fnmatchcase(entry.id, pattern))
+        ]
+
+    def get(self, id: str) -> Problem:
+        entry = self.entries[id]
+        with open(self.path, "rb") as f:
+            f.seek(entry.offset)
+            return Problem.from_dict(json.loads(f.read(entry.length)))
+
+    # problems with the ids (every problem if None) one at a time, in the order of the file
+    def iterate(self, ids: List[str] | None = None) -> Iterator[Problem]:
+        entries = sorted(
+            (
+                (self.entries[id] for id in ids)
+                if ids is not None
+                else self.entries.values()
+            ),
+            key=lambda entry: entry.offset,
+        )
+        with open(self.path, "rb") as f:
+            for entry in entries:
+                f.seek(entry.offset)
+                yield Problem.from_dict(json.loads(f.read(entry.length)))
+
+    def __iter__(self) -> Iterator[Problem]:
+        return self.iterate()
+
+    # writes the statement and sources of the problem into a task folder {tasks_dir}/{problem name},
+    # returns the problem read from the folder
+    def materialize(self, id: str, tasks_dir: str = DEFAULT_TASKS_DIR) -> Problem:
+        return materialize(self.get(id), tasks_dir)
+
+
+# tasks directories next to tasks_dir with a problem of the name, e.g. the problem the catalogue was built from
+def find_other_problems(name: str, tasks_dir: str) -> List[str]:
+    parent = os.path.dirname(os.path.abspath(tasks_dir))
+    return [
+        os.path.join(entry, name)
+        for entry in sorted(os.listdir(parent))
+        if os.path.join(parent, entry) != os.path.abspath(tasks_dir)
+        and os.path.exists(os.path.join(parent, entry, name, "problem-statement.md"))
+    ]
+
+
+# problems are identified by their name in shards, the simulator and the results,
+# so a problem is not materialized under the name of a problem of another tasks directory
+def materialize(
+    problem: Problem, tasks_dir: str = Catalogue.DEFAULT_TASKS_DIR
+) -> Problem:
+    name = Problem.get_problem_name_from_path(problem.id)
+    others = find_other_problems(name, tasks_dir)
+    if others:
+        raise ValueError(
+            f"Problem {problem.id} can not be materialized into {tasks_dir}, {', '.join(others)} has the same name"
+        )
+    folder = os.path.join(tasks_dir, name)
+    os.makedirs(folder, exist_ok=True)
+    files = {
+        "problem-statement.md": problem.statement,
+        Problem.INGEN_SOURCE: problem.ingen,
+        Problem.SOLUTION_SOURCE: problem.solution,
+    }
+    for filename, content in files.items():
+        if content is None:
+            raise ValueError(f"Problem {problem.id} has no {filename}")
+        with open(os.path.join(folder, filename), "w") as f:
+            f.write(content)
+    return Problem(folder)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build a problem catalogue from task folders, or list and materialize its problems"
+    )
+    parser.add_argument(
+        "command",
+        choices=["build", "list", "materialize"],
+        help="build - write the problems of --from into the catalogue, list - print ids of the selected problems, materialize - write the selected problems into task folders",
+    )
+    parser.add_argument("path", type=str, help="Path to the catalogue JSONL file")
+    parser.add_argument(
+        "--from",
+        dest="source",
+        type=str,
+        help="Directory of problems written into the catalogue (build)",
+        default=None,
+    )
+    parser.add_argument(
+        "--categories",
+        type=str,
+        help="JSON object mapping problems to a category, stored as their tag (build)",
+        default=None,
+    )
+    parser.add_argument(
+        "--tag",
+        type=str,
+        nargs="+",
+        help="Select problems with any of the tags",
+        default=None,
+    )
+    parser.add_argument(
+        "--glob",
+        type=str,
+        help="Select problems with ids matching the pattern",
+        default=None,
+    )
+    parser.add_argument(
+        "--tasks-dir",
+        type=str,
+        help="Directory of the materialized task folders, run from the tasks directory to build them with CMakeLists.txt",
+        default=Catalogue.DEFAULT_TASKS_DIR,
+    )
+
+    args = parser.parse_args()
+
+    match args.command:
+        case "build":
+            if args.source is None:
+                parser.error("build needs --from")
+            problems = Problem.read_problems_from_dir(args.source)
+            if args.categories:
+                with open(args.categories, "r") as f:
+                    categories = json.load(f)
+                for problem in problems:
+                    category = categories.get(
+                        problem.id,
+                        categories.get(Problem.get_problem_name_from_path(problem.id)),
+                    )
+                    problem.tags = [category] if category else []
+            catalogue = Catalogue.write(problems, args.path)
+            print(f"Catalogue {args.path} with {len(catalogue)} problems")
+        case "list":
+            catalogue = Catalogue(args.path)
+            for id in catalogue.select(args.tag, args.glob):
+                print(id)
+        case "materialize":
+            catalogue = Catalogue(args.path)
+            ids = catalogue.select(args.tag, args.glob)
+            # nothing is written if any of the problems is refused
+            for id in ids:
+                name = Problem.get_problem_name_from_path(id)
+                if others := find_other_problems(name, args.tasks_dir):
+                    parser.error(
+                        f"Problem {id} can not be materialized into {args.tasks_dir}, {', '.join(others)} has the same name"
+                    )
+            for problem in catalogue.iterate(ids):
+                print(materialize(problem, args.tasks_dir).id)
+
+
+if __name__ == "__main__":
+    main()
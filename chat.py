@@ -1,8 +1,32 @@
+import asyncio
+import contextvars
 from abc import ABC, abstractmethod
 from typing import List
+from concurrent.futures import ThreadPoolExecutor
+
+
+# raised by fan_out when some of the requests failed, carries the completions of the requests which succeeded
+# so that only the failed ones are requested again (see rate_limit.RateLimitedChat)
+class PartialCompletions(Exception):
+    def __init__(self, completions: List[str], error: BaseException):
+        self.completions = completions
+        self.error = error
+        super().__init__(
+            f"{len(completions)} completions received, a request failed with {error!r}"
+        )
 
 
 class Chat(ABC):
+    # name of the provider, chats of the same provider share its rate limits
+    PROVIDER = ""
+    # exceptions raised by the provider when a rate limit is exceeded
+    RATE_LIMIT_ERRORS: tuple = ()
+    # max number of completions returned by a single request to the provider, None if unlimited.
+    # Providers with a limit generate more completions with fan_out, one request per completion
+    NATIVE_COMPLETIONS: int | None = None
+    # if set (streaming.StopRule), completions are streamed and cut off once their answer is settled
+    stop_rule = None
+
     @abstractmethod
     def __init__(self, model: str, system_prompt: str):
         self.client = None
@@ -19,3 +43,87 @@ class Chat(ABC):
         :return: The response from the virtual assistant.
         """
         pass
+
+    async def aprompt(self, message: str, completions: int = 1, **kwargs) -> List[str]:
+        """
+        Asynchronous counterpart of `prompt`. Providers with an async client should override it,
+        the default implementation runs `prompt` in a worker thread.
+
+        :param message: The message to prompt the virtual assistant with.
+        :param completions: Number of completions to generate.
+        :return: The response from the virtual assistant.
+        """
+        return await asyncio.to_thread(self.prompt, message, completions, **kwargs)
+
+    def prompt_one(self, message: str, **kwargs) -> str:
+        """
+        Single completion of the message, used by `fan_out`. Providers whose `prompt` fans out
+        (no native support for multiple completions per request) must override it.
+
+        :param message: The message to prompt the virtual assistant with.
+        :return: The response from the virtual assistant.
+        """
+        return self.prompt(message, 1, **kwargs)[0]
+
+    async def aprompt_one(self, message: str, **kwargs) -> str:
+        """
+        Asynchronous counterpart of `prompt_one`, used by `afan_out`.
+
+        :param message: The message to prompt the virtual assistant with.
+        :return: The response from the virtual assistant.
+        """
+        return await asyncio.to_thread(self.prompt_one, message, **kwargs)
+
+    def fan_out(self, message: str, completions: int = 1, **kwargs) -> List[str]:
+        """
+        Generates the completions with concurrent `prompt_one` requests, each of them retried on its own.
+        If any request fails, raises PartialCompletions with the completions of the others.
+
+        :param message: The message to prompt the virtual assistant with.
+        :param completions: Number of completions to generate.
+        :return: The responses in the order of the requests.
+        """
+        if completions == 1:
+            return Chat.gather_completions([self._try_prompt_one(message, **kwargs)])
+        with ThreadPoolExecutor(max_workers=completions) as executor:
+            # every request runs in a copy of the caller's context (telemetry of the call)
+            futures = [
+                executor.submit(
+                    contextvars.copy_context().run,
+                    self._try_prompt_one,
+                    message,
+                    **kwargs,
+                )
+                for _ in range(completions)
+            ]
+            return Chat.gather_completions([future.result() for future in futures])
+
+    async def afan_out(self, message: str, completions: int = 1, **kwargs) -> List[str]:
+        """
+        Asynchronous counterpart of `fan_out`.
+
+        :param message: The message to prompt the virtual assistant with.
+        :param completions: Number of completions to generate.
+        :return: The responses in the order of the requests.
+        """
+        return Chat.gather_completions(
+            await asyncio.gather(
+                *(self.aprompt_one(message, **kwargs) for _ in range(completions)),
+                return_exceptions=True,
+            )
+        )
+
+    def _try_prompt_one(self, message: str, **kwargs) -> str | Exception:
+        try:
+            return self.prompt_one(message, **kwargs)
+        except Exception as e:
+            return e
+
+    # completions of fanned out requests, raises PartialCompletions if any of them failed
+    @staticmethod
+    def gather_completions(results: List[str | BaseException]) -> List[str]:
+        completions = [result for result in results if isinstance(result, str)]
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            raise PartialCompletions(completions, errors[0])
+        return completions
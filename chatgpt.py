@@ -1,27 +1,118 @@
+import telemetry
 from chat import Chat
+from streaming import StreamedCompletion, record_estimated_usage
 from dotenv import load_dotenv
 import openai
-from google.api_core import retry
+from google.api_core import retry, retry_async
 from typing import List
 import time
 import os
 
 
+def is_transient_error(exception: Exception) -> bool:
+    return isinstance(
+        exception, (openai.APIConnectionError, openai.InternalServerError)
+    )
+
+
 class ChatGPT(Chat):
+    PROVIDER = "openai"
+    RATE_LIMIT_ERRORS = (openai.RateLimitError,)
+
     def __init__(self, model: str = "gpt-3.5-turbo", system_prompt: str = ""):
         load_dotenv()
         OPENAI_KEY = os.getenv("OPENAI_KEY")
-        self.client = openai.OpenAI(api_key=OPENAI_KEY)
+        # rate limit errors are not retried by the client, they are handled by the shared limiter
+        self.client = openai.OpenAI(api_key=OPENAI_KEY, max_retries=0)
+        self.async_client = openai.AsyncOpenAI(api_key=OPENAI_KEY, max_retries=0)
         self.model = model
         self.system_prompt = system_prompt
         pass
 
+    def _messages(self, message: str) -> List[dict]:
+        return [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": message},
+        ]
+
+    def _request_arguments(
+        self, message: str, completions: int, temperature: float, **kwargs
+    ):
+        return dict(
+            model=self.model,
+            messages=self._messages(message),
+            temperature=temperature,
+            n=completions,
+            **kwargs,
+        )
+
+    # streams the completions, returns True once every completion is settled
+    def _feed(self, streamed: List[StreamedCompletion], chunk, start: float) -> bool:
+        for choice in chunk.choices:
+            if choice.delta.content:
+                telemetry.record_ttfb(time.monotonic() - start)
+                streamed[choice.index].feed(choice.delta.content)
+        return all(completion.settled for completion in streamed)
+
+    def _record_stream_usage(
+        self, message: str, streamed: List[StreamedCompletion], usage
+    ) -> None:
+        # usage is reported by the last chunk, which is not received when the stream is cut off
+        if usage is not None:
+            telemetry.record_usage(usage.prompt_tokens, usage.completion_tokens)
+        else:
+            record_estimated_usage(self.system_prompt, message, streamed)
+
+    def _stream(self, message: str, completions: int, temperature: float) -> List[str]:
+        start = time.monotonic()
+        streamed = [StreamedCompletion(self.stop_rule) for _ in range(completions)]
+        usage = None
+        # leaving the block closes the connection, which cancels the rest of the completions
+        with self.client.chat.completions.create(
+            **self._request_arguments(
+                message,
+                completions,
+                temperature,
+                stream=True,
+                stream_options={"include_usage": True},
+            )
+        ) as stream:
+            for chunk in stream:
+                usage = chunk.usage or usage
+                if self._feed(streamed, chunk, start):
+                    break
+        self._record_stream_usage(message, streamed, usage)
+        return [completion.text for completion in streamed]
+
+    async def _astream(
+        self, message: str, completions: int, temperature: float
+    ) -> List[str]:
+        start = time.monotonic()
+        streamed = [StreamedCompletion(self.stop_rule) for _ in range(completions)]
+        usage = None
+        async with await self.async_client.chat.completions.create(
+            **self._request_arguments(
+                message,
+                completions,
+                temperature,
+                stream=True,
+                stream_options={"include_usage": True},
+            )
+        ) as stream:
+            async for chunk in stream:
+                usage = chunk.usage or usage
+                if self._feed(streamed, chunk, start):
+                    break
+        self._record_stream_usage(message, streamed, usage)
+        return [completion.text for completion in streamed]
+
     @retry.Retry(
-        predicate=lambda exception: exception is openai.RateLimitError,
+        predicate=is_transient_error,
         initial=1.0,
         maximum=64.0,
         multiplier=2.0,
         timeout=60,
+        on_error=telemetry.record_retry,
     )
     def prompt(
         self,
@@ -29,13 +120,38 @@ class ChatGPT(Chat):
         completions: int = 1,
         temperature: float = 0.2,
     ) -> List[str]:
+        if self.stop_rule is not None:
+            return self._stream(message, completions, temperature)
         response = self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": self.system_prompt},
-                {"role": "user", "content": message},
-            ],
-            temperature=temperature,
-            n=completions,
+            **self._request_arguments(message, completions, temperature)
+        )
+        if response.usage is not None:
+            telemetry.record_usage(
+                response.usage.prompt_tokens, response.usage.completion_tokens
+            )
+        return [choice.message.content for choice in response.choices]
+
+    @retry_async.AsyncRetry(
+        predicate=is_transient_error,
+        initial=1.0,
+        maximum=64.0,
+        multiplier=2.0,
+        timeout=60,
+        on_error=telemetry.record_retry,
+    )
+    async def aprompt(
+        self,
+        message: str,
+        completions: int = 1,
+        temperature: float = 0.2,
+    ) -> List[str]:
+        if self.stop_rule is not None:
+            return await self._astream(message, completions, temperature)
+        response = await self.async_client.chat.completions.create(
+            **self._request_arguments(message, completions, temperature)
         )
+        if response.usage is not None:
+            telemetry.record_usage(
+                response.usage.prompt_tokens, response.usage.completion_tokens
+            )
         return [choice.message.content for choice in response.choices]
@@ -1,24 +1,35 @@
 import os
+import time
+import asyncio
 import argparse
 from tqdm import tqdm
 from enum import Enum
 from typing import Dict, List, Tuple
 from problem import Problem
 from chat import Chat
-from gemini import Gemini
-from chatgpt import ChatGPT
+import registry
+from cache import CachedChat, ResponseCache
+from journal import Journal
+from rate_limit import ProviderLimiter, RateLimitedChat, get_limiter
+from telemetry import Telemetry, TelemetryChat
+from streaming import FIRST_INTEGER, StopRule
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from collections import defaultdict, Counter
-from util import process_files, match_tests_to_prompts
+from util import (
+    process_files,
+    async_process_files,
+    match_tests_to_prompts,
+    natural_sort_key,
+    create_additional_files,
+    FileStore,
+)
 from print_results import print_results_for_problem
-from gen import generate_variants
-
-
-class ChatModel(Enum):
-    GEMINI = "gemini"
-    GEMINI_FLASH = "gemini-flash"
-    GPT = "gpt"
-    GPT4 = "gpt4"
+from gen import generate_variants, parse_parameter
+from batch import BATCH_FORMAT, export_batch, import_batch
+from archive import PackedStore, get_store
+from shard import Shard, ShardedStore, default_report_path, write_report
+from sampling import AdaptiveSampling
+from results_db import ResultsDatabase, RunRecorder, TestResult
 
 
 class SystemPrompt(Enum):
@@ -32,104 +43,323 @@ SYSTEM_PROMPT = {
 }
 
 
-def get_chat(
-    chat_model: ChatModel,
-    system_prompt: SystemPrompt,
-):
-    match chat_model:
-        case ChatModel.GEMINI:
-            return Gemini(system_prompt=SYSTEM_PROMPT[system_prompt])
-        case ChatModel.GEMINI_FLASH:
-            return Gemini(
-                model="gemini-1.5-flash", system_prompt=SYSTEM_PROMPT[system_prompt]
-            )
-        case ChatModel.GPT:
-            return ChatGPT(system_prompt=SYSTEM_PROMPT[system_prompt])
-        case ChatModel.GPT4:
-            return ChatGPT(
-                model="gpt-4-turbo", system_prompt=SYSTEM_PROMPT[system_prompt]
-            )
+# chat of the model registered under the name (see registry.py), the module of the provider is imported here
+def get_chat(chat_model: str, system_prompt: SystemPrompt) -> Chat:
+    return registry.create_chat(chat_model, SYSTEM_PROMPT[system_prompt])
 
 
 # evaluates the model. Returns problem_id, the number of successful answers and the total number of problems.
 # if the problems are not generated, returs 0/0. use gen.py to generate problems.
+# if sampling is set, completions are requested in rounds until the accuracy of the problem is known well enough,
+# the completions of the earlier rounds are served by the response cache
+# if shard is set, only the prompts of the shard are evaluated (see shard.ShardedStore)
 def evaluate_test(
     problem_path: str,
     client: Chat,
     num_tests: int,
     executor: ThreadPoolExecutor | None = None,
     verbose: int = 0,
+    run: str | None = None,
+    recorder: RunRecorder | None = None,
+    sampling: AdaptiveSampling | None = None,
+    namespace: str | None = None,
+    shard: Shard | None = None,
 ) -> tuple[str, int, int]:
+    store = get_store(problem_path, run)
+    if shard is not None:
+        store = ShardedStore(store, shard, problem_path)
+    latencies: Dict[str, float] = {}
+    try:
+        prompt_in_dir, model_out_dir = get_prompt_dirs(problem_path, store, namespace)
+        sampled = 0
+        while True:
+            requested = sampling.next_round(sampled) if sampling else num_tests
+
+            def fetch_model_response(prompt: str) -> List[str]:
+                start = time.monotonic()
+                responses = client.prompt(prompt, completions=requested)
+                latencies[prompt] = (
+                    latencies.get(prompt, 0.0) + time.monotonic() - start
+                )
+                return responses[sampled:]
+
+            process_files(
+                input_dir=prompt_in_dir,
+                output_dir=model_out_dir,
+                modify_content=fetch_model_response,
+                modify_filename=lambda filename: create_additional_files(
+                    filename, requested
+                )[sampled:],
+                store=store,
+            )
+            sampled = requested
+            if sampling is None or should_stop_sampling(
+                problem_path, sampled, sampling, store, namespace
+            ):
+                break
+
+        return score_test(
+            problem_path, sampled, verbose, store, recorder, latencies, namespace
+        )
+    finally:
+        store.close()
+
+
+# asynchronous version of evaluate_test. All prompts of the problem are sent concurrently,
+# the number of requests in flight is bounded by the semaphore shared between problems
+async def async_evaluate_test(
+    problem_path: str,
+    client: Chat,
+    num_tests: int,
+    semaphore: asyncio.Semaphore,
+    verbose: int = 0,
+    run: str | None = None,
+    recorder: RunRecorder | None = None,
+    sampling: AdaptiveSampling | None = None,
+    namespace: str | None = None,
+    shard: Shard | None = None,
+) -> tuple[str, int, int]:
+    store = get_store(problem_path, run)
+    if shard is not None:
+        store = ShardedStore(store, shard, problem_path)
+    latencies: Dict[str, float] = {}
+    try:
+        prompt_in_dir, model_out_dir = get_prompt_dirs(problem_path, store, namespace)
+        sampled = 0
+        while True:
+            requested = sampling.next_round(sampled) if sampling else num_tests
+
+            async def fetch_model_response(prompt: str) -> List[str]:
+                async with semaphore:
+                    start = time.monotonic()
+                    responses = await client.aprompt(prompt, completions=requested)
+                    latencies[prompt] = (
+                        latencies.get(prompt, 0.0) + time.monotonic() - start
+                    )
+                    return responses[sampled:]
+
+            await async_process_files(
+                input_dir=prompt_in_dir,
+                output_dir=model_out_dir,
+                modify_content=fetch_model_response,
+                modify_filename=lambda filename: create_additional_files(
+                    filename, requested
+                )[sampled:],
+                store=store,
+            )
+            sampled = requested
+            if sampling is None or should_stop_sampling(
+                problem_path, sampled, sampling, store, namespace
+            ):
+                break
+
+        return score_test(
+            problem_path, sampled, verbose, store, recorder, latencies, namespace
+        )
+    finally:
+        store.close()
+
+
+def get_prompt_dirs(
+    problem_path: str, store: FileStore, namespace: str | None = None
+) -> tuple[str, str]:
     prompt_in_dir = os.path.join(problem_path, Problem.dirs["prompt_in"])
-    model_out_dir = os.path.join(problem_path, Problem.dirs["model_out"])
-    solution_out_dir = os.path.join(problem_path, Problem.dirs["out"])
+    model_out_dir = Problem.get_model_out_dir(problem_path, namespace)
 
-    if not os.path.exists(prompt_in_dir):
+    if not store.exists(prompt_in_dir):
         print(prompt_in_dir)
         raise Problem.PromptsNotGenerated(problem_path)
 
-    def fetch_model_response(prompt: str) -> List[str]:
-        return client.prompt(prompt, completions=num_tests)
+    return prompt_in_dir, model_out_dir
 
-    def create_additional_files(filename: str) -> List[str]:
-        name, ext = os.path.splitext(filename)
-        return [f"{name}_{i}{ext}" for i in range(num_tests)]
 
-    process_files(
-        input_dir=prompt_in_dir,
-        output_dir=model_out_dir,
-        modify_content=fetch_model_response,
-        modify_filename=create_additional_files,
-    )
+def should_stop_sampling(
+    problem_path: str,
+    sampled: int,
+    sampling: AdaptiveSampling,
+    store: FileStore,
+    namespace: str | None = None,
+) -> bool:
+    results = collect_test_results(problem_path, sampled, store, namespace=namespace)
+    correct = sum(1 for result in results if result.correct)
+    return sampling.should_stop(sampled, correct, len(results))
+
+
+# compares model outputs with solution outputs, returns the result of every completion.
+# latencies maps prompts to the time it took to get their completions.
+def collect_test_results(
+    problem_path: str,
+    num_tests: int,
+    store: FileStore,
+    latencies: Dict[str, float] | None = None,
+    namespace: str | None = None,
+) -> List[TestResult]:
+    prompt_in_dir = os.path.join(problem_path, Problem.dirs["prompt_in"])
+    model_out_dir = Problem.get_model_out_dir(problem_path, namespace)
+    solution_out_dir = os.path.join(problem_path, Problem.dirs["out"])
 
-    model_outs = os.listdir(model_out_dir)
-    solution_outs = os.listdir(solution_out_dir)
+    # completions beyond num_tests are left over from runs with more completions per prompt
+    model_outs = [
+        filename
+        for filename in store.listdir(model_out_dir)
+        if int(os.path.splitext(filename)[0].rsplit("_", 1)[1]) < num_tests
+    ]
+    solution_outs = store.listdir(solution_out_dir)
 
     if len(model_outs) != num_tests * len(solution_outs):
         raise Problem.IncorrectNumberOfFiles(model_out_dir, solution_out_dir)
 
+    # every solution output is read once, not once per completion
+    expected_outputs = {
+        filename: Problem.clean_output(
+            store.read(os.path.join(solution_out_dir, filename))
+        )
+        for filename in solution_outs
+    }
+    results = []
+    for model_out_filename, solution_out_filename in zip(
+        sorted(model_outs, key=natural_sort_key),
+        sorted(match_tests_to_prompts(solution_outs, num_tests), key=natural_sort_key),
+    ):
+        expected = expected_outputs[solution_out_filename]
+        extracted = Problem.get_last_integer(
+            store.read(os.path.join(model_out_dir, model_out_filename))
+        )
+        name, ext = os.path.splitext(model_out_filename)
+        prompt_name, completion = name.rsplit("_", 1)
+        latency = None
+        if latencies:
+            latency = latencies.get(
+                store.read(os.path.join(prompt_in_dir, prompt_name + ext))
+            )
+        results.append(
+            TestResult(
+                test=os.path.splitext(solution_out_filename)[0],
+                completion=int(completion),
+                extracted=extracted,
+                expected=expected,
+                correct=extracted == expected,
+                latency=latency,
+            )
+        )
+    return results
+
+
+# compares model outputs with solution outputs. Returns problem_id, the number of successful answers and the total number of answers.
+# if recorder is set, the result of every completion is recorded in the results database
+def score_test(
+    problem_path: str,
+    num_tests: int,
+    verbose: int = 0,
+    store: FileStore | None = None,
+    recorder: RunRecorder | None = None,
+    latencies: Dict[str, float] | None = None,
+    namespace: str | None = None,
+) -> tuple[str, int, int]:
+    store = store or FileStore()
+    results = collect_test_results(problem_path, num_tests, store, latencies, namespace)
+
     if verbose > 0:
-        print_results_for_problem(problem_path, verbose > 1)
+        print_results_for_problem(problem_path, verbose > 1, store, namespace)
+
+    if recorder is not None:
+        recorder.record(problem_path, results)
 
     return (
         problem_path,
-        sum(
-            1
-            for model_out_filename, solution_out_filename in zip(
-                sorted(model_outs),
-                sorted(match_tests_to_prompts(solution_outs, num_tests)),
-            )
-            if Problem.compare_outputs(
-                open(os.path.join(solution_out_dir, solution_out_filename), "r").read(),
-                open(os.path.join(model_out_dir, model_out_filename), "r").read(),
-            )
-        ),
-        len(model_outs),
+        sum(1 for result in results if result.correct),
+        len(results),
     )
 
 
 # Evaluate model on given problems. Does NOT generate problems, assumes they are generated by task gen
+# If run is set, files of each problem are kept in the packed archive of the run instead of directories
+# If recorder is set, results of every completion are recorded in the results database
+# If sampling is set, completions of each problem are sampled adaptively, num_tests is ignored
+# If namespace is set, model outputs are kept in the namespace of model-out/ (see Problem.get_model_out_dir)
+# If shard is set, only the prompts of the shard are evaluated
+# Returns the number of correct answers and the number of answers of every problem
 def eval_chat(
     problems: List[Problem],
     client: Chat,
     num_workers: int,
     num_tests: int,
     verbose: int = 0,
-) -> dict[str, float]:
+    run: str | None = None,
+    recorder: RunRecorder | None = None,
+    sampling: AdaptiveSampling | None = None,
+    namespace: str | None = None,
+    shard: Shard | None = None,
+) -> Dict[str, Tuple[int, int]]:
     results: Dict[str, Tuple[int, int]] = {}
     with ThreadPoolExecutor(max_workers=num_workers) as executor:
         futures = []
         for problem in problems:
             future = executor.submit(
-                evaluate_test, problem.id, client, num_tests, executor, verbose
+                evaluate_test,
+                problem.id,
+                client,
+                num_tests,
+                executor,
+                verbose,
+                run,
+                recorder,
+                sampling,
+                namespace,
+                shard,
             )
             futures.append(future)
 
         print("Evaluating model...")
-        for future in tqdm(as_completed(futures), total=len(futures)):
+        for future in tqdm(as_completed(futures), total=len(futures), desc=namespace):
             problem_id, score, total = future.result()
             results[problem_id] = (score, total)
 
+    return results
+
+
+# Asynchronous version of eval_chat. Keeps up to max_concurrency requests to the provider in flight
+async def async_eval_chat(
+    problems: List[Problem],
+    client: Chat,
+    max_concurrency: int,
+    num_tests: int,
+    verbose: int = 0,
+    run: str | None = None,
+    recorder: RunRecorder | None = None,
+    sampling: AdaptiveSampling | None = None,
+    namespace: str | None = None,
+    shard: Shard | None = None,
+) -> Dict[str, Tuple[int, int]]:
+    results: Dict[str, Tuple[int, int]] = {}
+    semaphore = asyncio.Semaphore(max_concurrency)
+    tasks = [
+        async_evaluate_test(
+            problem.id,
+            client,
+            num_tests,
+            semaphore,
+            verbose,
+            run,
+            recorder,
+            sampling,
+            namespace,
+            shard,
+        )
+        for problem in problems
+    ]
+
+    print("Evaluating model...")
+    for task in tqdm(asyncio.as_completed(tasks), total=len(tasks), desc=namespace):
+        problem_id, score, total = await task
+        results[problem_id] = (score, total)
+
+    return results
+
+
+def summarize_results(
+    results: Dict[str, Tuple[int, int]], verbose: int = 0
+) -> dict[str, float]:
     if verbose > 0:
         for id, correct in results.items():
             print(f"PROBLEM {id} CORRECT: {correct[0]}/{correct[1]}")
@@ -140,26 +370,282 @@ def eval_chat(
     }
 
 
+# stop rule of streamed completions (--stream): one-shot answers are cut off after their first integer,
+# chain of thought responses are streamed to the end unless --stop-pattern is given: their answer is the last integer
+# of the response, which is not settled before the response ends
+def get_stop_rule(args, system_prompt: SystemPrompt) -> StopRule | None:
+    if not args.stream:
+        return None
+    if args.stop_pattern is not None:
+        return StopRule(args.stop_pattern)
+    if system_prompt == SystemPrompt.ONE_SHOT:
+        return StopRule(FIRST_INTEGER)
+    return StopRule()
+
+
+# creates the chat of the model wrapped in the provider limiter, telemetry (if set) and the response cache.
+# Without a cache, completions are kept in memory for the duration of the run.
+def build_client(
+    args: argparse.Namespace,
+    chat_model: str,
+    system_prompt: SystemPrompt,
+    cache: ResponseCache | None = None,
+    telemetry: Telemetry | None = None,
+    journal: Journal | None = None,
+) -> tuple[Chat, ProviderLimiter]:
+    client = get_chat(chat_model, system_prompt)
+    client.stop_rule = get_stop_rule(args, system_prompt)
+    # concurrency grows up to the number of workers (or --concurrency with --async) until the provider rate limits us
+    limiter = get_limiter(
+        client.PROVIDER,
+        args.concurrency if args.use_async else args.workers,
+        args.rpm,
+        args.tpm,
+    )
+    client = RateLimitedChat(client, limiter)
+    # cache hits are not requests to the provider, so telemetry goes under the cache
+    if telemetry is not None:
+        client = TelemetryChat(client, telemetry)
+    # adaptive sampling and the journal rely on the cache to keep completions of the run
+    client = CachedChat(
+        client, cache or ResponseCache(":memory:"), args.refresh, journal
+    )
+    return client, limiter
+
+
+# namespace of the outputs of the model with the system prompt variant in a matrix run
+def get_namespace(chat_model: str, system_prompt: SystemPrompt) -> str:
+    return f"{chat_model}-{system_prompt.value}"
+
+
+# prints accuracies of every problem (rows) for every model and system prompt variant (columns)
+def print_comparison_table(
+    results: Dict[Tuple[str, SystemPrompt], Dict[str, float]],
+) -> None:
+    columns = [get_namespace(*combination) for combination in results]
+    problem_ids = sorted({id for accuracies in results.values() for id in accuracies})
+    width = max([len("PROBLEM"), len("MEAN")] + [len(id) for id in problem_ids])
+    column_widths = [max(len(column), 5) for column in columns]
+
+    def print_row(name: str, values: List[str]) -> None:
+        print(
+            "  ".join(
+                [name.ljust(width)]
+                + [value.rjust(w) for value, w in zip(values, column_widths)]
+            )
+        )
+
+    print_row("PROBLEM", columns)
+    for id in problem_ids:
+        print_row(
+            id,
+            [
+                f"{accuracies[id]:.3f}" if id in accuracies else "-"
+                for accuracies in results.values()
+            ],
+        )
+    print_row(
+        "MEAN",
+        [
+            f"{sum(accuracies.values()) / len(accuracies):.3f}" if accuracies else "-"
+            for accuracies in results.values()
+        ],
+    )
+
+
 def main():
     parser = argparse.ArgumentParser(description="Evaluate model on a problem")
     parser.add_argument(
         "path", type=str, help="Path to problem or directory of problems"
     )
     parser.add_argument(
-        "model", type=ChatModel, help="Model gpt/gpt4/gemini/gemini-flash"
+        "model",
+        type=str,
+        nargs="+",
+        help=f"Models {'/'.join(registry.BACKENDS)} or registered by an entry point (see registry.py), every model is evaluated with every system prompt variant",
     )
     parser.add_argument(
         "--tests", "-t", type=int, help="Number of generated tests", default=5
     )
+    parser.add_argument(
+        "--adaptive",
+        action="store_true",
+        help="Request completions in rounds of --tests per prompt and stop sampling a problem once its accuracy is known well enough",
+    )
+    parser.add_argument(
+        "--ci-width",
+        type=float,
+        help="Width of the 95%% confidence interval of the accuracy at which adaptive sampling stops (works only when flag --adaptive is set)",
+        default=0.2,
+    )
+    parser.add_argument(
+        "--max-tests",
+        type=int,
+        help="Max number of completions per prompt with adaptive sampling (default: 4 * --tests)",
+        default=None,
+    )
     parser.add_argument(
         "--workers", "-w", type=int, help="Max number of workers", default=5
     )
+    parser.add_argument(
+        "--async",
+        dest="use_async",
+        action="store_true",
+        help="Send all prompts concurrently from a single event loop instead of a pool of worker threads",
+    )
+    parser.add_argument(
+        "--concurrency",
+        "-c",
+        type=int,
+        help="Max number of requests in flight to the provider (works only when flag --async is set)",
+        default=64,
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Stream completions and cut them off as soon as the answer is settled (one-shot answers after their first integer). Chain of thought responses are not cut off without --stop-pattern, their answer is the last integer of the whole response",
+    )
+    parser.add_argument(
+        "--stop-pattern",
+        type=str,
+        help="Regular expression settling the answer of streamed completions once the text matches it, e.g. 'answer is [-+]?\\d+\\b' (works only when flag --stream is set)",
+        default=None,
+    )
+    parser.add_argument(
+        "--packed",
+        type=str,
+        nargs="?",
+        const=PackedStore.DEFAULT_RUN,
+        metavar="RUN",
+        help=f"Keep model outputs of each problem in an archive {{problem}}/RUN{PackedStore.EXTENSION} (default RUN: {PackedStore.DEFAULT_RUN}) and its prompts in an archive shared by the runs, instead of directories",
+        default=None,
+    )
+    parser.add_argument(
+        "--shard",
+        type=Shard.parse,
+        metavar="i/N",
+        help="Evaluate only shard i of N disjoint shards of the problems, merge the reports of the shards with shard.py merge",
+        default=None,
+    )
+    parser.add_argument(
+        "--shard-by",
+        choices=["problem", "prompt"],
+        help="Split problems between the shards, or the prompts of every problem (works only when --shard is set)",
+        default="problem",
+    )
+    parser.add_argument(
+        "--report",
+        type=str,
+        help="Path to write the number of correct answers of every problem as JSON (default with --shard: shard-i-of-N.json)",
+        default=None,
+    )
+    parser.add_argument(
+        "--results-db",
+        type=str,
+        help="Path to the database recording the result of every completion",
+        default=ResultsDatabase.DEFAULT_PATH,
+    )
+    parser.add_argument(
+        "--no-results-db",
+        action="store_true",
+        help="Do not record the results in the results database",
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="Print pass@k, majority vote accuracy and bootstrap confidence intervals per problem and category (see scoring.py)",
+    )
+    parser.add_argument(
+        "--pass-k",
+        "-k",
+        type=int,
+        nargs="+",
+        help="Values of k of pass@k printed with flag --stats",
+        default=[1],
+    )
+    parser.add_argument(
+        "--export-batch",
+        type=str,
+        metavar="PATH",
+        help="Write the prompts without outputs of the model to a batch request JSONL file instead of evaluating",
+        default=None,
+    )
+    parser.add_argument(
+        "--import-batch",
+        type=str,
+        metavar="PATH",
+        help="Read model outputs from a batch results JSONL file and score them instead of prompting the model",
+        default=None,
+    )
+    parser.add_argument(
+        "--rpm",
+        type=float,
+        help="Requests per minute budget of the provider (unlimited by default)",
+        default=None,
+    )
+    parser.add_argument(
+        "--tpm",
+        type=float,
+        help="Tokens per minute budget of the provider (unlimited by default)",
+        default=None,
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not read nor store completions in the response cache",
+    )
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="Ignore cached completions and overwrite them with new ones",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an interrupted run, completions already in the journal are not requested again",
+    )
+    parser.add_argument(
+        "--journal-path",
+        type=str,
+        help="Path to the journal of the completions received during the run",
+        default=Journal.DEFAULT_PATH,
+    )
+    parser.add_argument(
+        "--cache-path",
+        type=str,
+        help="Path to the response cache database",
+        default=ResponseCache.DEFAULT_PATH,
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        help="Max size of the cached completions in MiB, least recently used ones are evicted",
+        default=ResponseCache.DEFAULT_MAX_SIZE // (1024 * 1024),
+    )
+    parser.add_argument(
+        "--telemetry-path",
+        type=str,
+        help="Path to the JSONL file the raw telemetry samples of the requests are appended to",
+        default=Telemetry.DEFAULT_PATH,
+    )
+    parser.add_argument(
+        "--no-telemetry",
+        action="store_true",
+        help="Do not record telemetry of the requests",
+    )
     parser.add_argument(
         "--chain_of_thought",
         "--cot",
         action="store_true",
         help="Use 'chain of thought' prompting method",
     )
+    parser.add_argument(
+        "--variants",
+        type=SystemPrompt,
+        nargs="+",
+        help="System prompt variants one_shot/chain_of_thought (default: one_shot, or chain_of_thought with flag --cot)",
+        default=None,
+    )
     parser.add_argument(
         "--folder",
         "-f",
@@ -179,6 +665,14 @@ def main():
         help="Set the seed for generation (works only when flag -g is set)",
         default=1,
     )
+    parser.add_argument(
+        "--param",
+        type=parse_parameter,
+        action="append",
+        metavar="KEY=VALUE",
+        help="Parameter of the generators, e.g. size=4 (repeatable, works only when flag -g is set)",
+        default=[],
+    )
     parser.add_argument(
         "-v",
         "--verbose",
@@ -194,24 +688,238 @@ def main():
         if args.folder
         else [Problem(args.path)]
     )
-    client = get_chat(
-        args.model,
+    # shards split the problems, or the prompts of every problem
+    prompt_shard = args.shard if args.shard_by == "prompt" else None
+    if args.shard is not None and prompt_shard is None:
+        problems = args.shard.select(problems)
+    report_path = args.report or (
+        default_report_path(args.shard) if args.shard is not None else None
+    )
+    variants = args.variants or [
         (
             SystemPrompt.CHAIN_OF_THOUGHT
             if args.chain_of_thought
             else SystemPrompt.ONE_SHOT
-        ),
-    )
+        )
+    ]
+    combinations = [
+        (chat_model, system_prompt)
+        for chat_model in args.model
+        for system_prompt in variants
+    ]
+    for chat_model in args.model:
+        try:
+            registry.get_backend(chat_model)
+        except KeyError as e:
+            parser.error(e.args[0])
+    # with a single combination, outputs are kept directly in model-out/
+    matrix = len(combinations) > 1
+    if args.stats and args.no_results_db:
+        parser.error("--stats reads the results from the results database")
+    if prompt_shard is not None and args.export_batch:
+        parser.error("batch files can be sharded only by problem")
+    if matrix and (args.export_batch or args.import_batch):
+        parser.error("batch files work with a single model and system prompt variant")
+    if (args.export_batch or args.import_batch) and registry.get_backend(
+        args.model[0]
+    ).batch_format != BATCH_FORMAT:
+        parser.error(
+            f"Model {args.model[0]} has no batch endpoint accepting the {BATCH_FORMAT} batch format"
+        )
     if args.generate:
-        if not generate_variants(problems, args.seed, verbose=args.verbose > 0):
+        if not generate_variants(
+            problems,
+            args.seed,
+            verbose=args.verbose > 0,
+            parameters=dict(args.param),
+        ):
             return
 
+    journal: Journal | None = None
     try:
-        results = eval_chat(problems, client, args.workers, args.tests, args.verbose)
-        for id, accuracy in results.items():
-            print(f"PROBLEM {id} ACCURACY: {accuracy:.3f}")
+        if args.export_batch:
+            chat_model, system_prompt = combinations[0]
+            count = export_batch(
+                problems,
+                registry.get_backend(chat_model).model,
+                SYSTEM_PROMPT[system_prompt],
+                get_namespace(chat_model, system_prompt),
+                args.tests,
+                args.export_batch,
+            )
+            print(f"Exported {count} prompts to {args.export_batch}")
+            return
+
+        limiters: List[ProviderLimiter] = []
+        sampling = (
+            AdaptiveSampling(
+                args.tests, args.max_tests or 4 * args.tests, args.ci_width
+            )
+            if args.adaptive
+            else None
+        )
+        telemetry = None if args.no_telemetry else Telemetry()
+        database = None if args.no_results_db else ResultsDatabase(args.results_db)
+        recorders = {
+            combination: (
+                database.start_run(
+                    registry.get_backend(combination[0]).model,
+                    combination[1].value,
+                    args.tests,
+                )
+                if database
+                else None
+            )
+            for combination in combinations
+        }
+        # batch outputs are always kept in the namespace of the model, see batch.py
+        namespaces = {
+            combination: (
+                get_namespace(*combination) if matrix or args.import_batch else None
+            )
+            for combination in combinations
+        }
+        if args.import_batch:
+            try:
+                import_batch(args.import_batch, namespaces[combinations[0]])
+            except ValueError as e:
+                parser.error(e.args[0])
+            counts = {
+                combinations[0]: {
+                    problem_id: (score, total)
+                    for problem_id, score, total in (
+                        score_test(
+                            problem.id,
+                            args.tests,
+                            args.verbose,
+                            (
+                                ShardedStore(FileStore(), prompt_shard, problem.id)
+                                if prompt_shard
+                                else None
+                            ),
+                            recorder=recorders[combinations[0]],
+                            namespace=namespaces[combinations[0]],
+                        )
+                        for problem in problems
+                    )
+                }
+            }
+        else:
+            cache = (
+                None
+                if args.no_cache
+                else ResponseCache(args.cache_path, args.cache_size * 1024 * 1024)
+            )
+            journal = Journal(args.journal_path, args.resume)
+            if args.resume:
+                print(f"Resuming with {len(journal)} journaled completions")
+            clients = {}
+            for combination in combinations:
+                clients[combination], limiter = build_client(
+                    args, *combination, cache, telemetry, journal
+                )
+                if limiter not in limiters:
+                    limiters.append(limiter)
+
+            # every combination gets its own packed archive, so that they can be written concurrently
+            def get_run(combination: Tuple[str, SystemPrompt]) -> str | None:
+                if args.packed and namespaces[combination]:
+                    return f"{args.packed}-{namespaces[combination]}"
+                return args.packed
+
+            # combinations are evaluated concurrently, requests of each provider go through its own limiter
+            if args.use_async:
+
+                async def eval_combinations() -> List[Dict[str, Tuple[int, int]]]:
+                    return await asyncio.gather(
+                        *(
+                            async_eval_chat(
+                                problems,
+                                clients[combination],
+                                args.concurrency,
+                                args.tests,
+                                args.verbose,
+                                get_run(combination),
+                                recorders[combination],
+                                sampling,
+                                namespaces[combination],
+                                prompt_shard,
+                            )
+                            for combination in combinations
+                        )
+                    )
+
+                problem_counts = asyncio.run(eval_combinations())
+            else:
+                with ThreadPoolExecutor(max_workers=len(combinations)) as executor:
+                    problem_counts = list(
+                        executor.map(
+                            lambda combination: eval_chat(
+                                problems,
+                                clients[combination],
+                                args.workers,
+                                args.tests,
+                                args.verbose,
+                                get_run(combination),
+                                recorders[combination],
+                                sampling,
+                                namespaces[combination],
+                                prompt_shard,
+                            ),
+                            combinations,
+                        )
+                    )
+            counts = dict(zip(combinations, problem_counts))
+
+        results = {
+            combination: summarize_results(problem_counts, args.verbose)
+            for combination, problem_counts in counts.items()
+        }
+        if report_path:
+            write_report(
+                report_path,
+                args.shard,
+                args.shard_by == "prompt",
+                args.tests,
+                {
+                    get_namespace(*combination): problem_counts
+                    for combination, problem_counts in counts.items()
+                },
+            )
+
+        if matrix:
+            print_comparison_table(results)
+        else:
+            for id, accuracy in results[combinations[0]].items():
+                print(f"PROBLEM {id} ACCURACY: {accuracy:.3f}")
+        if args.stats:
+            # numpy is loaded only for the statistics
+            from scoring import load_categories, load_from_database, report, score
+
+            categories = load_categories()
+            for combination, recorder in recorders.items():
+                if matrix:
+                    print(f"MODEL {get_namespace(*combination)}")
+                print(
+                    report(
+                        score(
+                            load_from_database(database, [recorder.run_id]),
+                            categories,
+                            args.pass_k,
+                        ),
+                        args.pass_k,
+                    )
+                )
+        for limiter in limiters:
+            print(limiter.report())
+        if telemetry is not None and telemetry.samples:
+            print(telemetry.report())
+            telemetry.write(args.telemetry_path)
     except (Problem.PromptsNotGenerated, Problem.IncorrectNumberOfFiles) as e:
         print(e.message)
+    finally:
+        if journal is not None:
+            journal.close()
 
 
 if __name__ == "__main__":
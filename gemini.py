@@ -1,27 +1,113 @@
+import telemetry
 from chat import Chat
+from streaming import StreamedCompletion
 from dotenv import load_dotenv
 import google.generativeai as genai
-from google.api_core import retry
+from google.api_core import exceptions, retry, retry_async
 from typing import List
+import time
 import os
 
 
+# rate limit errors are not retried here, they are handled by the shared limiter
+def is_transient_error(exception: Exception) -> bool:
+    return retry.if_transient_error(exception) and not isinstance(
+        exception, Gemini.RATE_LIMIT_ERRORS
+    )
+
+
 class Gemini(Chat):
+    PROVIDER = "google"
+    RATE_LIMIT_ERRORS = (exceptions.TooManyRequests,)
+    NATIVE_COMPLETIONS = 1
+
     def __init__(self, model: str = "gemini-1.5-pro", system_prompt: str = ""):
         load_dotenv()
         GOOGLE_KEY = os.getenv("GOOGLE_KEY")
         genai.configure(api_key=GOOGLE_KEY)
         self.client = genai.GenerativeModel(model, system_instruction=[system_prompt])
         self.model = model
+        self.system_prompt = system_prompt
         pass
 
+    def _generation_config(self, temperature: float) -> genai.GenerationConfig:
+        return genai.GenerationConfig(temperature=temperature, candidate_count=1)
+
+    # streamed response cut off once its answer is settled, every chunk reports the usage so far
+    def _stream_one(self, message: str, temperature: float) -> str:
+        start = time.monotonic()
+        streamed = StreamedCompletion(self.stop_rule)
+        usage = None
+        for chunk in self.client.generate_content(
+            message, generation_config=self._generation_config(temperature), stream=True
+        ):
+            telemetry.record_ttfb(time.monotonic() - start)
+            usage = chunk.usage_metadata
+            if streamed.feed(chunk.text):
+                break
+        if usage is not None:
+            telemetry.record_usage(
+                usage.prompt_token_count, usage.candidates_token_count
+            )
+        return streamed.text
+
+    async def _astream_one(self, message: str, temperature: float) -> str:
+        start = time.monotonic()
+        streamed = StreamedCompletion(self.stop_rule)
+        usage = None
+        async for chunk in await self.client.generate_content_async(
+            message, generation_config=self._generation_config(temperature), stream=True
+        ):
+            telemetry.record_ttfb(time.monotonic() - start)
+            usage = chunk.usage_metadata
+            if streamed.feed(chunk.text):
+                break
+        if usage is not None:
+            telemetry.record_usage(
+                usage.prompt_token_count, usage.candidates_token_count
+            )
+        return streamed.text
+
     @retry.Retry(
-        predicate=retry.if_transient_error,
+        predicate=is_transient_error,
         initial=1.0,
         maximum=64.0,
         multiplier=2.0,
         timeout=60,
+        on_error=telemetry.record_retry,
     )
+    def prompt_one(self, message: str, temperature: float = 0.2) -> str:
+        if self.stop_rule is not None:
+            return self._stream_one(message, temperature)
+        response = self.client.generate_content(
+            message, generation_config=self._generation_config(temperature)
+        )
+        telemetry.record_usage(
+            response.usage_metadata.prompt_token_count,
+            response.usage_metadata.candidates_token_count,
+        )
+        return response.text
+
+    @retry_async.AsyncRetry(
+        predicate=is_transient_error,
+        initial=1.0,
+        maximum=64.0,
+        multiplier=2.0,
+        timeout=60,
+        on_error=telemetry.record_retry,
+    )
+    async def aprompt_one(self, message: str, temperature: float = 0.2) -> str:
+        if self.stop_rule is not None:
+            return await self._astream_one(message, temperature)
+        response = await self.client.generate_content_async(
+            message, generation_config=self._generation_config(temperature)
+        )
+        telemetry.record_usage(
+            response.usage_metadata.prompt_token_count,
+            response.usage_metadata.candidates_token_count,
+        )
+        return response.text
+
     def prompt(
         self,
         message: str,
@@ -29,13 +115,12 @@ class Gemini(Chat):
         temperature: float = 0.2,
     ) -> List[str]:
         # Although the gemini api provides an option candidate_count the only currently available value is 1
-        candidates = []
-        for i in range(completions):
-            response = self.client.generate_content(
-                message,
-                generation_config=genai.GenerationConfig(
-                    temperature=temperature, candidate_count=1
-                ),
-            )
-            candidates.append(response.text)
-        return candidates
+        return self.fan_out(message, completions, temperature=temperature)
+
+    async def aprompt(
+        self,
+        message: str,
+        completions: int = 1,
+        temperature: float = 0.2,
+    ) -> List[str]:
+        return await self.afan_out(message, completions, temperature=temperature)
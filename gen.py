@@ -1,17 +1,67 @@
 import argparse
-from typing import List
+from typing import Dict, List, Tuple
 from problem import Problem
+from sandbox import ResourceLimits
+from shard import Shard
 from tqdm import tqdm
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 
+# parses a generator parameter "key=value", used as an argparse type
+def parse_parameter(spec: str) -> Tuple[str, str]:
+    key, separator, value = spec.partition("=")
+    if not separator or not key:
+        raise argparse.ArgumentTypeError(
+            f"parameter {spec} is not in the form key=value"
+        )
+    return key, value
+
+
+# splits `parallel` cpus between `count` problems generated at once. Returns the number of problems
+# generated at a time and the number of solutions each of them runs at a time
+def split_parallel(parallel: int, count: int) -> Tuple[int, int]:
+    problems_at_once = max(1, min(parallel, count))
+    return problems_at_once, max(1, parallel // problems_at_once)
+
+
+# builds all problems with a single cmake invocation, then generates tests, solutions and prompts
+# of several problems at a time in separate processes, the `parallel` cpus are split between them
+# (see split_parallel), so that at most `parallel` executables run at once. Executables run with the given
+# resource limits, generators get the parameters as key=value arguments (see Problem.generate_tests)
 def generate_variants(
-    problems: List[Problem], seed: int, parallel: int = 1, verbose: bool = False
+    problems: List[Problem],
+    seed: int,
+    parallel: int = 1,
+    verbose: bool = False,
+    binary_cache: str | None = None,
+    limits: ResourceLimits | None = None,
+    parameters: Dict[str, str] | None = None,
 ) -> bool:
     print("Generating problems...")
-    for _, problem in tqdm(enumerate(problems), total=len(problems)):
-        if not problem.generate_prompts(seed, parallel, verbose):
-            print(f"Test generation failed for problem {problem.id}")
-            return False
+    if not Problem.compile_cpp(
+        [problem.id for problem in problems], parallel, verbose, binary_cache
+    ):
+        return False
+
+    problems_at_once, solutions_at_once = split_parallel(parallel, len(problems))
+    with ProcessPoolExecutor(max_workers=problems_at_once) as executor:
+        futures = {
+            executor.submit(
+                problem.generate_prompts,
+                seed,
+                solutions_at_once,
+                verbose,
+                False,
+                limits,
+                parameters,
+            ): problem
+            for problem in problems
+        }
+        for future in tqdm(as_completed(futures), total=len(futures)):
+            if not future.result():
+                print(f"Test generation failed for problem {futures[future].id}")
+                executor.shutdown(cancel_futures=True)
+                return False
     return True
 
 
@@ -37,9 +87,50 @@ if __name__ == "__main__":
         "--parallel",
         "-j",
         type=int,
-        help="Number of cpus to use for compilation",
+        help="Number of cpus to use for compilation and generation",
         default=1,
     )
+    parser.add_argument(
+        "--binary-cache",
+        type=str,
+        help=f"Directory of executables shared between checkouts, reused when built from identical sources (default: ${Problem.BINARY_CACHE_ENV})",
+        default=None,
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        help="Wall-clock time limit in seconds of a single generator or solution run",
+        default=ResourceLimits.timeout,
+    )
+    parser.add_argument(
+        "--cpu-limit",
+        type=int,
+        help="CPU time limit in seconds of a single generator or solution run",
+        default=None,
+    )
+    parser.add_argument(
+        "--memory-limit",
+        type=int,
+        help="Memory limit in MiB of a single generator or solution run",
+        default=None,
+    )
+
+    parser.add_argument(
+        "--param",
+        "-p",
+        type=parse_parameter,
+        action="append",
+        metavar="KEY=VALUE",
+        help="Parameter of the generators, e.g. size=4 (repeatable), generators use their defaults for parameters not given",
+        default=[],
+    )
+    parser.add_argument(
+        "--shard",
+        type=Shard.parse,
+        metavar="i/N",
+        help="Generate only shard i of N disjoint shards of the problems, as eval.py --shard i/N (shards by prompt need every problem)",
+        default=None,
+    )
 
     args = parser.parse_args()
 
@@ -48,4 +139,19 @@ if __name__ == "__main__":
         if args.folder
         else [Problem(args.path)]
     )
-    generate_variants(problems, args.seed, args.parallel, args.verbose)
+    if args.shard is not None:
+        problems = args.shard.select(problems)
+    limits = ResourceLimits(
+        timeout=args.timeout,
+        cpu_time=args.cpu_limit,
+        memory=args.memory_limit * 1024 * 1024 if args.memory_limit else None,
+    )
+    generate_variants(
+        problems,
+        args.seed,
+        args.parallel,
+        args.verbose,
+        args.binary_cache,
+        limits,
+        dict(args.param),
+    )
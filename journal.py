@@ -0,0 +1,91 @@
+import os
+import json
+import time
+import threading
+from typing import Dict
+
+
+# Write-ahead journal of the completions received during a run, one JSON line per completion:
+#   {"key": <ResponseCache key>, "index": <completion index>, "content": ...}
+# Lines are written to the file as soon as the completions arrive, so they survive a crash of the process.
+# They are fsynced at most once per SYNC_INTERVAL seconds and when the journal is closed, so a crash
+# of the machine loses at most the last interval. A line cut short by a crash is not valid JSON,
+# it is dropped (together with anything after it) when the journal is reopened.
+# The file is opened (and truncated, unless the run is resumed) when the first completion arrives,
+# so that it can still be read until then, e.g. replayed by the simulator (simulator.py).
+class Journal:
+    DEFAULT_PATH = ".cache/journal.jsonl"
+    SYNC_INTERVAL = 1.0
+
+    def __init__(self, path: str = DEFAULT_PATH, resume: bool = False):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries: Dict[str, Dict[int, str]] = {}
+        self.file = None
+        self.last_sync = time.monotonic()
+        # size of the valid prefix of the journal of a resumed run, None for a new journal
+        self.valid_size = self._load() if resume and os.path.exists(path) else None
+
+    # must be called with the lock held
+    def _open(self) -> None:
+        if self.valid_size is None:
+            self.file = open(self.path, "wb")
+        else:
+            self.file = open(self.path, "r+b")
+            self.file.truncate(self.valid_size)
+            self.file.seek(self.valid_size)
+
+    # reads the entries, returns the size of the valid prefix of the file
+    def _load(self) -> int:
+        valid_size = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                self.entries.setdefault(entry["key"], {})[entry["index"]] = entry[
+                    "content"
+                ]
+                valid_size += len(line)
+        return valid_size
+
+    # returns a dictionary completion_index -> content of the journaled completions with indices in range(completions)
+    def get(self, key: str, completions: int) -> dict[int, str]:
+        with self.lock:
+            entries = self.entries.get(key, {})
+            return {
+                index: content
+                for index, content in entries.items()
+                if index < completions
+            }
+
+    def append(self, key: str, contents: dict[int, str]) -> None:
+        data = "".join(
+            json.dumps({"key": key, "index": index, "content": content}) + "\n"
+            for index, content in contents.items()
+        ).encode()
+        with self.lock:
+            if self.file is None:
+                self._open()
+            self.file.write(data)
+            self.file.flush()
+            if time.monotonic() - self.last_sync >= Journal.SYNC_INTERVAL:
+                os.fsync(self.file.fileno())
+                self.last_sync = time.monotonic()
+            self.entries.setdefault(key, {}).update(contents)
+
+    def __len__(self) -> int:
+        with self.lock:
+            return sum(len(entries) for entries in self.entries.values())
+
+    def close(self) -> None:
+        with self.lock:
+            if self.file is not None and not self.file.closed:
+                os.fsync(self.file.fileno())
+                self.file.close()
@@ -3,8 +3,9 @@ import re
 import shutil
 import argparse
 from problem import Problem
+from archive import PackedStore, get_store
 from typing import Dict, List, Tuple
-from util import match_tests_to_prompts, TerminalColor
+from util import match_tests_to_prompts, natural_sort_key, TerminalColor, FileStore
 
 
 def print_evaluation_result_for_testcase(
@@ -48,26 +49,40 @@ def print_evaluation_result_for_testcase(
     print()
 
 
-def print_results_for_problem(problem_path: str, verbose: bool = False):
+def print_results_for_problem(
+    problem_path: str,
+    verbose: bool = False,
+    store: FileStore | None = None,
+    namespace: str | None = None,
+):
+    store = store or FileStore()
     prompt_in_dir = f"{problem_path}/{Problem.dirs['prompt_in']}"
     in_dir = f"{problem_path}/{Problem.dirs['in']}"
-    model_out_dir = f"{problem_path}/{Problem.dirs['model_out']}"
+    model_out_dir = Problem.get_model_out_dir(problem_path, namespace)
     solution_out_dir = f"{problem_path}/{Problem.dirs['out']}"
 
-    prompt_ins = os.listdir(prompt_in_dir)
-    ins = os.listdir(in_dir)
-    model_outs = os.listdir(model_out_dir)
-    solution_outs = os.listdir(solution_out_dir)
+    prompt_ins = store.listdir(prompt_in_dir)
+    ins = store.listdir(in_dir)
+    model_outs = store.listdir(model_out_dir)
+    solution_outs = store.listdir(solution_out_dir)
+
+    # e.g. a shard without prompts of the problem
+    if not ins:
+        return
 
     if len(model_outs) % len(ins) != 0:
         raise Problem.IncorrectNumberOfFiles(model_out_dir, solution_out_dir)
 
     num_tests = len(model_outs) // len(ins)
 
-    model_outs = sorted(model_outs)
-    prompt_ins = sorted(match_tests_to_prompts(prompt_ins, num_tests))
-    ins = sorted(match_tests_to_prompts(ins, num_tests))
-    solution_outs = sorted(match_tests_to_prompts(solution_outs, num_tests))
+    model_outs = sorted(model_outs, key=natural_sort_key)
+    prompt_ins = sorted(
+        match_tests_to_prompts(prompt_ins, num_tests), key=natural_sort_key
+    )
+    ins = sorted(match_tests_to_prompts(ins, num_tests), key=natural_sort_key)
+    solution_outs = sorted(
+        match_tests_to_prompts(solution_outs, num_tests), key=natural_sort_key
+    )
 
     for (
         prompt_in_filename,
@@ -77,10 +92,10 @@ def print_results_for_problem(problem_path: str, verbose: bool = False):
     ) in zip(prompt_ins, ins, model_outs, solution_outs):
         print_evaluation_result_for_testcase(
             problem_path,
-            open(os.path.join(prompt_in_dir, prompt_in_filename), "r").read(),
-            open(os.path.join(in_dir, in_filename), "r").read(),
-            open(os.path.join(solution_out_dir, solution_out_filename), "r").read(),
-            open(os.path.join(model_out_dir, model_out_filename), "r").read(),
+            store.read(os.path.join(prompt_in_dir, prompt_in_filename)),
+            store.read(os.path.join(in_dir, in_filename)),
+            store.read(os.path.join(solution_out_dir, solution_out_filename)),
+            store.read(os.path.join(model_out_dir, model_out_filename)),
             verbose,
         )
 
@@ -102,14 +117,27 @@ def main():
         action="store_true",
         help="Print whole prompts instead of ins",
     )
+    parser.add_argument(
+        "--packed",
+        type=str,
+        nargs="?",
+        const=PackedStore.DEFAULT_RUN,
+        metavar="RUN",
+        help="Read results from the packed archive of the run instead of directories",
+        default=None,
+    )
 
     args = parser.parse_args()
 
-    if args.folder:
-        for problem in Problem.read_problems_from_dir(args.path):
-            print_results_for_problem(problem.id, args.verbose)
-    else:
-        print_results_for_problem(args.path, args.verbose)
+    problem_paths = (
+        [problem.id for problem in Problem.read_problems_from_dir(args.path)]
+        if args.folder
+        else [args.path]
+    )
+    for problem_path in problem_paths:
+        store = get_store(problem_path, args.packed)
+        print_results_for_problem(problem_path, args.verbose, store)
+        store.close()
 
 
 if __name__ == "__main__":
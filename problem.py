@@ -1,11 +1,15 @@
 import os
 import sys
+import shutil
 import subprocess
 import random
 import json
 import hashlib
 import re
-from util import process_files
+from util import process_files_batch
+from sandbox import ResourceLimits, ResourceUsage, run_limited
+from template import PromptTemplate
+from concurrent.futures import ThreadPoolExecutor
 from typing import List
 
 
@@ -13,8 +17,23 @@ class Problem:
     IN_KEYWORD = "@IN_{num}"
     OUT_KEYWORD = "@ANS"
 
-    INGEN_EXEC_FORMAT = "./bin/{problem_name}_gen.e"
-    SOLUTION_EXEC_FORMAT = "./bin/{problem_name}_solution.e"
+    # executables are named after the cmake targets {tasks dir}_{problem name}_{source}.e (see tasks/CMakeLists.txt),
+    # so that problems of the same name in different tasks directories do not clash
+    INGEN_EXEC_FORMAT = "./bin/{target_prefix}_gen.e"
+    SOLUTION_EXEC_FORMAT = "./bin/{target_prefix}_solution.e"
+
+    INGEN_SOURCE = "gen.cpp"
+    SOLUTION_SOURCE = "solution.cpp"
+    HEADERS_DIR = "testlib"
+    # content hash of the sources is stored next to each executable, e.g. bin/{target_prefix}_gen.e.hash
+    HASH_SUFFIX = ".hash"
+    # directory shared between checkouts, holding executables by the hash of their sources
+    BINARY_CACHE_ENV = "AI_BENCH_BINARY_CACHE"
+    # solutions containing this marker support the batch protocol, see generate_solutions
+    BATCH_PROTOCOL_MARKER = "AI_BENCH_BATCH_PROTOCOL"
+    BATCH_PROTOCOL_FLAG = "--batch"
+    # records inputs and outputs of the last generation, see generate_prompts
+    MANIFEST_FILENAME = "manifest.json"
 
     dirs = {
         "in": "in",
@@ -25,10 +44,21 @@ class Problem:
     }
 
     class CppProgramExecutionFailed(Exception):
-        def __init__(self, e: subprocess.CalledProcessError):
+        def __init__(
+            self,
+            e: subprocess.CalledProcessError | subprocess.TimeoutExpired,
+            usage: ResourceUsage | None = None,
+        ):
+            self.usage = usage
+            status = (
+                f"Command '{e.cmd}' timed out after {e.timeout} seconds."
+                if isinstance(e, subprocess.TimeoutExpired)
+                else f"Command '{e.cmd}' returned non-zero exit status {e.returncode}."
+            )
             self.message = "\n".join(
-                [
-                    f"Command '{e.cmd}' returned non-zero exit status {e.returncode}.",
+                [status]
+                + ([f"usage: {usage}"] if usage is not None else [])
+                + [
                     f"stdout: \n{e.stdout}",
                     f"stderr: \n{e.stderr}",
                 ]
@@ -36,12 +66,20 @@ class Problem:
             super().__init__(self.message)
 
     class IngenExecutionFailed(CppProgramExecutionFailed):
-        def __init__(self, e: subprocess.CalledProcessError):
-            super().__init__(e)
+        def __init__(
+            self,
+            e: subprocess.CalledProcessError | subprocess.TimeoutExpired,
+            usage: ResourceUsage | None = None,
+        ):
+            super().__init__(e, usage)
 
     class SolutionExecutionFailed(CppProgramExecutionFailed):
-        def __init__(self, e: subprocess.CalledProcessError):
-            super().__init__(e)
+        def __init__(
+            self,
+            e: subprocess.CalledProcessError | subprocess.TimeoutExpired,
+            usage: ResourceUsage | None = None,
+        ):
+            super().__init__(e, usage)
 
     class InvalidSolutionOutputFormat(Exception):
         def __init__(self, output):
@@ -63,17 +101,24 @@ class Problem:
 
     def __init__(self, folder_path: str = ""):
         self.statement = ""
+        # sources of problems read from a dictionary, problems of a folder read them from the folder
+        self.ingen: str | None = None
+        self.solution: str | None = None
+        self.tags: list[str] = []
+        # resource usage of the last runs of the executables, by stage
+        self.usage: dict[str, ResourceUsage] = {}
         self.id = folder_path  # todo: consider security of this bit
         if folder_path != "":
             self.read_from_folder(folder_path)
 
     def read_from_folder(self, folder_path):
         self.problem_name = Problem.get_problem_name_from_path(folder_path)
+        target_prefix = Problem.get_target_prefix(folder_path)
         self.ingen_exec_path = Problem.INGEN_EXEC_FORMAT.format(
-            problem_name=self.problem_name
+            target_prefix=target_prefix
         )
         self.solution_exec_path = Problem.SOLUTION_EXEC_FORMAT.format(
-            problem_name=self.problem_name
+            target_prefix=target_prefix
         )
         statement_path = os.path.join(folder_path, "problem-statement.md")
 
@@ -84,24 +129,131 @@ class Problem:
     def get_problem_name_from_path(problem_path: str) -> str:
         return os.path.basename(os.path.normpath(problem_path))
 
+    # name of the tasks directory of the problem, e.g. assert-tasks
     @staticmethod
-    def compile_cpp(
-        problem_paths: List[str], parallel: int = 1, verbose: bool = False
-    ) -> bool:
+    def get_tasks_dir_name(problem_path: str) -> str:
+        return os.path.basename(os.path.dirname(os.path.abspath(problem_path)))
+
+    # prefix of the cmake targets of the problem, {tasks dir}_{problem name}
+    @staticmethod
+    def get_target_prefix(problem_path: str) -> str:
+        return f"{Problem.get_tasks_dir_name(problem_path)}_{Problem.get_problem_name_from_path(problem_path)}"
+
+    # directory of the model outputs, a matrix run keeps the outputs of every model and prompt variant in its own namespace
+    @staticmethod
+    def get_model_out_dir(problem_path: str, namespace: str | None = None) -> str:
+        model_out_dir = os.path.join(problem_path, Problem.dirs["model_out"])
+        return os.path.join(model_out_dir, namespace) if namespace else model_out_dir
+
+    # hashes of the headers, shared by all sources compiled in the current directory
+    @staticmethod
+    def get_headers_hash(problem_path: str) -> str:
+        header_dirs = [
+            os.path.join(os.getcwd(), Problem.HEADERS_DIR),
+            os.path.join(
+                os.path.dirname(os.path.normpath(problem_path)), Problem.HEADERS_DIR
+            ),
+            os.path.join(problem_path, Problem.HEADERS_DIR),
+        ]
+        digest = hashlib.sha256()
+        build_file = os.path.join(os.getcwd(), "CMakeLists.txt")
+        if os.path.exists(build_file):
+            with open(build_file, "rb") as f:
+                digest.update(f.read())
+        for header_dir in dict.fromkeys(map(os.path.abspath, header_dirs)):
+            for root, dirs, files in os.walk(header_dir):
+                dirs.sort()
+                for filename in sorted(files):
+                    path = os.path.join(root, filename)
+                    digest.update(os.path.relpath(path, header_dir).encode())
+                    with open(path, "rb") as f:
+                        digest.update(f.read())
+        return digest.hexdigest()
+
+    @staticmethod
+    def get_source_hash(problem_path: str, source: str, headers_hash: str) -> str:
+        digest = hashlib.sha256(headers_hash.encode())
+        with open(os.path.join(problem_path, source), "rb") as f:
+            digest.update(f.read())
+        return digest.hexdigest()
+
+    # returns (cmake target, path to the executable, content hash of its sources) for both executables of the problem
+    @staticmethod
+    def get_build_targets(problem_path: str) -> List[tuple[str, str, str]]:
+        target_prefix = Problem.get_target_prefix(problem_path)
+        headers_hash = Problem.get_headers_hash(problem_path)
         targets = []
-        for problem_path in problem_paths:
-            problem_name = Problem.get_problem_name_from_path(problem_path)
-            gen_target = os.path.basename(
-                os.path.normpath(
-                    Problem.INGEN_EXEC_FORMAT.format(problem_name=problem_name)
+        for exec_format, source in [
+            (Problem.INGEN_EXEC_FORMAT, Problem.INGEN_SOURCE),
+            (Problem.SOLUTION_EXEC_FORMAT, Problem.SOLUTION_SOURCE),
+        ]:
+            exec_path = os.path.normpath(
+                os.path.join(
+                    problem_path, exec_format.format(target_prefix=target_prefix)
                 )
             )
-            solution_target = os.path.basename(
-                os.path.normpath(
-                    Problem.SOLUTION_EXEC_FORMAT.format(problem_name=problem_name)
+            targets.append(
+                (
+                    os.path.basename(exec_path),
+                    exec_path,
+                    Problem.get_source_hash(problem_path, source, headers_hash),
                 )
             )
-            targets.extend([gen_target, solution_target])
+        return targets
+
+    @staticmethod
+    def is_binary_fresh(exec_path: str, source_hash: str) -> bool:
+        hash_path = exec_path + Problem.HASH_SUFFIX
+        if not os.path.exists(exec_path) or not os.path.exists(hash_path):
+            return False
+        with open(hash_path, "r") as f:
+            return f.read().strip() == source_hash
+
+    @staticmethod
+    def write_binary_hash(exec_path: str, source_hash: str) -> None:
+        with open(exec_path + Problem.HASH_SUFFIX, "w") as f:
+            f.write(source_hash)
+
+    # copies src to dst through a temporary file, so that concurrent readers never see a partial binary
+    @staticmethod
+    def copy_binary(src: str, dst: str) -> None:
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        tmp_path = f"{dst}.{os.getpid()}.tmp"
+        shutil.copy2(src, tmp_path)
+        os.replace(tmp_path, dst)
+
+    # builds executables of the problems. Executables built from unchanged sources are not rebuilt,
+    # and if cache_dir is set, executables built from identical sources are shared through it.
+    @staticmethod
+    def compile_cpp(
+        problem_paths: List[str],
+        parallel: int = 1,
+        verbose: bool = False,
+        cache_dir: str | None = None,
+    ) -> bool:
+        if cache_dir is None:
+            cache_dir = os.getenv(Problem.BINARY_CACHE_ENV)
+
+        stale = []
+        for problem_path in problem_paths:
+            for target, exec_path, source_hash in Problem.get_build_targets(
+                problem_path
+            ):
+                if Problem.is_binary_fresh(exec_path, source_hash):
+                    continue
+                cached_path = (
+                    os.path.join(cache_dir, f"{source_hash}.e") if cache_dir else None
+                )
+                if cached_path and os.path.exists(cached_path):
+                    Problem.copy_binary(cached_path, exec_path)
+                    Problem.write_binary_hash(exec_path, source_hash)
+                    continue
+                stale.append((target, exec_path, source_hash, cached_path))
+
+        if not stale:
+            return True
+
+        targets = [target for target, _, _, _ in stale]
         try:
             result = subprocess.run(
                 ["cmake", "."],
@@ -109,7 +261,7 @@ class Problem:
                 stderr=sys.stderr,
                 check=True,
                 text=True,
-                cwd=os.getcwd()
+                cwd=os.getcwd(),
             )
             result = subprocess.run(
                 ["cmake", "--build", ".", "--parallel", str(parallel), "--target"]
@@ -118,39 +270,127 @@ class Problem:
                 stderr=sys.stderr,
                 check=True,
                 text=True,
-                cwd=os.getcwd()
+                cwd=os.getcwd(),
             )
-            return True
         except subprocess.CalledProcessError:
             print("Compilation failed.")
             return False
 
-    def generate_tests(self, seed: int) -> None:
-        try:
-            process = subprocess.run(
-                [self.ingen_exec_path],
-                input=str(seed),
-                cwd=self.id,
-                check=True,
-                capture_output=True,
-                text=True,
+        for _, exec_path, source_hash, cached_path in stale:
+            Problem.write_binary_hash(exec_path, source_hash)
+            if cached_path:
+                Problem.copy_binary(exec_path, cached_path)
+        return True
+
+    # runs the executable with the limits, raises `exception` if it fails or exceeds the time limit
+    def run_executable(
+        self,
+        exec_path: str,
+        input: str | bytes,
+        limits: ResourceLimits | None,
+        exception: type[CppProgramExecutionFailed],
+        args: List[str] | None = None,
+        text: bool = True,
+    ) -> tuple[str | bytes, ResourceUsage]:
+        process, usage = run_limited(
+            [exec_path] + (args or []), input, cwd=self.id, limits=limits, text=text
+        )
+        if usage.timed_out:
+            raise exception(
+                subprocess.TimeoutExpired(
+                    process.args, usage.wall_time, process.stdout, process.stderr
+                ),
+                usage,
             )
-        except subprocess.CalledProcessError as e:
-            raise Problem.IngenExecutionFailed(e) from e
+        if process.returncode != 0:
+            raise exception(
+                subprocess.CalledProcessError(
+                    process.returncode, process.args, process.stdout, process.stderr
+                ),
+                usage,
+            )
+        return process.stdout, usage
+
+    # the generator reads the seed from stdin, parameters (e.g. the size of the tests) are passed
+    # as key=value arguments, generators fall back to their defaults for parameters not given
+    def generate_tests(
+        self,
+        seed: int,
+        limits: ResourceLimits | None = None,
+        parameters: dict[str, str] | None = None,
+    ) -> None:
+        _, self.usage["ingen"] = self.run_executable(
+            self.ingen_exec_path,
+            str(seed),
+            limits,
+            Problem.IngenExecutionFailed,
+            args=[f"{key}={value}" for key, value in (parameters or {}).items()],
+        )
+
+    def run_solution(
+        self, test: str, limits: ResourceLimits | None = None
+    ) -> tuple[str, ResourceUsage]:
+        return self.run_executable(
+            self.solution_exec_path, test, limits, Problem.SolutionExecutionFailed
+        )
 
-    def generate_solution(self, test: str) -> str:
+    def generate_solution(self, test: str, limits: ResourceLimits | None = None) -> str:
+        output, _ = self.run_solution(test, limits)
+        return output
+
+    def supports_batch_protocol(self) -> bool:
+        solution_path = os.path.join(self.id, Problem.SOLUTION_SOURCE)
+        if not os.path.exists(solution_path):
+            return False
+        with open(solution_path, "r") as f:
+            return Problem.BATCH_PROTOCOL_MARKER in f.read()
+
+    # Runs the solution once for all tests. Solution is executed with BATCH_PROTOCOL_FLAG,
+    # it reads the number of tests and then for each test its length in bytes and the test itself:
+    #   <tests>\n<length>\n<test><length>\n<test>...
+    # and prints one answer per line. Returns None if the solution did not answer every test.
+    def generate_solutions_batch(
+        self, tests: List[str], limits: ResourceLimits | None = None
+    ) -> List[str] | None:
+        encoded_tests = [test.encode() for test in tests]
+        payload = f"{len(tests)}\n".encode() + b"".join(
+            f"{len(test)}\n".encode() + test for test in encoded_tests
+        )
         try:
-            process = subprocess.run(
-                [self.solution_exec_path],
-                input=str(test),
-                cwd=self.id,
-                check=True,
-                capture_output=True,
-                text=True,
+            stdout, self.usage["solutions"] = self.run_executable(
+                self.solution_exec_path,
+                payload,
+                (limits or ResourceLimits()).scaled(len(tests)),
+                Problem.SolutionExecutionFailed,
+                args=[Problem.BATCH_PROTOCOL_FLAG],
+                text=False,
+            )
+        except Problem.SolutionExecutionFailed:
+            return None
+        outputs = stdout.decode().splitlines()
+        if len(outputs) != len(tests):
+            return None
+        return outputs
+
+    # returns solution outputs for all tests, in a single process if the solution supports
+    # the batch protocol, otherwise (or if the batch run fails) in one process per test,
+    # running `parallel` processes at a time
+    def generate_solutions(
+        self,
+        tests: List[str],
+        parallel: int = 1,
+        limits: ResourceLimits | None = None,
+    ) -> List[str]:
+        if tests and self.supports_batch_protocol():
+            outputs = self.generate_solutions_batch(tests, limits)
+            if outputs is not None:
+                return outputs
+        with ThreadPoolExecutor(max_workers=parallel) as executor:
+            results = list(
+                executor.map(lambda test: self.run_solution(test, limits), tests)
             )
-            return process.stdout
-        except subprocess.CalledProcessError as e:
-            raise Problem.SolutionExecutionFailed(e) from e
+        self.usage["solutions"] = ResourceUsage.total([usage for _, usage in results])
+        return [output for output, _ in results]
 
     @staticmethod
     def clean_output(solution_output: str) -> int:
@@ -175,25 +415,14 @@ class Problem:
         clean_model_output = Problem.get_last_integer(model_output)
         return clean_solution_output == clean_model_output
 
-    def generate_prompts(
-        self, seed: int, parallel: int = 1, verbose: bool = False
-    ) -> bool:
-        if not Problem.compile_cpp([self.id], parallel, verbose):
-            return False
-
-        try:
-            self.generate_tests(seed)
-        except Problem.IngenExecutionFailed as e:
-            print(e.message)
-            return False
+    # statement compiled once, placeholders of every input are substituted in a single pass
+    def get_prompt_template(self) -> PromptTemplate:
+        return PromptTemplate(
+            self.statement, Problem.IN_KEYWORD, Problem.OUT_KEYWORD, answer="@ANS"
+        )
 
-        def generate_prompt(input: str) -> str:
-            prompt = self.statement
-            for i, input_line in enumerate(input.splitlines()):
-                prompt = prompt.replace(
-                    Problem.IN_KEYWORD.format(num=i + 1), input_line
-                )
-            return prompt.replace(Problem.OUT_KEYWORD, "@ANS")
+    def generate_prompt_files(self) -> None:
+        template = self.get_prompt_template()
 
         def get_prompt_filename(in_filename: str) -> str:
             base, _ = os.path.splitext(in_filename)
@@ -210,13 +439,18 @@ class Problem:
             os.makedirs(directory)
 
         # generate prompts from ins, which were generated into in/ directory by gen.cpp
-        process_files(
+        process_files_batch(
             input_dir=in_directory,
             output_dir=prompt_directory,
-            modify_content=lambda content: [generate_prompt(content)],
+            modify_contents=lambda contents: [
+                [prompt] for prompt in template.render_all(contents)
+            ],
             modify_filename=lambda filename: [get_prompt_filename(filename)],
         )
 
+    def generate_solution_files(
+        self, parallel: int = 1, limits: ResourceLimits | None = None
+    ) -> None:
         def get_out_filename(in_filename: str) -> str:
             base, _ = os.path.splitext(in_filename)
             return f"{base}.out"
@@ -225,28 +459,158 @@ class Problem:
         solution_out_in_directory = f'{self.id}/{Problem.dirs["out"]}'
 
         # generate solutions from ins, which were generated into solution-in/ directory by gen.cpp
+        process_files_batch(
+            input_dir=solution_in_directory,
+            output_dir=solution_out_in_directory,
+            modify_contents=lambda test_ins: [
+                [str(Problem.clean_output(output))]
+                for output in self.generate_solutions(test_ins, parallel, limits)
+            ],
+            modify_filename=lambda filename: [get_out_filename(filename)],
+        )
+
+    # returns relative path -> content hash of every file in the given directories of the problem
+    def hash_generated_files(self, dir_keys: List[str]) -> dict[str, str]:
+        hashes = {}
+        for dir_key in dir_keys:
+            directory = os.path.join(self.id, Problem.dirs[dir_key])
+            if not os.path.isdir(directory):
+                continue
+            for filename in os.listdir(directory):
+                path = os.path.join(directory, filename)
+                if os.path.isdir(path):
+                    continue
+                with open(path, "rb") as f:
+                    hashes[os.path.join(Problem.dirs[dir_key], filename)] = (
+                        hashlib.sha256(f.read()).hexdigest()
+                    )
+        return hashes
+
+    def read_manifest(self) -> dict:
+        manifest_path = os.path.join(self.id, Problem.MANIFEST_FILENAME)
+        if not os.path.exists(manifest_path):
+            return {}
         try:
-            process_files(
-                input_dir=solution_in_directory,
-                output_dir=solution_out_in_directory,
-                modify_content=lambda test_in: [
-                    str(Problem.clean_output(self.generate_solution(test_in)))
-                ],
-                modify_filename=lambda filename: [get_out_filename(filename)],
-            )
-        except (
-            Problem.SolutionExecutionFailed,
-            Problem.InvalidSolutionOutputFormat,
-        ) as e:
-            print(e.message)
+            with open(manifest_path, "r") as f:
+                return json.load(f)
+        except json.JSONDecodeError:
+            return {}
+
+    def write_manifest(self, manifest: dict) -> None:
+        manifest_path = os.path.join(self.id, Problem.MANIFEST_FILENAME)
+        with open(manifest_path + ".tmp", "w") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(manifest_path + ".tmp", manifest_path)
+
+    # generates tests, prompts and solution outputs. Stages whose inputs did not change since the last run,
+    # according to the manifest, are skipped: tests depend on the seed, the generator parameters and gen.cpp, prompts on the tests
+    # and the statement, solution outputs on the tests and solution.cpp.
+    # compile can be unset when the executables were already built, e.g. by a single compile_cpp call for many problems
+    # executables run with the given limits, solutions run in `parallel` processes
+    def generate_prompts(
+        self,
+        seed: int,
+        parallel: int = 1,
+        verbose: bool = False,
+        compile: bool = True,
+        limits: ResourceLimits | None = None,
+        parameters: dict[str, str] | None = None,
+    ) -> bool:
+        parameters = parameters or {}
+        if compile and not Problem.compile_cpp([self.id], parallel, verbose):
             return False
 
+        manifest = self.read_manifest()
+        (_, _, ingen_hash), (_, _, solution_hash) = Problem.get_build_targets(self.id)
+        statement_hash = hashlib.sha256(self.statement.encode()).hexdigest()
+
+        def is_fresh(dir_keys: List[str]) -> bool:
+            files = self.hash_generated_files(dir_keys)
+            recorded = {
+                path: file_hash
+                for path, file_hash in manifest.get("files", {}).items()
+                if any(
+                    path.startswith(Problem.dirs[dir_key] + os.sep)
+                    for dir_key in dir_keys
+                )
+            }
+            return len(files) > 0 and files == recorded
+
+        tests_fresh = (
+            manifest.get("seed") == seed
+            and manifest.get("parameters", {}) == parameters
+            and manifest.get("ingen_hash") == ingen_hash
+            and is_fresh(["in", "solution-in"])
+        )
+        if not tests_fresh:
+            try:
+                self.generate_tests(seed, limits, parameters)
+            except Problem.IngenExecutionFailed as e:
+                print(e.message)
+                return False
+
+        if not (
+            tests_fresh
+            and manifest.get("statement_hash") == statement_hash
+            and is_fresh(["prompt_in"])
+        ):
+            try:
+                self.generate_prompt_files()
+            except PromptTemplate.UnboundPlaceholder as e:
+                print(e.message)
+                return False
+
+        if not (
+            tests_fresh
+            and manifest.get("solution_hash") == solution_hash
+            and is_fresh(["out"])
+        ):
+            try:
+                self.generate_solution_files(parallel, limits)
+            except (
+                Problem.SolutionExecutionFailed,
+                Problem.InvalidSolutionOutputFormat,
+            ) as e:
+                print(e.message)
+                return False
+
+        self.write_manifest(
+            {
+                "seed": seed,
+                "parameters": parameters,
+                "ingen_hash": ingen_hash,
+                "solution_hash": solution_hash,
+                "statement_hash": statement_hash,
+                "files": self.hash_generated_files(
+                    ["in", "solution-in", "prompt_in", "out"]
+                ),
+                # usage of the stages which were skipped comes from the previous run
+                "usage": manifest.get("usage", {})
+                | {stage: usage.to_dict() for stage, usage in self.usage.items()},
+            }
+        )
+        if verbose:
+            for stage, usage in self.usage.items():
+                print(f"PROBLEM {self.id} {stage.upper()} {usage}")
         return True
 
+    # source of the problem folder, unless it was read from a dictionary
+    def read_source(self, source: str | None, filename: str) -> str | None:
+        if source is not None:
+            return source
+        path = os.path.join(self.id, filename)
+        if not self.id or not os.path.exists(path):
+            return None
+        with open(path, "r") as f:
+            return f.read()
+
     def to_dict(self):
         return {
+            "ingen": self.read_source(self.ingen, Problem.INGEN_SOURCE),
+            "solution": self.read_source(self.solution, Problem.SOLUTION_SOURCE),
             "statement": self.statement,
             "id": self.id,
+            "tags": self.tags,
         }
 
     @staticmethod
@@ -254,6 +618,9 @@ class Problem:
         problem = Problem()
         problem.statement = data["statement"]
         problem.id = data["id"]
+        problem.ingen = data.get("ingen")
+        problem.solution = data.get("solution")
+        problem.tags = data.get("tags", [])
         return problem
 
     @staticmethod
@@ -0,0 +1,307 @@
+import time
+import asyncio
+import threading
+import contextvars
+import telemetry
+from chat import Chat, PartialCompletions
+from typing import Dict, List
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Token bucket refilled continuously with `per_minute` tokens per minute.
+# Reservations are taken up front and may overdraw the bucket, the caller then waits
+# until the refill covers its reservation. This keeps requests in FIFO order without polling.
+class TokenBucket:
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    # reserves `amount` tokens, returns the number of seconds to wait before using them
+    def reserve(self, amount: float) -> float:
+        amount = min(amount, self.capacity)
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            self.tokens -= amount
+            return max(0.0, -self.tokens / self.rate)
+
+
+# Concurrency limit controlled by additive increase / multiplicative decrease.
+# The limit grows by one per success until the first rate limit (slow start), then by one per `limit` successes.
+# A rate limit halves the limit and escalates a shared, exponential backoff pausing every caller, both once per congestion event.
+class AdaptiveConcurrency:
+    def __init__(
+        self,
+        max_limit: int,
+        min_limit: int = 1,
+        decrease: float = 0.5,
+        initial_backoff: float = 1.0,
+        max_backoff: float = 64.0,
+    ):
+        self.max_limit = max(max_limit, min_limit)
+        self.min_limit = min_limit
+        self.decrease = decrease
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+
+        self.limit = float(min_limit)
+        self.peak = min_limit
+        self.in_flight = 0
+        self.slow_start = True
+        self.rate_limit_hits = 0
+        self.consecutive_rate_limits = 0
+        self.last_decrease = 0.0
+        self.paused_until = 0.0
+        self.condition = threading.Condition()
+
+    # returns (acquired, seconds to wait before trying again). Must be called with the condition held
+    def _try_acquire(self) -> tuple[bool, float]:
+        pause = self.paused_until - time.monotonic()
+        if pause > 0:
+            return False, pause
+        if self.in_flight >= int(self.limit):
+            return False, 0.0
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        return True, 0.0
+
+    # blocks until a slot is free, returns a ticket which has to be passed to release
+    def acquire(self) -> float:
+        with self.condition:
+            while True:
+                acquired, wait = self._try_acquire()
+                if acquired:
+                    return time.monotonic()
+                self.condition.wait(wait if wait > 0 else None)
+
+    async def aacquire(self, poll_interval: float = 0.01) -> float:
+        while True:
+            with self.condition:
+                acquired, wait = self._try_acquire()
+            if acquired:
+                return time.monotonic()
+            await asyncio.sleep(max(wait, poll_interval))
+
+    # requests which failed with errors other than rate limits (5xx, timeouts) say nothing about the capacity
+    # of the provider, their slots are released without changing the limit or resetting the backoff
+    def release(
+        self, ticket: float, rate_limited: bool = False, failed: bool = False
+    ) -> None:
+        with self.condition:
+            self.in_flight -= 1
+            if rate_limited:
+                self.rate_limit_hits += 1
+                self.slow_start = False
+                # requests sent before the last decrease saw the old limit and belong to the same congestion
+                # event, they neither decrease the limit nor escalate the backoff again
+                if ticket > self.last_decrease:
+                    self.limit = max(self.min_limit, self.limit * self.decrease)
+                    self.last_decrease = time.monotonic()
+                    backoff = min(
+                        self.max_backoff,
+                        self.initial_backoff * 2**self.consecutive_rate_limits,
+                    )
+                    self.consecutive_rate_limits += 1
+                    self.paused_until = max(
+                        self.paused_until, time.monotonic() + backoff
+                    )
+            elif not failed:
+                self.consecutive_rate_limits = 0
+                increase = 1.0 if self.slow_start else 1.0 / self.limit
+                self.limit = min(self.max_limit, self.limit + increase)
+            self.condition.notify_all()
+
+
+# Process-wide limiter of a single provider, shared by every thread and coroutine using it.
+class ProviderLimiter:
+    def __init__(
+        self,
+        provider: str,
+        max_concurrency: int,
+        requests_per_minute: float | None = None,
+        tokens_per_minute: float | None = None,
+    ):
+        self.provider = provider
+        self.concurrency = AdaptiveConcurrency(max_concurrency)
+        self.requests = (
+            TokenBucket(requests_per_minute) if requests_per_minute else None
+        )
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+    def _budget_wait(self, requests: int, tokens: int) -> float:
+        return max(
+            self.requests.reserve(requests) if self.requests else 0.0,
+            self.tokens.reserve(tokens) if self.tokens else 0.0,
+        )
+
+    def acquire(self, requests: int = 1, tokens: int = 0) -> float:
+        time.sleep(self._budget_wait(requests, tokens))
+        return self.concurrency.acquire()
+
+    async def aacquire(self, requests: int = 1, tokens: int = 0) -> float:
+        await asyncio.sleep(self._budget_wait(requests, tokens))
+        return await self.concurrency.aacquire()
+
+    def release(
+        self, ticket: float, rate_limited: bool = False, failed: bool = False
+    ) -> None:
+        self.concurrency.release(ticket, rate_limited, failed)
+
+    def report(self) -> str:
+        return (
+            f"PROVIDER {self.provider} CONCURRENCY: {int(self.concurrency.limit)} "
+            f"(peak {self.concurrency.peak}, max {self.concurrency.max_limit}, "
+            f"rate limited {self.concurrency.rate_limit_hits} times)"
+        )
+
+
+limiters: Dict[str, ProviderLimiter] = {}
+limiters_lock = threading.Lock()
+
+
+# returns the limiter of the provider, creating it on the first call
+def get_limiter(
+    provider: str,
+    max_concurrency: int,
+    requests_per_minute: float | None = None,
+    tokens_per_minute: float | None = None,
+) -> ProviderLimiter:
+    with limiters_lock:
+        if provider not in limiters:
+            limiters[provider] = ProviderLimiter(
+                provider, max_concurrency, requests_per_minute, tokens_per_minute
+            )
+        return limiters[provider]
+
+
+# Chat which sends requests of the wrapped chat through the limiter of its provider.
+# Rate limit errors (Chat.RATE_LIMIT_ERRORS) are retried here, so that the backoff is shared by all callers.
+class RateLimitedChat(Chat):
+    CHARS_PER_TOKEN = 4
+    MAX_RATE_LIMIT_RETRIES = 10
+
+    def __init__(
+        self, chat: Chat, limiter: ProviderLimiter, completion_tokens: int = 256
+    ):
+        self.chat = chat
+        self.limiter = limiter
+        self.completion_tokens = completion_tokens
+        self.client = chat.client
+        self.model = chat.model
+        self.system_prompt = chat.system_prompt
+        self.PROVIDER = chat.PROVIDER
+        self.stop_rule = chat.stop_rule
+
+    # rough estimate of the tokens counted against the tokens per minute budget
+    def estimate_tokens(self, message: str, completions: int) -> int:
+        prompt_tokens = (
+            len(self.system_prompt) + len(message)
+        ) // RateLimitedChat.CHARS_PER_TOKEN
+        return prompt_tokens + completions * self.completion_tokens
+
+    # completions of every request to the provider. Chats without native support for multiple completions
+    # get a request per NATIVE_COMPLETIONS completions, each of them taking its own concurrency slot,
+    # instead of fanning them out under a single slot (Chat.fan_out)
+    def split_requests(self, completions: int) -> List[int]:
+        native = self.chat.NATIVE_COMPLETIONS
+        if native is None:
+            return [completions]
+        return [min(native, completions - i) for i in range(0, completions, native)]
+
+    # releases the ticket of a failed request, raises the error unless the request is retried:
+    # rate limit errors are retried up to MAX_RATE_LIMIT_RETRIES times
+    def release_failed(self, ticket: float, error: BaseException, attempt: int) -> None:
+        rate_limited = isinstance(error, self.chat.RATE_LIMIT_ERRORS)
+        self.limiter.release(ticket, rate_limited=rate_limited, failed=True)
+        if not rate_limited or attempt == RateLimitedChat.MAX_RATE_LIMIT_RETRIES:
+            raise error
+        telemetry.record_rate_limit_retry()
+
+    # requests are sent concurrently, every one of them retried on its own.
+    # If any of them fails, its error is raised once all of them are done
+    def prompt(self, message: str, completions: int = 1, **kwargs) -> List[str]:
+        requests = self.split_requests(completions)
+        if len(requests) == 1:
+            return self.prompt_request(message, completions, **kwargs)
+        with ThreadPoolExecutor(max_workers=len(requests)) as executor:
+            # every request runs in a copy of the caller's context (telemetry of the call)
+            futures = [
+                executor.submit(
+                    contextvars.copy_context().run,
+                    self.prompt_request,
+                    message,
+                    count,
+                    **kwargs,
+                )
+                for count in requests
+            ]
+        return [response for future in futures for response in future.result()]
+
+    async def aprompt(self, message: str, completions: int = 1, **kwargs) -> List[str]:
+        results = await asyncio.gather(
+            *(
+                self.aprompt_request(message, count, **kwargs)
+                for count in self.split_requests(completions)
+            ),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return [response for responses in results for response in responses]
+
+    # a single request to the provider. Completions of fanned out requests which succeeded
+    # are kept (PartialCompletions), a retry requests only the missing ones
+    def prompt_request(self, message: str, completions: int, **kwargs) -> List[str]:
+        received: List[str] = []
+        for attempt in range(RateLimitedChat.MAX_RATE_LIMIT_RETRIES + 1):
+            missing = completions - len(received)
+            start = time.monotonic()
+            ticket = self.limiter.acquire(1, self.estimate_tokens(message, missing))
+            telemetry.record_queue_time(time.monotonic() - start)
+            try:
+                responses = self.chat.prompt(message, missing, **kwargs)
+            except PartialCompletions as e:
+                received += e.completions
+                self.release_failed(ticket, e.error, attempt)
+                continue
+            except self.chat.RATE_LIMIT_ERRORS as e:
+                self.release_failed(ticket, e, attempt)
+                continue
+            except BaseException:
+                self.limiter.release(ticket, failed=True)
+                raise
+            self.limiter.release(ticket)
+            return received + responses
+
+    async def aprompt_request(
+        self, message: str, completions: int, **kwargs
+    ) -> List[str]:
+        received: List[str] = []
+        for attempt in range(RateLimitedChat.MAX_RATE_LIMIT_RETRIES + 1):
+            missing = completions - len(received)
+            start = time.monotonic()
+            ticket = await self.limiter.aacquire(
+                1, self.estimate_tokens(message, missing)
+            )
+            telemetry.record_queue_time(time.monotonic() - start)
+            try:
+                responses = await self.chat.aprompt(message, missing, **kwargs)
+            except PartialCompletions as e:
+                received += e.completions
+                self.release_failed(ticket, e.error, attempt)
+                continue
+            except self.chat.RATE_LIMIT_ERRORS as e:
+                self.release_failed(ticket, e, attempt)
+                continue
+            except BaseException:
+                self.limiter.release(ticket, failed=True)
+                raise
+            self.limiter.release(ticket)
+            return received + responses
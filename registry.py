@@ -0,0 +1,79 @@
+import importlib
+from chat import Chat
+from dataclasses import dataclass
+from importlib.metadata import entry_points
+from typing import Dict, List
+
+# Registry of the chat backends selectable by name in eval.py. The module of a backend is imported only
+# when the backend is created, so a run does not load the SDKs of providers it does not use.
+# Other packages add backends with an entry point of the group ENTRY_POINT_GROUP, e.g. in pyproject.toml:
+#   [project.entry-points."ai_bench.providers"]
+#   my-model = "my_package.my_chat:MyChat"
+# The name of the entry point is the name of the backend and the model passed to the chat,
+# the chat is created with keyword arguments model and system_prompt (see chat.Chat).
+
+ENTRY_POINT_GROUP = "ai_bench.providers"
+
+
+@dataclass(frozen=True)
+class Backend:
+    # "module:Class" of the chat
+    target: str
+    # name of the model passed to the chat
+    model: str
+    # format of the batch files of the provider (see batch.py), None if it has no batch endpoint
+    batch_format: str | None = None
+
+    def load(self) -> type[Chat]:
+        module_name, _, class_name = self.target.partition(":")
+        return getattr(importlib.import_module(module_name), class_name)
+
+
+BACKENDS: Dict[str, Backend] = {
+    "gemini": Backend("gemini:Gemini", "gemini-1.5-pro"),
+    "gemini-flash": Backend("gemini:Gemini", "gemini-1.5-flash"),
+    "gpt": Backend("chatgpt:ChatGPT", "gpt-3.5-turbo", "openai"),
+    "gpt4": Backend("chatgpt:ChatGPT", "gpt-4-turbo", "openai"),
+    # local simulator of a provider, see simulator.py. Its batch files are answered by batch.py
+    "simulated": Backend("simulator:SimulatedChat", "simulated", "openai"),
+}
+entry_points_loaded = False
+
+
+def register(
+    name: str, target: str, model: str | None = None, batch_format: str | None = None
+) -> None:
+    BACKENDS[name] = Backend(target, model or name, batch_format)
+
+
+# adds the backends of the installed entry points, built-in and registered backends take precedence.
+# Only the metadata of the packages is read, nothing is imported
+def load_entry_points() -> None:
+    global entry_points_loaded
+    if entry_points_loaded:
+        return
+    entry_points_loaded = True
+    for entry_point in entry_points(group=ENTRY_POINT_GROUP):
+        BACKENDS.setdefault(
+            entry_point.name, Backend(entry_point.value, entry_point.name)
+        )
+
+
+def get_backend(name: str) -> Backend:
+    if name not in BACKENDS:
+        load_entry_points()
+    if name not in BACKENDS:
+        raise KeyError(
+            f"Unknown model {name}, available models: {', '.join(available())}"
+        )
+    return BACKENDS[name]
+
+
+def available() -> List[str]:
+    load_entry_points()
+    return list(BACKENDS)
+
+
+def create_chat(name: str, system_prompt: str) -> Chat:
+    backend = get_backend(name)
+    return backend.load()(model=backend.model, system_prompt=system_prompt)
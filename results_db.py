@@ -0,0 +1,178 @@
+import time
+import sqlite3
+import argparse
+import threading
+from dataclasses import dataclass
+from typing import List
+
+
+# result of a single completion of a single test
+@dataclass
+class TestResult:
+    test: str
+    completion: int
+    extracted: int | None
+    expected: int
+    correct: bool
+    latency: float | None = None
+
+
+# Local SQLite store of evaluation runs, one row per (run, model, problem, test, completion).
+class ResultsDatabase:
+    DEFAULT_PATH = "results.sqlite3"
+
+    def __init__(self, path: str = DEFAULT_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS runs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                started_at REAL NOT NULL,
+                model TEXT NOT NULL,
+                system_prompt TEXT NOT NULL,
+                num_tests INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS results (
+                run_id INTEGER NOT NULL REFERENCES runs (id),
+                model TEXT NOT NULL,
+                problem TEXT NOT NULL,
+                test TEXT NOT NULL,
+                completion INTEGER NOT NULL,
+                extracted TEXT,
+                expected TEXT NOT NULL,
+                correct INTEGER NOT NULL,
+                latency REAL,
+                PRIMARY KEY (run_id, problem, test, completion)
+            );
+            CREATE INDEX IF NOT EXISTS results_model ON results (model, problem);
+            CREATE INDEX IF NOT EXISTS results_test ON results (problem, test);
+            """)
+        self.connection.commit()
+
+    def start_run(
+        self, model: str, system_prompt: str, num_tests: int
+    ) -> "RunRecorder":
+        with self.lock:
+            cursor = self.connection.execute(
+                "INSERT INTO runs (started_at, model, system_prompt, num_tests) VALUES (?, ?, ?, ?)",
+                (time.time(), model, system_prompt, num_tests),
+            )
+            self.connection.commit()
+        return RunRecorder(self, cursor.lastrowid, model)
+
+    def insert_results(
+        self, run_id: int, model: str, problem: str, results: List[TestResult]
+    ) -> None:
+        with self.lock:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        run_id,
+                        model,
+                        problem,
+                        result.test,
+                        result.completion,
+                        None if result.extracted is None else str(result.extracted),
+                        str(result.expected),
+                        int(result.correct),
+                        result.latency,
+                    )
+                    for result in results
+                ],
+            )
+            self.connection.commit()
+
+    def query(self, sql: str, parameters: tuple = ()) -> List[tuple]:
+        with self.lock:
+            return self.connection.execute(sql, parameters).fetchall()
+
+    # model, number of runs, answers, accuracy over the last `last_runs` runs of each model (all if None)
+    def accuracy_per_model(self, last_runs: int | None = None) -> List[tuple]:
+        return self.query(
+            """
+            WITH ranked AS (
+                SELECT id, model, ROW_NUMBER() OVER (PARTITION BY model ORDER BY id DESC) AS position
+                FROM runs
+            )
+            SELECT results.model, COUNT(DISTINCT results.run_id), COUNT(*), AVG(results.correct)
+            FROM results JOIN ranked ON ranked.id = results.run_id
+            WHERE ? IS NULL OR ranked.position <= ?
+            GROUP BY results.model
+            ORDER BY results.model
+            """,
+            (last_runs, last_runs),
+        )
+
+    # problem, test, number of answers of the tests which no model ever answered correctly
+    def failing_tests(self) -> List[tuple]:
+        return self.query("""
+            SELECT problem, test, COUNT(*)
+            FROM results
+            GROUP BY problem, test
+            HAVING MAX(correct) = 0
+            ORDER BY problem, test
+            """)
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+# results of a single run
+class RunRecorder:
+    def __init__(self, database: ResultsDatabase, run_id: int, model: str):
+        self.database = database
+        self.run_id = run_id
+        self.model = model
+
+    def record(self, problem: str, results: List[TestResult]) -> None:
+        self.database.insert_results(self.run_id, self.model, problem, results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the evaluation results")
+    parser.add_argument(
+        "query",
+        choices=["accuracy", "failing", "runs"],
+        help="accuracy - accuracy per model, failing - tests failed by every model, runs - list of runs",
+    )
+    parser.add_argument(
+        "--db",
+        type=str,
+        help="Path to the results database",
+        default=ResultsDatabase.DEFAULT_PATH,
+    )
+    parser.add_argument(
+        "--last",
+        type=int,
+        help="Use only the last N runs of each model (accuracy)",
+        default=None,
+    )
+
+    args = parser.parse_args()
+
+    database = ResultsDatabase(args.db)
+    match args.query:
+        case "accuracy":
+            for model, runs, answers, accuracy in database.accuracy_per_model(
+                args.last
+            ):
+                print(
+                    f"MODEL {model} RUNS: {runs} ANSWERS: {answers} ACCURACY: {accuracy:.3f}"
+                )
+        case "failing":
+            for problem, test, answers in database.failing_tests():
+                print(f"PROBLEM {problem} TEST {test} FAILED: {answers}/{answers}")
+        case "runs":
+            for run_id, started_at, model, _, num_tests in database.query(
+                "SELECT * FROM runs ORDER BY id"
+            ):
+                print(
+                    f"RUN {run_id} {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(started_at))} MODEL {model} TESTS {num_tests}"
+                )
+    database.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import math
+from dataclasses import dataclass
+
+
+# Wilson score interval of the success probability after `correct` successes in `total` trials
+def wilson_interval(correct: int, total: int, z: float = 1.96) -> tuple[float, float]:
+    if total == 0:
+        return 0.0, 1.0
+    p = correct / total
+    denominator = 1 + z * z / total
+    center = (p + z * z / (2 * total)) / denominator
+    margin = z * math.sqrt(p * (1 - p) / total + z * z / (4 * total * total))
+    margin /= denominator
+    return max(0.0, center - margin), min(1.0, center + margin)
+
+
+# Sampling of completions in rounds of `round_size` completions per prompt.
+# Sampling of a problem stops once the confidence interval of its accuracy is narrower than `ci_width`,
+# once every answer so far agrees and the interval lies on one side of 50% (clearly 0% or 100%),
+# or after `max_tests` completions per prompt.
+@dataclass
+class AdaptiveSampling:
+    round_size: int
+    max_tests: int
+    ci_width: float = 0.2
+    # z-score of the confidence level, 1.96 for 95%
+    z: float = 1.96
+
+    # number of completions per prompt after the next round
+    def next_round(self, sampled: int) -> int:
+        return min(sampled + self.round_size, self.max_tests)
+
+    def should_stop(self, sampled: int, correct: int, total: int) -> bool:
+        if sampled >= self.max_tests:
+            return True
+        lower, upper = wilson_interval(correct, total, self.z)
+        if upper - lower <= self.ci_width:
+            return True
+        if correct == 0:
+            return upper < 0.5
+        if correct == total:
+            return lower > 0.5
+        return False
@@ -0,0 +1,146 @@
+import os
+import time
+import threading
+import subprocess
+from dataclasses import dataclass, asdict
+from typing import List
+
+
+@dataclass
+class ResourceLimits:
+    # wall-clock time in seconds after which the program is killed
+    timeout: float | None = 60.0
+    # cpu time in seconds (RLIMIT_CPU)
+    cpu_time: int | None = None
+    # address space in bytes (RLIMIT_AS)
+    memory: int | None = None
+
+    # limits for a single process running `runs` programs one after another
+    def scaled(self, runs: int) -> "ResourceLimits":
+        return ResourceLimits(
+            timeout=self.timeout * runs if self.timeout else None,
+            cpu_time=self.cpu_time * runs if self.cpu_time else None,
+            memory=self.memory,
+        )
+
+
+@dataclass
+class ResourceUsage:
+    wall_time: float
+    cpu_time: float
+    # max resident set size in KiB
+    max_rss: int
+    timed_out: bool = False
+
+    def __str__(self) -> str:
+        return (
+            f"wall time: {self.wall_time:.3f}s, cpu time: {self.cpu_time:.3f}s, "
+            f"max rss: {self.max_rss} KiB{', timed out' if self.timed_out else ''}"
+        )
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    # summary of many runs: total times, max memory
+    @staticmethod
+    def total(usages: List["ResourceUsage"]) -> "ResourceUsage":
+        return ResourceUsage(
+            wall_time=sum(usage.wall_time for usage in usages),
+            cpu_time=sum(usage.cpu_time for usage in usages),
+            max_rss=max((usage.max_rss for usage in usages), default=0),
+            timed_out=any(usage.timed_out for usage in usages),
+        )
+
+
+# command running the program under the cpu time and memory limits. The limits are set by a shell which then
+# execs the program, preexec_fn is not used because programs are run from threads (see Problem.generate_solutions)
+def limited_command(args: List[str], limits: ResourceLimits) -> List[str]:
+    ulimits = []
+    if limits.cpu_time:
+        # SIGXCPU at the soft limit, SIGKILL a second later
+        ulimits += [
+            f"ulimit -S -t {limits.cpu_time}",
+            f"ulimit -H -t {limits.cpu_time + 1}",
+        ]
+    if limits.memory:
+        ulimits.append(f"ulimit -v {limits.memory // 1024}")
+    if not ulimits:
+        return args
+    return ["/bin/sh", "-c", " && ".join(ulimits + ['exec "$@"']), "sh", *args]
+
+
+# Runs the program with the given limits and measures its resource usage.
+# Unlike subprocess.run, the child is reaped with wait4, which reports the cpu time and memory of this child only.
+# Does not raise on non-zero exit status nor on timeout, check returncode and usage.timed_out instead.
+def run_limited(
+    args: List[str],
+    input: str | bytes = b"",
+    cwd: str | None = None,
+    limits: ResourceLimits | None = None,
+    text: bool = True,
+) -> tuple[subprocess.CompletedProcess, ResourceUsage]:
+    limits = limits or ResourceLimits()
+
+    if isinstance(input, str):
+        input = input.encode()
+
+    start = time.monotonic()
+    process = subprocess.Popen(
+        limited_command(args, limits),
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        cwd=cwd,
+    )
+
+    timed_out = threading.Event()
+
+    def kill():
+        timed_out.set()
+        process.kill()
+
+    timer = threading.Timer(limits.timeout, kill) if limits.timeout else None
+    outputs = {}
+
+    def read(name, stream):
+        outputs[name] = stream.read()
+
+    readers = [
+        threading.Thread(target=read, args=("stdout", process.stdout)),
+        threading.Thread(target=read, args=("stderr", process.stderr)),
+    ]
+    for reader in readers:
+        reader.start()
+    if timer:
+        timer.start()
+
+    try:
+        process.stdin.write(input)
+        process.stdin.close()
+    except BrokenPipeError:
+        pass
+
+    _, status, rusage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    wall_time = time.monotonic() - start
+    if timer:
+        timer.cancel()
+    for reader in readers:
+        reader.join()
+    process.stdout.close()
+    process.stderr.close()
+
+    stdout, stderr = outputs["stdout"], outputs["stderr"]
+    if text:
+        stdout, stderr = stdout.decode(), stderr.decode()
+
+    usage = ResourceUsage(
+        wall_time=wall_time,
+        cpu_time=rusage.ru_utime + rusage.ru_stime,
+        max_rss=rusage.ru_maxrss,
+        timed_out=timed_out.is_set(),
+    )
+    return (
+        subprocess.CompletedProcess(args, process.returncode, stdout, stderr),
+        usage,
+    )
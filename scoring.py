@@ -0,0 +1,400 @@
+import os
+import json
+import argparse
+import numpy as np
+from dataclasses import dataclass
+from typing import Dict, List
+from results_db import ResultsDatabase, TestResult
+
+# Statistics of large result sets computed with NumPy over all completions at once:
+# accuracy, pass@k, majority vote accuracy and bootstrap confidence intervals per problem and per category.
+# Categories of problems are read from a JSON object problem -> category, e.g. {"graph-task": "graphs"},
+# keyed by the problem path or its directory name.
+
+DEFAULT_CATEGORIES_PATH = "categories.json"
+UNCATEGORIZED = "uncategorized"
+# max number of sampled tests held in memory at once by the bootstrap
+BOOTSTRAP_CHUNK = 10_000_000
+INT64_MIN = -(2**63)
+INT64_MAX = 2**63 - 1
+
+
+# distinct values in the order of their first appearance and the index of every value among them.
+# Hashing is several times faster than np.unique, which sorts the strings.
+def factorize(values: List[str]) -> tuple[np.ndarray, np.ndarray]:
+    index: Dict[str, int] = {}
+    codes = np.asarray(
+        [index.setdefault(value, len(index)) for value in values], dtype=np.int64
+    )
+    return np.asarray(list(index), dtype=str), codes
+
+
+# Results of completions as arrays, tests are numbered across all problems
+@dataclass
+class ScoreArrays:
+    problem_names: np.ndarray
+    # per test: index of its problem, name of the test and the expected answer
+    test_problem: np.ndarray
+    test_names: np.ndarray
+    expected: np.ndarray
+    # per completion: index of its test, the extracted answer and whether there is one
+    test: np.ndarray
+    extracted: np.ndarray
+    answered: np.ndarray
+
+    @property
+    def correct(self) -> np.ndarray:
+        return self.answered & (self.extracted == self.expected[self.test])
+
+    # builds the arrays from one value per completion, extracted answers are None if the model gave none
+    @staticmethod
+    def from_columns(
+        problems: List[str],
+        tests: List[str],
+        extracted: List[int | None],
+        expected: List[int],
+    ) -> "ScoreArrays":
+        problem_names, problem_index = factorize(problems)
+        test_name_values, test_name_index = factorize(tests)
+        # a test is identified by its problem and its name
+        keys = problem_index * len(test_name_values) + test_name_index
+        test_keys, first, test_index = np.unique(
+            keys, return_index=True, return_inverse=True
+        )
+        # answers out of the range of int64 never match the expected output of a solution
+        answered = np.fromiter(
+            (
+                value is not None and INT64_MIN <= value <= INT64_MAX
+                for value in extracted
+            ),
+            dtype=bool,
+            count=len(extracted),
+        )
+        extracted_values = np.fromiter(
+            (
+                value if is_answered else 0
+                for value, is_answered in zip(extracted, answered)
+            ),
+            dtype=np.int64,
+            count=len(extracted),
+        )
+        return ScoreArrays(
+            problem_names=problem_names,
+            test_problem=test_keys // len(test_name_values),
+            test_names=test_name_values[test_keys % len(test_name_values)],
+            expected=np.asarray(expected, dtype=np.int64)[first],
+            test=test_index.reshape(-1),
+            extracted=extracted_values,
+            answered=answered,
+        )
+
+    @staticmethod
+    def from_results(results: Dict[str, List[TestResult]]) -> "ScoreArrays":
+        rows = [
+            (problem, result.test, result.extracted, result.expected)
+            for problem, problem_results in results.items()
+            for result in problem_results
+        ]
+        return ScoreArrays.from_columns(*map(list, zip(*rows)) if rows else [[]] * 4)
+
+
+def parse_answer(value: str | None) -> int | None:
+    return None if value is None else int(value)
+
+
+# results of the given runs (every run if None) of the results database
+def load_from_database(
+    database: ResultsDatabase, run_ids: List[int] | None = None
+) -> ScoreArrays:
+    if run_ids is None:
+        rows = database.query(
+            "SELECT problem, test, extracted, expected FROM results ORDER BY rowid"
+        )
+    else:
+        rows = database.query(
+            f"SELECT problem, test, extracted, expected FROM results WHERE run_id IN ({', '.join('?' * len(run_ids))}) ORDER BY rowid",
+            tuple(run_ids),
+        )
+    problems, tests, extracted, expected = map(list, zip(*rows)) if rows else [[]] * 4
+    return ScoreArrays.from_columns(
+        problems,
+        tests,
+        [parse_answer(value) for value in extracted],
+        [int(value) for value in expected],
+    )
+
+
+# id of the last run of every model in the results database
+def last_runs(database: ResultsDatabase) -> Dict[str, int]:
+    return dict(database.query("SELECT model, MAX(id) FROM runs GROUP BY model"))
+
+
+# problem -> category read from the JSON file, empty if the file does not exist
+def load_categories(path: str = DEFAULT_CATEGORIES_PATH) -> Dict[str, str]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def get_category(problem: str, categories: Dict[str, str]) -> str:
+    return categories.get(
+        problem,
+        categories.get(os.path.basename(os.path.normpath(problem)), UNCATEGORIZED),
+    )
+
+
+# unbiased estimator of the probability that at least one of k completions is correct,
+# from n completions of which c are correct: 1 - C(n - c, k) / C(n, k). NaN for tests with fewer than k completions.
+def pass_at_k(n: np.ndarray, c: np.ndarray, k: int) -> np.ndarray:
+    n = n.astype(np.float64)
+    ratio = np.ones_like(n)
+    for j in range(k):
+        ratio *= np.clip(n - c - j, 0, None) / np.where(n - j > 0, n - j, 1)
+    return np.where(n >= k, 1 - ratio, np.nan)
+
+
+# per test: whether the most frequent extracted answer is correct (ties go to the smallest answer),
+# tests without any answers are not correct
+def majority_vote(arrays: ScoreArrays) -> np.ndarray:
+    if arrays.answered.sum() == 0:
+        return np.zeros(len(arrays.expected), dtype=bool)
+    test = arrays.test[arrays.answered]
+    extracted = arrays.extracted[arrays.answered]
+    order = np.lexsort((extracted, test))
+    test, extracted = test[order], extracted[order]
+    # runs of equal answers of a test
+    starts = np.flatnonzero(
+        np.concatenate(
+            ([True], (test[1:] != test[:-1]) | (extracted[1:] != extracted[:-1]))
+        )
+    )
+    counts = np.diff(np.append(starts, len(test)))
+    run_test, run_answer = test[starts], extracted[starts]
+    # the longest run of every test comes first
+    order = np.lexsort((-counts, run_test))
+    tests, first = np.unique(run_test[order], return_index=True)
+    correct = np.zeros(len(arrays.expected), dtype=bool)
+    correct[tests] = run_answer[order][first] == arrays.expected[tests]
+    return correct
+
+
+# percentile bootstrap interval of sum(values) / sum(weights), resampling tests with replacement
+def bootstrap_interval(
+    values: np.ndarray,
+    weights: np.ndarray,
+    rng: np.random.Generator,
+    resamples: int = 1000,
+    confidence: float = 0.95,
+) -> tuple[float, float]:
+    if len(values) == 0:
+        return float("nan"), float("nan")
+    chunk = max(1, BOOTSTRAP_CHUNK // len(values))
+    estimates = []
+    for start in range(0, resamples, chunk):
+        sample = rng.integers(
+            0, len(values), (min(chunk, resamples - start), len(values))
+        )
+        estimates.append(values[sample].sum(axis=1) / weights[sample].sum(axis=1))
+    alpha = (1 - confidence) / 2
+    lower, upper = np.quantile(np.concatenate(estimates), [alpha, 1 - alpha])
+    return float(lower), float(upper)
+
+
+# statistics of every group of tests, group[t] is the index in group_names of the group of test t
+def score_groups(
+    arrays: ScoreArrays,
+    group: np.ndarray,
+    group_names: List[str],
+    ks: List[int] | None = None,
+    resamples: int = 1000,
+    confidence: float = 0.95,
+    seed: int | None = None,
+) -> Dict[str, dict]:
+    ks = ks or [1]
+    rng = np.random.default_rng(seed)
+    num_tests = len(arrays.expected)
+    completions = np.bincount(arrays.test, minlength=num_tests)
+    correct = np.bincount(arrays.test, weights=arrays.correct, minlength=num_tests)
+    majority = majority_vote(arrays).astype(np.float64)
+    pass_k = {k: pass_at_k(completions, correct, k) for k in ks}
+
+    stats = {}
+    for index, name in enumerate(group_names):
+        tests = np.flatnonzero(group == index)
+        if len(tests) == 0:
+            continue
+        ones = np.ones(len(tests))
+        group_stats = {
+            "tests": len(tests),
+            "completions": int(completions[tests].sum()),
+            "accuracy": float(correct[tests].sum() / completions[tests].sum()),
+            "accuracy_ci": bootstrap_interval(
+                correct[tests], completions[tests], rng, resamples, confidence
+            ),
+            "majority": float(majority[tests].mean()),
+            "majority_ci": bootstrap_interval(
+                majority[tests], ones, rng, resamples, confidence
+            ),
+        }
+        for k, values in pass_k.items():
+            # tests with fewer than k completions do not count
+            defined = values[tests][~np.isnan(values[tests])]
+            group_stats[f"pass@{k}"] = (
+                float(defined.mean()) if len(defined) else float("nan")
+            )
+            group_stats[f"pass@{k}_ci"] = bootstrap_interval(
+                defined, np.ones(len(defined)), rng, resamples, confidence
+            )
+        stats[name] = group_stats
+    return stats
+
+
+# statistics per problem and per category, see score_groups
+def score(
+    arrays: ScoreArrays,
+    categories: Dict[str, str] | None = None,
+    ks: List[int] | None = None,
+    resamples: int = 1000,
+    confidence: float = 0.95,
+    seed: int | None = None,
+) -> Dict[str, Dict[str, dict]]:
+    ks = ks or [1]
+    category_names, problem_category = np.unique(
+        np.asarray(
+            [
+                get_category(problem, categories or {})
+                for problem in arrays.problem_names
+            ],
+            dtype=str,
+        ),
+        return_inverse=True,
+    )
+    parameters = (ks, resamples, confidence, seed)
+    return {
+        "problems": score_groups(
+            arrays, arrays.test_problem, list(arrays.problem_names), *parameters
+        ),
+        "categories": score_groups(
+            arrays,
+            problem_category.reshape(-1)[arrays.test_problem],
+            list(category_names),
+            *parameters,
+        ),
+    }
+
+
+def format_stats(name: str, stats: dict, ks: List[int]) -> str:
+    # pass@k of a group without tests of k completions is not defined
+    def interval(key: str) -> str:
+        if np.isnan(stats[key]):
+            return "-"
+        lower, upper = stats[f"{key}_ci"]
+        return f"{stats[key]:.3f} [{lower:.3f}, {upper:.3f}]"
+
+    return (
+        f"{name} TESTS: {stats['tests']} COMPLETIONS: {stats['completions']} "
+        f"ACCURACY: {interval('accuracy')} MAJORITY: {interval('majority')} "
+        + " ".join(f"PASS@{k}: {interval(f'pass@{k}')}" for k in ks)
+    )
+
+
+def report(scores: Dict[str, Dict[str, dict]], ks: List[int]) -> str:
+    lines = [
+        format_stats(f"PROBLEM {problem}", stats, ks)
+        for problem, stats in scores["problems"].items()
+    ]
+    # a single category is the same as the whole result set
+    if len(scores["categories"]) > 1 or UNCATEGORIZED not in scores["categories"]:
+        lines += [
+            format_stats(f"CATEGORY {category}", stats, ks)
+            for category, stats in scores["categories"].items()
+        ]
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compute accuracy, pass@k, majority vote accuracy and confidence intervals from the results database"
+    )
+    parser.add_argument(
+        "--db",
+        type=str,
+        help="Path to the results database",
+        default=ResultsDatabase.DEFAULT_PATH,
+    )
+    parser.add_argument(
+        "--runs",
+        type=int,
+        nargs="+",
+        help="Ids of the runs to score together (default: the last run of every model, scored separately)",
+        default=None,
+    )
+    parser.add_argument(
+        "--pass-k",
+        "-k",
+        type=int,
+        nargs="+",
+        help="Values of k of pass@k",
+        default=[1],
+    )
+    parser.add_argument(
+        "--categories",
+        type=str,
+        help="Path to the JSON object mapping problems to categories",
+        default=DEFAULT_CATEGORIES_PATH,
+    )
+    parser.add_argument(
+        "--resamples",
+        type=int,
+        help="Number of bootstrap resamples",
+        default=1000,
+    )
+    parser.add_argument(
+        "--confidence",
+        type=float,
+        help="Confidence level of the intervals",
+        default=0.95,
+    )
+    parser.add_argument("--seed", type=int, help="Seed of the bootstrap", default=None)
+    parser.add_argument(
+        "--output",
+        "-o",
+        type=str,
+        help="Path to write the statistics JSON",
+        default=None,
+    )
+
+    args = parser.parse_args()
+
+    database = ResultsDatabase(args.db)
+    categories = load_categories(args.categories)
+    run_groups = (
+        {"RUNS " + " ".join(map(str, args.runs)): args.runs}
+        if args.runs
+        else {
+            f"MODEL {model}": [run_id] for model, run_id in last_runs(database).items()
+        }
+    )
+    results = {}
+    for name, run_ids in run_groups.items():
+        scores = score(
+            load_from_database(database, run_ids),
+            categories,
+            args.pass_k,
+            args.resamples,
+            args.confidence,
+            args.seed,
+        )
+        results[name] = scores
+        print(name)
+        print(report(scores, args.pass_k))
+    database.close()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
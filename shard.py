@@ -0,0 +1,198 @@
+import os
+import json
+import hashlib
+import argparse
+from problem import Problem
+from util import FileStore
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+# Deterministic partitioning of a suite between processes or machines, e.g. each with its own API key.
+# Shard i/N takes the problems (or prompts) whose stable hash modulo N is i. Problems are hashed by
+# the name of their directory, so the shards are the same wherever the suite is checked out.
+# Every shard of eval.py writes a report, `python3 shard.py merge` combines the reports into one.
+
+
+@dataclass(frozen=True)
+class Shard:
+    index: int
+    count: int
+
+    # parses "i/N", used as an argparse type
+    @staticmethod
+    def parse(spec: str) -> "Shard":
+        try:
+            index, count = (int(part) for part in spec.split("/"))
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"shard {spec} is not in the form i/N")
+        if count < 1 or not 0 <= index < count:
+            raise argparse.ArgumentTypeError(f"shard {spec} is not in range 0/N..N-1/N")
+        return Shard(index, count)
+
+    def __str__(self) -> str:
+        return f"{self.index}/{self.count}"
+
+    def contains(self, key: str) -> bool:
+        digest = hashlib.sha256(key.encode()).digest()
+        return int.from_bytes(digest[:8], "big") % self.count == self.index
+
+    def select(self, problems: List[Problem]) -> List[Problem]:
+        return [
+            problem for problem in problems if self.contains(problem_key(problem.id))
+        ]
+
+
+def problem_key(problem_path: str) -> str:
+    return os.path.basename(os.path.normpath(problem_path))
+
+
+# Store of a problem which lists only the prompts of the shard, together with their model outputs,
+# tests and solution outputs, so that a problem can be split between shards prompt by prompt.
+# Prompt prompt_{test}.txt has model outputs prompt_{test}_{completion}.txt, tests {test}.in
+# (in/ and solution-in/) and solution output {test}.out
+class ShardedStore(FileStore):
+    def __init__(self, store: FileStore, shard: Shard, problem_path: str):
+        self.store = store
+        self.shard = shard
+        self.problem_path = problem_path
+
+    # test of the file in a directory of prompts or outputs, None for other directories
+    def _test(self, directory: str, filename: str) -> str | None:
+        top = os.path.relpath(directory, self.problem_path).split(os.sep)[0]
+        name = os.path.splitext(filename)[0]
+        if top == Problem.dirs["prompt_in"]:
+            return name.removeprefix("prompt_")
+        if top == Problem.dirs["model_out"]:
+            return name.removeprefix("prompt_").rsplit("_", 1)[0]
+        if top in (
+            Problem.dirs["out"],
+            Problem.dirs["in"],
+            Problem.dirs["solution-in"],
+        ):
+            return name
+        return None
+
+    def listdir(self, directory: str) -> List[str]:
+        key = problem_key(self.problem_path)
+        return [
+            filename
+            for filename in self.store.listdir(directory)
+            if (test := self._test(directory, filename)) is None
+            or self.shard.contains(f"{key}/{test}")
+        ]
+
+    def exists(self, path: str) -> bool:
+        return self.store.exists(path)
+
+    def makedirs(self, directory: str) -> None:
+        self.store.makedirs(directory)
+
+    def read(self, path: str) -> str:
+        return self.store.read(path)
+
+    def write(self, path: str, content: str) -> None:
+        self.store.write(path, content)
+
+    def close(self) -> None:
+        self.store.close()
+
+
+# label (model and system prompt variant) -> problem -> (correct answers, answers)
+Counts = Dict[str, Dict[str, Tuple[int, int]]]
+
+
+def default_report_path(shard: Shard) -> str:
+    return f"shard-{shard.index}-of-{shard.count}.json"
+
+
+def write_report(
+    path: str, shard: Shard | None, by_prompt: bool, num_tests: int, counts: Counts
+) -> None:
+    report = {
+        "shard": (
+            None
+            if shard is None
+            else {
+                "index": shard.index,
+                "count": shard.count,
+                "by": "prompt" if by_prompt else "problem",
+            }
+        ),
+        "tests": num_tests,
+        "results": counts,
+    }
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+
+
+# sums the counts of the reports of the shards, returns the counts and the shards without a report
+def merge_reports(reports: List[dict]) -> tuple[Counts, List[str]]:
+    shards = [report["shard"] for report in reports if report["shard"] is not None]
+    if len({(shard["count"], shard["by"]) for shard in shards}) > 1:
+        raise ValueError("Reports of different partitionings can not be merged")
+    indices = [shard["index"] for shard in shards]
+    if len(set(indices)) != len(indices):
+        raise ValueError("A shard is reported more than once")
+    missing = [
+        f"{index}/{shards[0]['count']}"
+        for index in range(shards[0]["count"] if shards else 0)
+        if index not in indices
+    ]
+
+    merged: Dict[str, Dict[str, List[int]]] = {}
+    for report in reports:
+        for label, problems in report["results"].items():
+            for problem, (correct, total) in problems.items():
+                counts = merged.setdefault(label, {}).setdefault(problem, [0, 0])
+                counts[0] += correct
+                counts[1] += total
+    return {
+        label: {problem: tuple(counts) for problem, counts in problems.items()}
+        for label, problems in merged.items()
+    }, missing
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Merge the reports of the shards of a sharded evaluation (eval.py --shard i/N)"
+    )
+    parser.add_argument("command", choices=["merge"], help="Operation")
+    parser.add_argument("reports", type=str, nargs="+", help="Reports of the shards")
+    parser.add_argument(
+        "--output",
+        "-o",
+        type=str,
+        help="Path to write the merged report",
+        default=None,
+    )
+
+    args = parser.parse_args()
+
+    reports = []
+    for path in args.reports:
+        with open(path, "r") as f:
+            reports.append(json.load(f))
+    try:
+        counts, missing = merge_reports(reports)
+    except ValueError as e:
+        parser.error(str(e))
+
+    for label, problems in counts.items():
+        for problem, (correct, total) in sorted(problems.items()):
+            print(
+                f"MODEL {label} PROBLEM {problem} ACCURACY: {correct / total if total else 0:.3f} ({correct}/{total})"
+            )
+        correct = sum(counts[0] for counts in problems.values())
+        total = sum(counts[1] for counts in problems.values())
+        print(
+            f"MODEL {label} ACCURACY: {correct / total if total else 0:.3f} ({correct}/{total})"
+        )
+    if missing:
+        print(f"Missing shards: {', '.join(missing)}")
+
+    if args.output:
+        write_report(args.output, None, False, reports[0]["tests"], counts)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+from chat import Chat
+from dotenv import load_dotenv
+from problem import Problem
+from streaming import StreamedCompletion, record_estimated_usage
+from google.api_core import retry, retry_async
+from typing import Callable, Dict, List
+import os
+import json
+import time
+import random
+import asyncio
+import hashlib
+import telemetry
+import threading
+
+# Local stand-in for a provider, configured with environment variables (or .env):
+#   SIMULATOR_LATENCY          latency of a request: constant:S, uniform:A,B, exponential:MEAN or lognormal:MEDIAN,SIGMA (seconds)
+#   SIMULATOR_ERROR_RATE       probability of a transient server error of a request
+#   SIMULATOR_RATE_LIMIT_RATE  probability of a rate limit error of a request
+#   SIMULATOR_POLICY           correct - answers from out/ of the problems, random - random integers,
+#                              replay - completions of a journal of a recorded run (random for unknown prompts)
+#   SIMULATOR_ACCURACY         probability of a correct answer of the correct policy
+#   SIMULATOR_PROBLEMS         directory searched for problems by the correct policy
+#   SIMULATOR_REPLAY           journal replayed by the replay policy
+#   SIMULATOR_FAN_OUT          if 1, a request returns a single completion (Chat.fan_out)
+# Streamed answers (eval.py --stream) arrive in chunks spread evenly over the latency of the request.
+#   SIMULATOR_SEED             seed of the random generator
+
+
+class SimulatedServerError(Exception):
+    pass
+
+
+class SimulatedRateLimitError(Exception):
+    pass
+
+
+def is_transient_error(exception: Exception) -> bool:
+    return isinstance(exception, SimulatedServerError)
+
+
+def hash_prompt(message: str) -> str:
+    return hashlib.sha256(message.encode()).hexdigest()
+
+
+# returns a function sampling latencies of the distribution, e.g. "lognormal:0.5,0.4"
+def parse_latency(spec: str, rng: random.Random) -> Callable[[], float]:
+    name, _, parameters = spec.partition(":")
+    values = [float(value) for value in parameters.split(",") if value]
+    match name:
+        case "constant":
+            return lambda: values[0]
+        case "uniform":
+            return lambda: rng.uniform(values[0], values[1])
+        case "exponential":
+            return lambda: rng.expovariate(1 / values[0]) if values[0] else 0.0
+        case "lognormal":
+            return lambda: values[0] * rng.lognormvariate(0, values[1])
+        case _:
+            raise ValueError(f"Unknown latency distribution {spec}")
+
+
+# prompt hash -> expected output of every generated prompt of the problems under the directory
+def read_expected_answers(directory: str) -> Dict[str, str]:
+    answers = {}
+    for root, dirnames, _ in os.walk(directory):
+        if (
+            Problem.dirs["prompt_in"] not in dirnames
+            or Problem.dirs["out"] not in dirnames
+        ):
+            continue
+        prompt_in_dir = os.path.join(root, Problem.dirs["prompt_in"])
+        out_dir = os.path.join(root, Problem.dirs["out"])
+        outs = {
+            os.path.splitext(filename)[0]: filename for filename in os.listdir(out_dir)
+        }
+        for prompt_filename in os.listdir(prompt_in_dir):
+            # prompt_{base}.txt is generated from {base}.in, whose output is {base}.out
+            base = os.path.splitext(prompt_filename)[0].removeprefix("prompt_")
+            if base not in outs:
+                continue
+            with open(os.path.join(prompt_in_dir, prompt_filename), "r") as f:
+                prompt = f.read()
+            with open(os.path.join(out_dir, outs[base]), "r") as f:
+                answers[hash_prompt(prompt)] = str(Problem.clean_output(f.read()))
+    return answers
+
+
+# prompt hash -> completions of the prompt in the journal of a recorded run (see journal.Journal).
+# A missing or empty journal is an error, a replay would silently answer every prompt at random
+def read_replay(path: str) -> Dict[str, List[str]]:
+    if not os.path.exists(path):
+        raise ValueError(f"Replayed journal {path} does not exist")
+    completions: Dict[str, Dict[int, str]] = {}
+    with open(path, "r") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                break
+            prompt_hash = entry["key"].rsplit(":", 1)[1]
+            completions.setdefault(prompt_hash, {})[entry["index"]] = entry["content"]
+    if not completions:
+        raise ValueError(f"Replayed journal {path} has no completions")
+    return {
+        prompt_hash: [contents[index] for index in sorted(contents)]
+        for prompt_hash, contents in completions.items()
+    }
+
+
+class SimulatedChat(Chat):
+    PROVIDER = "simulated"
+    RATE_LIMIT_ERRORS = (SimulatedRateLimitError,)
+    # characters per chunk of streamed answers
+    STREAM_CHUNK_SIZE = 4
+
+    def __init__(self, model: str = "simulated", system_prompt: str = ""):
+        load_dotenv()
+        self.client = None
+        self.model = model
+        self.system_prompt = system_prompt
+        seed = os.getenv("SIMULATOR_SEED")
+        self.rng = random.Random(int(seed) if seed is not None else None)
+        self.lock = threading.Lock()
+        self.sample_latency = parse_latency(
+            os.getenv("SIMULATOR_LATENCY", "constant:0"), self.rng
+        )
+        self.error_rate = float(os.getenv("SIMULATOR_ERROR_RATE", "0"))
+        self.rate_limit_rate = float(os.getenv("SIMULATOR_RATE_LIMIT_RATE", "0"))
+        self.policy = os.getenv("SIMULATOR_POLICY", "correct")
+        self.accuracy = float(os.getenv("SIMULATOR_ACCURACY", "1"))
+        if os.getenv("SIMULATOR_FAN_OUT") == "1":
+            self.NATIVE_COMPLETIONS = 1
+
+        self.answers: Dict[str, str] = {}
+        self.replay: Dict[str, List[str]] = {}
+        self.replay_positions: Dict[str, int] = {}
+        match self.policy:
+            case "correct":
+                self.answers = read_expected_answers(
+                    os.getenv("SIMULATOR_PROBLEMS", ".")
+                )
+            case "replay":
+                self.replay = read_replay(os.environ["SIMULATOR_REPLAY"])
+            case "random":
+                pass
+            case _:
+                raise ValueError(f"Unknown simulator policy {self.policy}")
+
+    # latency of the request, raises the injected errors
+    def _request(self) -> float:
+        with self.lock:
+            latency = self.sample_latency()
+            draw = self.rng.random()
+        if draw < self.rate_limit_rate:
+            raise SimulatedRateLimitError("Simulated rate limit error")
+        if draw < self.rate_limit_rate + self.error_rate:
+            raise SimulatedServerError("Simulated server error")
+        return latency
+
+    def _answers(self, message: str, completions: int) -> List[str]:
+        prompt_hash = hash_prompt(message)
+        replayed = self.replay.get(prompt_hash, [])
+        with self.lock:
+            # requests of a prompt replay its recorded completions one after another (also when fanned out)
+            position = self.replay_positions.get(prompt_hash, 0)
+            self.replay_positions[prompt_hash] = position + completions
+            answers = []
+            for i in range(completions):
+                if replayed:
+                    answers.append(replayed[(position + i) % len(replayed)])
+                elif prompt_hash in self.answers and self.rng.random() < self.accuracy:
+                    answers.append(self.answers[prompt_hash])
+                else:
+                    answers.append(str(self.rng.randint(-100, 100)))
+        return answers
+
+    def _record_usage(self, message: str, answers: List[str]) -> None:
+        telemetry.record_usage(
+            (len(self.system_prompt) + len(message)) // 4,
+            sum(len(answer) for answer in answers) // 4,
+        )
+
+    # rounds of chunks (index of the answer, chunk) streamed evenly over the latency of the request
+    def _stream_rounds(self, answers: List[str]) -> List[List[tuple[int, str]]]:
+        size = SimulatedChat.STREAM_CHUNK_SIZE
+        return [
+            [
+                (index, answer[start : start + size])
+                for index, answer in enumerate(answers)
+                if start < len(answer)
+            ]
+            for start in range(0, max(map(len, answers), default=0), size)
+        ]
+
+    # feeds a round of chunks, returns True once every answer is settled
+    def _feed(
+        self,
+        streamed: List[StreamedCompletion],
+        chunks: List[tuple[int, str]],
+        start: float,
+    ) -> bool:
+        telemetry.record_ttfb(time.monotonic() - start)
+        for index, chunk in chunks:
+            streamed[index].feed(chunk)
+        return all(completion.settled for completion in streamed)
+
+    def _stream(self, message: str, completions: int) -> List[str]:
+        start = time.monotonic()
+        latency = self._request()
+        rounds = self._stream_rounds(self._answers(message, completions))
+        streamed = [StreamedCompletion(self.stop_rule) for _ in range(completions)]
+        for chunks in rounds:
+            time.sleep(latency / len(rounds))
+            if self._feed(streamed, chunks, start):
+                break
+        record_estimated_usage(self.system_prompt, message, streamed)
+        return [completion.text for completion in streamed]
+
+    async def _astream(self, message: str, completions: int) -> List[str]:
+        start = time.monotonic()
+        latency = self._request()
+        rounds = self._stream_rounds(self._answers(message, completions))
+        streamed = [StreamedCompletion(self.stop_rule) for _ in range(completions)]
+        for chunks in rounds:
+            await asyncio.sleep(latency / len(rounds))
+            if self._feed(streamed, chunks, start):
+                break
+        record_estimated_usage(self.system_prompt, message, streamed)
+        return [completion.text for completion in streamed]
+
+    @retry.Retry(
+        predicate=is_transient_error,
+        initial=1.0,
+        maximum=64.0,
+        multiplier=2.0,
+        timeout=60,
+        on_error=telemetry.record_retry,
+    )
+    def _prompt(self, message: str, completions: int) -> List[str]:
+        if self.stop_rule is not None:
+            return self._stream(message, completions)
+        time.sleep(self._request())
+        answers = self._answers(message, completions)
+        self._record_usage(message, answers)
+        return answers
+
+    @retry_async.AsyncRetry(
+        predicate=is_transient_error,
+        initial=1.0,
+        maximum=64.0,
+        multiplier=2.0,
+        timeout=60,
+        on_error=telemetry.record_retry,
+    )
+    async def _aprompt(self, message: str, completions: int) -> List[str]:
+        if self.stop_rule is not None:
+            return await self._astream(message, completions)
+        await asyncio.sleep(self._request())
+        answers = self._answers(message, completions)
+        self._record_usage(message, answers)
+        return answers
+
+    def prompt_one(self, message: str, temperature: float = 0.2) -> str:
+        return self._prompt(message, 1)[0]
+
+    async def aprompt_one(self, message: str, temperature: float = 0.2) -> str:
+        return (await self._aprompt(message, 1))[0]
+
+    def prompt(
+        self,
+        message: str,
+        completions: int = 1,
+        temperature: float = 0.2,
+    ) -> List[str]:
+        if self.NATIVE_COMPLETIONS == 1:
+            return self.fan_out(message, completions, temperature=temperature)
+        return self._prompt(message, completions)
+
+    async def aprompt(
+        self,
+        message: str,
+        completions: int = 1,
+        temperature: float = 0.2,
+    ) -> List[str]:
+        if self.NATIVE_COMPLETIONS == 1:
+            return await self.afan_out(message, completions, temperature=temperature)
+        return await self._aprompt(message, completions)
@@ -0,0 +1,63 @@
+import re
+import telemetry
+from dataclasses import dataclass, field
+from typing import List
+
+# Streamed completions are cut off once their answer is settled, the rest of the completion is not generated.
+# A one-shot answer is settled by the first character following its first integer.
+FIRST_INTEGER = r"[-+]?\d+"
+CHARS_PER_TOKEN = 4
+
+
+# Stop rule of streamed completions: the answer is settled once the text received so far matches the pattern
+# and another character follows the match, the text is cut right after the match.
+# Without a pattern completions are streamed to the end. Matches cannot span lines.
+@dataclass
+class StopRule:
+    pattern: str | None = None
+    regex: re.Pattern | None = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.regex = re.compile(self.pattern) if self.pattern is not None else None
+
+
+# text of a completion received in chunks
+class StreamedCompletion:
+    def __init__(self, stop_rule: StopRule):
+        self.stop_rule = stop_rule
+        self.chunks: List[str] = []
+        # unfinished last line, only new lines are matched against the stop rule, not the whole text
+        self.line = ""
+        self.settled = False
+
+    # adds the chunk, returns True once the answer is settled and the rest of the completion is not needed
+    def feed(self, chunk: str) -> bool:
+        if self.settled:
+            return True
+        if self.stop_rule.regex is None:
+            self.chunks.append(chunk)
+            return False
+        text = self.line + chunk
+        match = self.stop_rule.regex.search(text)
+        # a match reaching the end of the text received so far might still grow with the next chunk
+        if match and match.end() < len(text):
+            self.chunks.append(chunk[: max(0, match.end() - len(self.line))])
+            self.settled = True
+            return True
+        self.chunks.append(chunk)
+        self.line = text[text.rfind("\n") + 1 :]
+        return False
+
+    @property
+    def text(self) -> str:
+        return "".join(self.chunks)
+
+
+# records usage estimated from the text of streams cut off before the provider reported it
+def record_estimated_usage(
+    system_prompt: str, message: str, completions: List[StreamedCompletion]
+) -> None:
+    telemetry.record_usage(
+        (len(system_prompt) + len(message)) // CHARS_PER_TOKEN,
+        sum(len(completion.text) for completion in completions) // CHARS_PER_TOKEN,
+    )
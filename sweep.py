@@ -0,0 +1,410 @@
+import os
+import re
+import csv
+import shutil
+import argparse
+import itertools
+import registry
+from problem import Problem
+from sandbox import ResourceLimits
+from cache import ResponseCache
+from telemetry import Telemetry, percentile
+from gen import parse_parameter, split_parallel
+from eval import SystemPrompt, build_client, eval_chat, get_namespace
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Tuple
+from tqdm import tqdm
+
+# Input-size sweeps: a problem is generated and evaluated at every point of a grid of generator parameters
+# (key=value arguments of gen.cpp, see Problem.generate_tests), e.g. size=1,2,4,8, to measure how accuracy,
+# latency and prompt tokens change as the inputs grow. Every point gets its own copy of the problem
+# {sweep dir}/{problem}-{key}-{value}, built by tasks/CMakeLists.txt, so sweeps run from the tasks directory:
+#   python3 ../sweep.py assert-tasks/graph-task gpt --grid size=1,2,4,8 -j 4
+# The curves are written as CSV, one row per model and point of the grid.
+
+DEFAULT_TASKS_DIR = "sweep-tasks"
+DEFAULT_OUTPUT = "sweep.csv"
+
+
+# measurements of a model at a point of the grid
+@dataclass
+class SweepPoint:
+    model: str
+    parameters: Dict[str, str]
+    problem: str
+    correct: int
+    answers: int
+    accuracy: float
+    # requests sent to the provider and the ones which failed
+    requests: int
+    errors: int
+    # wall time of a request in seconds, including retries and waiting for the limiter
+    latency_mean: float | None
+    latency_p50: float | None
+    latency_p95: float | None
+    # tokens per request as reported by the provider (or estimated for streams cut off early)
+    prompt_tokens: float | None
+    completion_tokens: float | None
+    # characters of a prompt, known without requests
+    prompt_chars: float
+
+
+# parses "key=value1,value2,...", used as an argparse type
+def parse_axis(spec: str) -> Tuple[str, List[str]]:
+    key, values = parse_parameter(spec)
+    values = [value for value in values.split(",") if value]
+    if not values:
+        raise argparse.ArgumentTypeError(f"parameter {key} of the grid has no values")
+    return key, values
+
+
+# every combination of the values of the axes, in the order of the axes
+def grid_points(axes: List[Tuple[str, List[str]]]) -> List[Dict[str, str]]:
+    keys = [key for key, _ in axes]
+    return [
+        dict(zip(keys, values))
+        for values in itertools.product(*(values for _, values in axes))
+    ]
+
+
+# name of the copy of the problem at the point, it names the executables (cmake targets) of the copy
+def point_name(problem_path: str, parameters: Dict[str, str]) -> str:
+    suffix = "".join(f"-{key}-{value}" for key, value in parameters.items())
+    return re.sub(
+        r"[^A-Za-z0-9_-]",
+        "_",
+        Problem.get_problem_name_from_path(problem_path) + suffix,
+    )
+
+
+# copies sources and statement of the problem, generated files of an earlier sweep are kept
+# and regenerated only if they are stale (see Problem.generate_prompts)
+def copy_problem(problem_path: str, folder: str) -> Problem:
+    shutil.copytree(
+        problem_path,
+        folder,
+        ignore=shutil.ignore_patterns(
+            "bin", Problem.MANIFEST_FILENAME, *Problem.dirs.values()
+        ),
+        dirs_exist_ok=True,
+    )
+    return Problem(folder)
+
+
+# builds the copies and generates their tests with the parameters of their points, splitting `parallel` cpus
+# between them as gen.py does.
+# The copies have identical sources, so the first one is compiled and the others reuse its executables
+# through the binary cache
+def generate_points(
+    copies: List[Tuple[Problem, Dict[str, str]]],
+    seed: int,
+    parallel: int,
+    verbose: bool,
+    binary_cache: str,
+    limits: ResourceLimits,
+) -> bool:
+    print("Generating problems...")
+    problem_ids = [problem.id for problem, _ in copies]
+    if not Problem.compile_cpp(
+        problem_ids[:1], parallel, verbose, binary_cache
+    ) or not Problem.compile_cpp(problem_ids[1:], parallel, verbose, binary_cache):
+        return False
+
+    problems_at_once, solutions_at_once = split_parallel(parallel, len(copies))
+    with ProcessPoolExecutor(max_workers=problems_at_once) as executor:
+        futures = {
+            executor.submit(
+                problem.generate_prompts,
+                seed,
+                solutions_at_once,
+                verbose,
+                False,
+                limits,
+                parameters,
+            ): problem
+            for problem, parameters in copies
+        }
+        for future in tqdm(as_completed(futures), total=len(futures)):
+            if not future.result():
+                print(f"Test generation failed for problem {futures[future].id}")
+                executor.shutdown(cancel_futures=True)
+                return False
+    return True
+
+
+def mean_prompt_chars(problem: Problem) -> float:
+    prompt_dir = os.path.join(problem.id, Problem.dirs["prompt_in"])
+    lengths = []
+    for filename in os.listdir(prompt_dir):
+        with open(os.path.join(prompt_dir, filename), "r") as f:
+            lengths.append(len(f.read()))
+    return sum(lengths) / len(lengths) if lengths else 0.0
+
+
+# evaluates the model at the point with a chat of its own, so that the telemetry of the point is separate.
+# Requests of all points go through the same provider limiter
+def evaluate_point(
+    args: argparse.Namespace,
+    chat_model: str,
+    system_prompt: SystemPrompt,
+    problem: Problem,
+    parameters: Dict[str, str],
+    cache: ResponseCache | None,
+) -> SweepPoint:
+    telemetry = Telemetry()
+    client, _ = build_client(args, chat_model, system_prompt, cache, telemetry)
+    counts = eval_chat(
+        [problem],
+        client,
+        args.workers,
+        args.tests,
+        namespace=get_namespace(chat_model, system_prompt),
+    )
+    correct, answers = counts[problem.id]
+
+    samples = telemetry.samples
+    latencies = sorted(sample.latency for sample in samples)
+
+    def per_request(values: List[float]) -> float | None:
+        return sum(values) / len(samples) if samples else None
+
+    return SweepPoint(
+        model=chat_model,
+        parameters=parameters,
+        problem=problem.id,
+        correct=correct,
+        answers=answers,
+        accuracy=correct / answers if answers else 0.0,
+        requests=len(samples),
+        errors=sum(1 for sample in samples if sample.error),
+        latency_mean=per_request(latencies),
+        latency_p50=percentile(latencies, 0.50) if samples else None,
+        latency_p95=percentile(latencies, 0.95) if samples else None,
+        prompt_tokens=per_request([sample.prompt_tokens for sample in samples]),
+        completion_tokens=per_request([sample.completion_tokens for sample in samples]),
+        prompt_chars=mean_prompt_chars(problem),
+    )
+
+
+def point_row(point: SweepPoint) -> Dict[str, str | int | float | None]:
+    row = asdict(point)
+    del row["parameters"]
+    return {"model": point.model, **point.parameters, **row}
+
+
+def write_csv(points: List[SweepPoint], path: str) -> None:
+    rows = [point_row(point) for point in points]
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def print_table(points: List[SweepPoint]) -> None:
+    def format_value(value: float | None, precision: int) -> str:
+        return "-" if value is None else f"{value:.{precision}f}"
+
+    keys = list(points[0].parameters)
+    header = ["MODEL"] + [key.upper() for key in keys]
+    header += ["ACCURACY", "LATENCY p50", "LATENCY p95", "PROMPT TOKENS"]
+    rows = [
+        [point.model]
+        + [point.parameters[key] for key in keys]
+        + [
+            f"{point.accuracy:.3f} ({point.correct}/{point.answers})",
+            format_value(point.latency_p50, 2),
+            format_value(point.latency_p95, 2),
+            format_value(point.prompt_tokens, 0),
+        ]
+        for point in points
+    ]
+    widths = [max(len(row[i]) for row in [header] + rows) for i in range(len(header))]
+    for row in [header] + rows:
+        print("  ".join(value.ljust(width) for value, width in zip(row, widths)))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate and evaluate a problem at every point of a grid of generator parameters, e.g. input sizes"
+    )
+    parser.add_argument("path", type=str, help="Path to the problem")
+    parser.add_argument(
+        "model",
+        type=str,
+        nargs="+",
+        help=f"Models {'/'.join(registry.BACKENDS)} or registered by an entry point (see registry.py)",
+    )
+    parser.add_argument(
+        "--grid",
+        type=parse_axis,
+        action="append",
+        metavar="KEY=VALUE,...",
+        help="Values of a generator parameter, e.g. size=1,2,4,8 (repeatable, every combination of the values is a point of the grid)",
+        required=True,
+    )
+    parser.add_argument(
+        "--tests", "-t", type=int, help="Number of completions per prompt", default=5
+    )
+    parser.add_argument("--seed", "-s", type=int, help="Seed of generation", default=1)
+    parser.add_argument(
+        "--parallel",
+        "-j",
+        type=int,
+        help="Number of cpus to use for compilation and generation",
+        default=1,
+    )
+    parser.add_argument(
+        "--workers",
+        "-w",
+        type=int,
+        help="Max number of requests in flight to the provider, shared by all points",
+        default=5,
+    )
+    parser.add_argument(
+        "--concurrent-points",
+        type=int,
+        help="Max number of points (and models) evaluated at once, each with up to --workers threads",
+        default=2,
+    )
+    parser.add_argument(
+        "--rpm",
+        type=float,
+        help="Requests per minute budget of the provider (unlimited by default)",
+        default=None,
+    )
+    parser.add_argument(
+        "--tpm",
+        type=float,
+        help="Tokens per minute budget of the provider (unlimited by default)",
+        default=None,
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Stream completions and cut them off as soon as the answer is settled, chain of thought responses only with --stop-pattern (see eval.py --stream)",
+    )
+    parser.add_argument(
+        "--stop-pattern",
+        type=str,
+        help="Regular expression settling the answer of streamed completions (works only when flag --stream is set)",
+        default=None,
+    )
+    parser.add_argument(
+        "--chain_of_thought",
+        "--cot",
+        action="store_true",
+        help="Use 'chain of thought' prompting method",
+    )
+    parser.add_argument(
+        "--cache-path",
+        type=str,
+        help="Path to a response cache database to reuse completions of earlier sweeps (by default completions are requested again, so that latencies are measured)",
+        default=None,
+    )
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="Ignore cached completions and overwrite them with new ones",
+    )
+    parser.add_argument(
+        "--tasks-dir",
+        type=str,
+        help="Directory of the copies of the problem, run from the tasks directory to build them with CMakeLists.txt",
+        default=DEFAULT_TASKS_DIR,
+    )
+    parser.add_argument(
+        "--binary-cache",
+        type=str,
+        help=f"Directory of executables reused when built from identical sources (default: ${Problem.BINARY_CACHE_ENV} or {{tasks dir}}/.binaries)",
+        default=None,
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        help="Wall-clock time limit in seconds of a single generator or solution run",
+        default=ResourceLimits.timeout,
+    )
+    parser.add_argument(
+        "--output",
+        "-o",
+        type=str,
+        help="Path of the CSV file of the curves",
+        default=DEFAULT_OUTPUT,
+    )
+    parser.add_argument(
+        "--verbose", "-v", action="store_true", help="Print compilation output"
+    )
+    # points are evaluated with worker threads (see eval.build_client)
+    parser.set_defaults(use_async=False)
+
+    args = parser.parse_args()
+
+    for chat_model in args.model:
+        try:
+            registry.get_backend(chat_model)
+        except KeyError as e:
+            parser.error(e.args[0])
+    system_prompt = (
+        SystemPrompt.CHAIN_OF_THOUGHT
+        if args.chain_of_thought
+        else SystemPrompt.ONE_SHOT
+    )
+
+    copies = [
+        (
+            copy_problem(
+                args.path,
+                os.path.join(args.tasks_dir, point_name(args.path, parameters)),
+            ),
+            parameters,
+        )
+        for parameters in grid_points(args.grid)
+    ]
+    binary_cache = (
+        args.binary_cache
+        or os.getenv(Problem.BINARY_CACHE_ENV)
+        or os.path.join(args.tasks_dir, ".binaries")
+    )
+    if not generate_points(
+        copies,
+        args.seed,
+        args.parallel,
+        args.verbose,
+        binary_cache,
+        ResourceLimits(timeout=args.timeout),
+    ):
+        return
+
+    cache = ResponseCache(args.cache_path) if args.cache_path else None
+    combinations = [
+        (chat_model, problem, parameters)
+        for chat_model in args.model
+        for problem, parameters in copies
+    ]
+    # points are evaluated a few at a time, so that the provider limiter stays busy between points
+    # without a thread per point and worker
+    with ThreadPoolExecutor(
+        max_workers=max(1, min(args.concurrent_points, len(combinations)))
+    ) as executor:
+        points = list(
+            executor.map(
+                lambda combination: evaluate_point(
+                    args,
+                    combination[0],
+                    system_prompt,
+                    combination[1],
+                    combination[2],
+                    cache,
+                ),
+                combinations,
+            )
+        )
+
+    print_table(points)
+    write_csv(points, args.output)
+    print(f"Curves written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
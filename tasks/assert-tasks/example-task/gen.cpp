@@ -1,51 +1,72 @@
 #include "testlib/readwriter.h"
+#include <algorithm>
+#include <cmath>
+#include <string>
 
 using namespace std;
 
+// generator parameters are passed as key=value arguments after the seed is read from stdin,
+// e.g. `./gen.e size=4`. size scales the number of nodes of the graphs (default 1, no scaling below 1)
+double sizeScale = 1;
+
+int scaled(int numOfNodes) {
+    return std::max(numOfNodes, static_cast<int>(std::lround(numOfNodes * sizeScale)));
+}
+
+void readParameters(int argc, char *argv[]) {
+    for (int i = 1; i < argc; i++) {
+        std::string argument = argv[i];
+        size_t separator = argument.find('=');
+        if (separator != std::string::npos && argument.substr(0, separator) == "size") {
+            sizeScale = std::stod(argument.substr(separator + 1));
+        }
+    }
+}
+
 void printGraphToAppropriateFiles(int testNumber, const Graph& g);
 
 void testEmptyGraph(int testNumber) {
-    int numOfNodes = rnd.next(5, 10);
+    int numOfNodes = rnd.next(scaled(5), scaled(10));
     printGraphToAppropriateFiles(testNumber, Graph::construct_undirected_clique(numOfNodes));
 }
 
 void testShortPath(int testNumber) {
-    int numOfNodes = rnd.next(5, 10);
+    int numOfNodes = rnd.next(scaled(5), scaled(10));
     printGraphToAppropriateFiles(testNumber, Graph::construct_path_graph(numOfNodes));
 }
 
 void testMultipleShortPaths(int testNumber) {
-    int numOfNodes = rnd.next(8, 15);
+    int numOfNodes = rnd.next(scaled(8), scaled(15));
     int numOfPaths = rnd.next(3, 6);
     printGraphToAppropriateFiles(testNumber, Graph::construct_path_graph(numOfNodes, numOfPaths));
 }
 
 void testSmallClique(int testNumber) {
-    int numOfNodes = rnd.next(5, 10);
+    int numOfNodes = rnd.next(scaled(5), scaled(10));
 
     printGraphToAppropriateFiles(testNumber, Graph::construct_undirected_clique(numOfNodes));
 }
 
 void testTree(int testNumber) {
-    int numOfNodes = rnd.next(5, 10);
+    int numOfNodes = rnd.next(scaled(5), scaled(10));
 
     printGraphToAppropriateFiles(testNumber, Graph::construct_tree_graph(numOfNodes));
 }
 
 void testForrest(int testNumber) {
-    int numOfNodes = rnd.next(10, 15);
+    int numOfNodes = rnd.next(scaled(10), scaled(15));
     int numberOfTrees = rnd.next(3, 4);
     printGraphToAppropriateFiles(testNumber, Graph::construct_forest_graph(numOfNodes, numberOfTrees));
 }
 
 void testShallowForrest(int testNumber) {
-    int numOfNodes = rnd.next(10, 15);
+    int numOfNodes = rnd.next(scaled(10), scaled(15));
     int numberOfTrees = rnd.next(3, 4);
     printGraphToAppropriateFiles(testNumber, Graph::construct_shallow_forest_graph(numOfNodes, numberOfTrees));
 }
 
 void testStarfish(int testNumber) {
-    int numOfNodes = rnd.next(5, 20);
+    int numOfNodes = rnd.next(scaled(5), scaled(20));
     int numOfRays = rnd.next(3, 4);
     int maxRayLength = 7;
 
@@ -53,18 +74,19 @@ void testStarfish(int testNumber) {
 }
 
 void testSparseGraph(int testNumber) {
-    int numOfNodes = rnd.next(10, 15);
+    int numOfNodes = rnd.next(scaled(10), scaled(15));
     printGraphToAppropriateFiles(testNumber, Graph::construct_sparse_graph(numOfNodes));
 }
 
 void testDenseGraph(int testNumber) {
-    int numOfNodes = rnd.next(10, 15);
+    int numOfNodes = rnd.next(scaled(10), scaled(15));
     printGraphToAppropriateFiles(testNumber, Graph::construct_dense_graph(numOfNodes));
 }
 
-int main() {
+int main(int argc, char *argv[]) {
     int seed;
     cin >> seed;
+    readParameters(argc, argv);
     registerGen(seed);
     setupDirectories();
 
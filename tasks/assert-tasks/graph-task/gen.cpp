@@ -1,6 +1,27 @@
 #include "testlib/readwriter.h"
+#include <algorithm>
+#include <cmath>
+#include <string>
 using namespace std;
 
+// generator parameters are passed as key=value arguments after the seed is read from stdin,
+// e.g. `./gen.e size=4`. size scales the number of nodes of the graphs (default 1, no scaling below 1)
+double sizeScale = 1;
+
+int scaled(int numOfNodes) {
+    return std::max(numOfNodes, static_cast<int>(std::lround(numOfNodes * sizeScale)));
+}
+
+void readParameters(int argc, char *argv[]) {
+    for (int i = 1; i < argc; i++) {
+        std::string argument = argv[i];
+        size_t separator = argument.find('=');
+        if (separator != std::string::npos && argument.substr(0, separator) == "size") {
+            sizeScale = std::stod(argument.substr(separator + 1));
+        }
+    }
+}
+
 void printGraphsToAppropriateFiles(int testNumber, const Graph& g1, const Graph& g2);
 
 std::pair<Graph, Graph> differentPaths(int length) {
@@ -20,7 +41,7 @@ std::pair<Graph, Graph> equalPaths(int length) {
 }
 
 void shortDifferentPaths(int testNumber) {
-    int numOfNodes = rnd.next(3, 10); 
+    int numOfNodes = rnd.next(scaled(3), scaled(10)); 
     auto [g1, g2] = differentPaths(testNumber, numOfNodes);
 
     printGraphsToAppropriateFiles(testNumber, g1, g2);
@@ -28,21 +49,21 @@ void shortDifferentPaths(int testNumber) {
 
 void longDifferentPaths(int testNumber) {
 
-    int numOfNodes = rnd.next(30, 100); 
+    int numOfNodes = rnd.next(scaled(30), scaled(100)); 
     auto [g1, g2] = differentPaths(testNumber, numOfNodes);
 
     printGraphsToAppropriateFiles(testNumber, g1, g2);
 }
 
 void shortEqualPaths(int testNumber) {
-    int numOfNodes = rnd.next(3, 10); 
+    int numOfNodes = rnd.next(scaled(3), scaled(10)); 
     auto [g1, g2] = equalPaths(testNumber, numOfNodes);
 
     printGraphsToAppropriateFiles(testNumber, g1, g2);
 }
 
 void smallEqualCliques(int testNumber) {
-    int numOfNodes = rnd.next(3, 10); 
+    int numOfNodes = rnd.next(scaled(3), scaled(10)); 
     Graph g1 = Graph::construct_undirected_clique(numOfNodes);
 
     printGraphsToAppropriateFiles(testNumber, g1, g1);
@@ -50,23 +71,23 @@ void smallEqualCliques(int testNumber) {
 
 // generate different size cliques
 void smallDifferentCliques(int testNumber) {
-    int numOfNodes1 = rnd.next(3, 10); 
+    int numOfNodes1 = rnd.next(scaled(3), scaled(10)); 
     Graph g1 = Graph::construct_undirected_clique(numOfNodes1);
-    int numOfNodes2 = rnd.next(numOfNodes1, std::max(10, numOfNodes1 + 1)); 
+    int numOfNodes2 = rnd.next(numOfNodes1, std::max(scaled(10), numOfNodes1 + 1)); 
     Graph g2 = Graph::construct_undirected_clique(numOfNodes2);
 
     printGraphsToAppropriateFiles(testNumber, g1, g2);
 }
 
 void smallEqualTreeOfDegree2to4(int testNumber) {
-    int numOfNodes = rnd.next(5, 20); 
+    int numOfNodes = rnd.next(scaled(5), scaled(20)); 
     Graph g1 = Graph::construct_tree_of_bounded_degree_graph(numOfNodes, 2, 4);
 
     printGraphsToAppropriateFiles(testNumber, g1, g1);
 }
 
 void smallDifferentTreeOfDegree2to4(int testNumber) {
-    int numOfNodes = rnd.next(5, 20); 
+    int numOfNodes = rnd.next(scaled(5), scaled(20)); 
     int minDegree = 2, maxDegree = 4;
     Graph g1 = Graph::construct_tree_of_bounded_degree_graph(numOfNodes, minDegree, maxDegree);
     Graph g2 = Graph::construct_tree_of_bounded_degree_graph(numOfNodes, minDegree, maxDegree);
@@ -78,7 +99,7 @@ void smallDifferentTreeOfDegree2to4(int testNumber) {
 }
 
 void smallDifferentForrests(int testNumber) {
-    int numOfNodes = rnd.next(5, 20); 
+    int numOfNodes = rnd.next(scaled(5), scaled(20)); 
     int numOfTrees = rnd.next(3, min(5, numOfNodes - 1));
     Graph g1 = Graph::construct_forest_graph(numOfNodes, numOfTrees);
     Graph g2 = Graph::construct_forest_graph(numOfNodes, numOfTrees);
@@ -90,14 +111,14 @@ void smallDifferentForrests(int testNumber) {
 }
 
 void smallEqualForrests(int testNumber) {
-    int numOfNodes = rnd.next(5, 20); 
+    int numOfNodes = rnd.next(scaled(5), scaled(20)); 
     int numOfTrees = rnd.next(3, 5);
     Graph g1 = Graph::construct_forest_graph(numOfNodes, numOfTrees);
     printGraphsToAppropriateFiles(testNumber, g1, g1);
 }
 
 void smallDifferentStarfishes(int testNumber) {
-    int numOfNodes = rnd.next(5, 20); 
+    int numOfNodes = rnd.next(scaled(5), scaled(20)); 
     int numOfRays = rnd.next(3, 4);
     int maxRayLength = 7; 
     Graph g1 = Graph::construct_starfish_graph(numOfNodes, maxRayLength, numOfRays);
@@ -110,7 +131,7 @@ void smallDifferentStarfishes(int testNumber) {
 }
 
 void smallEqualStarfishes(int testNumber) {
-    int numOfNodes = rnd.next(5, 20); 
+    int numOfNodes = rnd.next(scaled(5), scaled(20)); 
     int numOfRays = rnd.next(3, 4);
     int maxRayLength = 7; 
     Graph g = Graph::construct_starfish_graph(numOfNodes, maxRayLength, numOfRays);
@@ -121,6 +142,7 @@ void smallEqualStarfishes(int testNumber) {
 int main(int argc, char *argv[]) {
     int seed;
     cin>>seed;
+    readParameters(argc, argv);
     registerGen(seed);
     setupDirectories();
 
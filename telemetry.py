@@ -0,0 +1,220 @@
+import json
+import math
+import time
+import threading
+import contextvars
+from chat import Chat
+from dataclasses import dataclass, asdict
+from typing import Dict, List
+
+
+# measurements of a single call to the chat
+@dataclass
+class Sample:
+    model: str
+    provider: str
+    completions: int
+    # unix time of the start of the call
+    start: float = 0.0
+    # wall time of the whole call, including retries and waiting for the limiter
+    latency: float = 0.0
+    # time spent waiting for the provider limiter
+    queue_time: float = 0.0
+    # time to the first byte of the response, known only for streamed responses
+    ttfb: float | None = None
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    # transient errors retried by the provider retry decorator
+    retries: int = 0
+    # rate limit errors retried by RateLimitedChat
+    rate_limit_retries: int = 0
+    # class of the exception the call ended with
+    error: str | None = None
+
+
+# sample of the call in progress, set by TelemetryChat and filled in by the wrapped chats
+current_sample: contextvars.ContextVar[Sample | None] = contextvars.ContextVar(
+    "current_sample", default=None
+)
+# requests fanned out to threads (Chat.fan_out) update the same sample
+sample_lock = threading.Lock()
+
+
+def record_usage(prompt_tokens: int, completion_tokens: int) -> None:
+    sample = current_sample.get()
+    if sample is not None:
+        with sample_lock:
+            sample.prompt_tokens += prompt_tokens
+            sample.completion_tokens += completion_tokens
+
+
+def record_ttfb(ttfb: float) -> None:
+    sample = current_sample.get()
+    if sample is not None and sample.ttfb is None:
+        with sample_lock:
+            sample.ttfb = ttfb
+
+
+def record_queue_time(seconds: float) -> None:
+    sample = current_sample.get()
+    if sample is not None:
+        with sample_lock:
+            sample.queue_time += seconds
+
+
+# on_error callback of the provider retry decorators
+def record_retry(exception: Exception) -> None:
+    sample = current_sample.get()
+    if sample is not None:
+        with sample_lock:
+            sample.retries += 1
+
+
+def record_rate_limit_retry() -> None:
+    sample = current_sample.get()
+    if sample is not None:
+        with sample_lock:
+            sample.rate_limit_retries += 1
+
+
+# value below which `fraction` of the sorted values fall (nearest rank)
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    # the epsilon keeps products like 0.1 * 30 = 3.0000000000000004 on their integer rank
+    rank = math.ceil(fraction * len(values) - 1e-9) - 1
+    rank = max(0, min(len(values) - 1, rank))
+    return values[rank]
+
+
+# Samples collected from all calls of a run
+class Telemetry:
+    DEFAULT_PATH = "telemetry.jsonl"
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples: List[Sample] = []
+
+    def add(self, sample: Sample) -> None:
+        with self.lock:
+            self.samples.append(sample)
+
+    # per model: number of requests, errors, latency percentiles, requests and tokens per second
+    def summary(self) -> Dict[str, dict]:
+        with self.lock:
+            samples = list(self.samples)
+        by_model: Dict[str, List[Sample]] = {}
+        for sample in samples:
+            by_model.setdefault(sample.model, []).append(sample)
+
+        summary = {}
+        for model, model_samples in by_model.items():
+            latencies = sorted(sample.latency for sample in model_samples)
+            ttfbs = sorted(
+                sample.ttfb for sample in model_samples if sample.ttfb is not None
+            )
+            elapsed = max(
+                sample.start + sample.latency for sample in model_samples
+            ) - min(sample.start for sample in model_samples)
+            tokens = sum(
+                sample.prompt_tokens + sample.completion_tokens
+                for sample in model_samples
+            )
+            summary[model] = {
+                "requests": len(model_samples),
+                "errors": sum(1 for sample in model_samples if sample.error),
+                "retries": sum(sample.retries for sample in model_samples),
+                "rate_limit_retries": sum(
+                    sample.rate_limit_retries for sample in model_samples
+                ),
+                "p50": percentile(latencies, 0.50),
+                "p95": percentile(latencies, 0.95),
+                "p99": percentile(latencies, 0.99),
+                # streamed requests only
+                "ttfb_p50": percentile(ttfbs, 0.50) if ttfbs else None,
+                "queue_time": sum(sample.queue_time for sample in model_samples)
+                / len(model_samples),
+                "requests_per_second": len(model_samples) / elapsed if elapsed else 0,
+                "tokens_per_second": tokens / elapsed if elapsed else 0,
+            }
+        return summary
+
+    def report(self) -> str:
+        lines = []
+        for model, stats in self.summary().items():
+            lines.append(
+                f"MODEL {model} REQUESTS: {stats['requests']} (errors {stats['errors']}, "
+                f"retries {stats['retries']}, rate limited {stats['rate_limit_retries']}) "
+                f"LATENCY p50/p95/p99: {stats['p50']:.2f}s/{stats['p95']:.2f}s/{stats['p99']:.2f}s "
+                + (
+                    f"TTFB p50: {stats['ttfb_p50']:.2f}s "
+                    if stats["ttfb_p50"] is not None
+                    else ""
+                )
+                + f"QUEUED: {stats['queue_time']:.2f}s "
+                f"RPS: {stats['requests_per_second']:.2f} "
+                f"TOKENS/S: {stats['tokens_per_second']:.1f}"
+            )
+        return "\n".join(lines)
+
+    # appends the raw samples to a JSONL file
+    def write(self, path: str = DEFAULT_PATH) -> None:
+        with self.lock:
+            samples = list(self.samples)
+        with open(path, "a") as f:
+            for sample in samples:
+                f.write(json.dumps(asdict(sample)) + "\n")
+
+
+# Chat which records a telemetry sample for every call of the wrapped chat.
+# Wrap the rate limited chat, so that the samples include waiting for the limiter and rate limit retries.
+class TelemetryChat(Chat):
+    def __init__(self, chat: Chat, telemetry: Telemetry):
+        self.chat = chat
+        self.telemetry = telemetry
+        self.client = chat.client
+        self.model = chat.model
+        self.system_prompt = chat.system_prompt
+        self.PROVIDER = chat.PROVIDER
+        self.stop_rule = chat.stop_rule
+
+    def _start(self, completions: int) -> tuple[Sample, contextvars.Token, float]:
+        sample = Sample(
+            model=self.model,
+            provider=self.PROVIDER,
+            completions=completions,
+            start=time.time(),
+        )
+        return sample, current_sample.set(sample), time.monotonic()
+
+    def _finish(
+        self,
+        sample: Sample,
+        token: contextvars.Token,
+        start: float,
+        error: BaseException | None = None,
+    ) -> None:
+        sample.latency = time.monotonic() - start
+        sample.error = type(error).__name__ if error is not None else None
+        current_sample.reset(token)
+        self.telemetry.add(sample)
+
+    def prompt(self, message: str, completions: int = 1, **kwargs) -> List[str]:
+        sample, token, start = self._start(completions)
+        try:
+            responses = self.chat.prompt(message, completions, **kwargs)
+        except BaseException as e:
+            self._finish(sample, token, start, e)
+            raise
+        self._finish(sample, token, start)
+        return responses
+
+    async def aprompt(self, message: str, completions: int = 1, **kwargs) -> List[str]:
+        sample, token, start = self._start(completions)
+        try:
+            responses = await self.chat.aprompt(message, completions, **kwargs)
+        except BaseException as e:
+            self._finish(sample, token, start, e)
+            raise
+        self._finish(sample, token, start)
+        return responses
@@ -0,0 +1,60 @@
+import re
+from typing import List
+
+
+# Problem statement compiled into literal segments and placeholders, rendered in a single pass.
+# Input placeholders (@IN_{num}) are bound to the num-th line of the input (counting from 1),
+# the output placeholder (@ANS) is bound to `answer`.
+class PromptTemplate:
+    ANSWER = -1
+
+    class UnboundPlaceholder(Exception):
+        def __init__(self, placeholder: str, num_lines: int):
+            self.message = f"Placeholder {placeholder} is not bound, the input has only {num_lines} lines"
+            super().__init__(self.message)
+
+    def __init__(
+        self,
+        statement: str,
+        in_keyword: str = "@IN_{num}",
+        out_keyword: str = "@ANS",
+        answer: str = "@ANS",
+    ):
+        prefix, suffix = in_keyword.split("{num}")
+        pattern = re.compile(
+            f"{re.escape(prefix)}(\\d+){re.escape(suffix)}|{re.escape(out_keyword)}"
+        )
+        self.in_keyword = in_keyword
+        self.answer = answer
+        self.literals: List[str] = []
+        # index of the input line of each placeholder, ANSWER for the output placeholder
+        self.placeholders: List[int] = []
+
+        position = 0
+        for match in pattern.finditer(statement):
+            self.literals.append(statement[position : match.start()])
+            self.placeholders.append(
+                int(match.group(1)) if match.group(1) is not None else self.ANSWER
+            )
+            position = match.end()
+        self.literals.append(statement[position:])
+
+        self.required_lines = max(self.placeholders, default=0)
+        self.invalid = [num for num in self.placeholders if num == 0]
+
+    def render(self, input: str) -> str:
+        lines = input.splitlines()
+        if self.invalid or len(lines) < self.required_lines:
+            num = self.invalid[0] if self.invalid else self.required_lines
+            raise PromptTemplate.UnboundPlaceholder(
+                self.in_keyword.format(num=num), len(lines)
+            )
+
+        parts = [self.literals[0]]
+        for num, literal in zip(self.placeholders, self.literals[1:]):
+            parts.append(self.answer if num == self.ANSWER else lines[num - 1])
+            parts.append(literal)
+        return "".join(parts)
+
+    def render_all(self, inputs: List[str]) -> List[str]:
+        return [self.render(input) for input in inputs]
@@ -0,0 +1,44 @@
+import os
+import json
+from archive import PackedArchive, PackedStore
+from problem import Problem
+
+
+def write_problem(problem_path: str, content: str) -> None:
+    os.makedirs(os.path.join(problem_path, Problem.dirs["in"]), exist_ok=True)
+    with open(os.path.join(problem_path, "problem-statement.md"), "w") as f:
+        f.write("statement")
+    with open(os.path.join(problem_path, Problem.dirs["in"], "0.in"), "w") as f:
+        f.write(content)
+    with open(os.path.join(problem_path, Problem.MANIFEST_FILENAME), "w") as f:
+        json.dump({"files": {os.path.join(Problem.dirs["in"], "0.in"): content}}, f)
+
+
+def test_runs_share_the_generated_files_and_keep_stale_outputs(tmp_path):
+    problem_path = str(tmp_path / "problem")
+    write_problem(problem_path, "first")
+    input_path = os.path.join(problem_path, Problem.dirs["in"], "0.in")
+    output_path = os.path.join(problem_path, Problem.dirs["model_out"], "0_0.txt")
+
+    for run in ["a", "b"]:
+        store = PackedStore.open_run(problem_path, run)
+        assert store.read(input_path) == "first"
+        store.write(output_path, f"answer {run}")
+        store.close()
+    # run archives keep only the files written during the run
+    archive = PackedArchive(PackedStore.get_archive_path(problem_path, "a"))
+    assert sorted(archive.keys()) == sorted(
+        [PackedStore.GENERATION_KEY, os.path.relpath(output_path, problem_path)]
+    )
+    archive.close()
+
+    write_problem(problem_path, "second")
+    store = PackedStore.open_run(problem_path, "a")
+    assert store.read(input_path) == "second"
+    assert not store.exists(output_path)
+    store.close()
+
+    stale = PackedStore.open_existing(problem_path, "a-stale-1")
+    assert stale.read(output_path) == "answer a"
+    assert not stale.exists(input_path)
+    stale.close()
@@ -0,0 +1,71 @@
+import os
+import json
+import pytest
+from batch import export_batch, import_batch, respond_to_batch
+from problem import Problem
+
+NAMESPACE = "simulated-one_shot"
+
+
+def write_problem(problem_path: str, tests: int) -> None:
+    for key in ["out", "prompt_in", "model_out"]:
+        os.makedirs(os.path.join(problem_path, Problem.dirs[key]))
+    with open(os.path.join(problem_path, "problem-statement.md"), "w") as f:
+        f.write("statement")
+    for test in range(tests):
+        with open(
+            os.path.join(problem_path, Problem.dirs["out"], f"{test}.out"), "w"
+        ) as f:
+            f.write(f"{test}")
+        with open(
+            os.path.join(problem_path, Problem.dirs["prompt_in"], f"prompt_{test}.txt"),
+            "w",
+        ) as f:
+            f.write(f"prompt {test}")
+
+
+def read_output(problem_path: str, namespace: str | None, filename: str) -> str:
+    with open(
+        os.path.join(Problem.get_model_out_dir(problem_path, namespace), filename)
+    ) as f:
+        return f.read()
+
+
+def test_outputs_of_other_runs_are_not_completions_of_the_batch(tmp_path):
+    problem_path = str(tmp_path / "problem")
+    write_problem(problem_path, 2)
+    # outputs of an earlier run of another model
+    for completion in range(3):
+        with open(
+            os.path.join(
+                Problem.get_model_out_dir(problem_path), f"prompt_0_{completion}.txt"
+            ),
+            "w",
+        ) as f:
+            f.write("stale")
+    os.makedirs(Problem.get_model_out_dir(problem_path, NAMESPACE))
+    with open(
+        os.path.join(
+            Problem.get_model_out_dir(problem_path, NAMESPACE), "prompt_0_0.txt"
+        ),
+        "w",
+    ) as f:
+        f.write("kept")
+
+    requests_path = str(tmp_path / "requests.jsonl")
+    results_path = str(tmp_path / "results.jsonl")
+    problem = Problem(problem_path)
+    assert export_batch([problem], "model", "system", NAMESPACE, 3, requests_path) == 2
+    with open(requests_path) as f:
+        requested = [json.loads(line)["body"]["n"] for line in f]
+    assert requested == [2, 3]
+
+    respond_to_batch(requests_path, results_path, oracle=True)
+    assert import_batch(results_path, NAMESPACE) == {problem_path: 5}
+    with pytest.raises(ValueError):
+        import_batch(results_path, "gpt-one_shot")
+
+    assert read_output(problem_path, NAMESPACE, "prompt_0_0.txt") == "kept"
+    assert read_output(problem_path, NAMESPACE, "prompt_0_2.txt") == "0"
+    assert read_output(problem_path, NAMESPACE, "prompt_1_0.txt") == "1"
+    assert read_output(problem_path, None, "prompt_0_1.txt") == "stale"
@@ -0,0 +1,12 @@
+from gen import split_parallel
+
+
+def test_split_parallel_never_runs_more_than_parallel_solutions():
+    assert split_parallel(8, 1) == (1, 8)
+    assert split_parallel(8, 3) == (3, 2)
+    assert split_parallel(4, 10) == (4, 1)
+    assert split_parallel(1, 0) == (1, 1)
+    for parallel in range(1, 10):
+        for count in range(1, 10):
+            problems_at_once, solutions_at_once = split_parallel(parallel, count)
+            assert problems_at_once * solutions_at_once <= parallel
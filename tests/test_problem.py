@@ -0,0 +1,44 @@
+import os
+import random
+import shutil
+import subprocess
+import pytest
+from bench import generate_bench_tasks
+from problem import Problem
+
+
+# the solution of a synthetic task of bench.py answering all tests in a single run, compiled without cmake
+@pytest.fixture
+def batch_problem(tmp_path) -> Problem:
+    if shutil.which("g++") is None:
+        pytest.skip("g++ is not installed")
+    generate_bench_tasks(str(tmp_path / "bench-tasks"), 1, 0, 0, batch_protocol=True)
+    problem = Problem(str(tmp_path / "bench-tasks" / "bench-0"))
+    exec_path = os.path.join(problem.id, problem.solution_exec_path)
+    os.makedirs(os.path.dirname(exec_path))
+    subprocess.run(
+        [
+            "g++",
+            "-std=c++20",
+            "-o",
+            exec_path,
+            os.path.join(problem.id, Problem.SOLUTION_SOURCE),
+        ],
+        check=True,
+    )
+    return problem
+
+
+def test_batch_protocol_answers_like_one_run_per_test(batch_problem):
+    rng = random.Random(1)
+    tests = ["0\n", "3\n1 2 3", "2\n-5 7\n\n", f"1\n{10**17}\n"] + [
+        f"{size}\n" + " ".join(str(rng.randint(-1000, 1000)) for _ in range(size))
+        for size in range(1, 50)
+    ]
+    assert batch_problem.supports_batch_protocol()
+
+    batch = batch_problem.generate_solutions_batch(tests)
+    single = [batch_problem.generate_solution(test) for test in tests]
+    assert batch == [output.rstrip("\n") for output in single]
+    assert batch_problem.generate_solutions(tests) == batch
+    assert [Problem.clean_output(output) for output in batch][:4] == [0, 6, 2, 10**17]
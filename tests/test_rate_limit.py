@@ -0,0 +1,17 @@
+from rate_limit import AdaptiveConcurrency
+
+
+def test_failed_requests_neither_grow_the_limit_nor_reset_the_backoff():
+    concurrency = AdaptiveConcurrency(8, initial_backoff=0.0)
+    concurrency.release(concurrency.acquire(), rate_limited=True, failed=True)
+    assert concurrency.consecutive_rate_limits == 1
+    limit = concurrency.limit
+
+    concurrency.release(concurrency.acquire(), failed=True)
+    assert concurrency.limit == limit
+    assert concurrency.consecutive_rate_limits == 1
+    assert concurrency.in_flight == 0
+
+    concurrency.release(concurrency.acquire())
+    assert concurrency.limit > limit
+    assert concurrency.consecutive_rate_limits == 0
@@ -0,0 +1,37 @@
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from sandbox import ResourceLimits, run_limited
+
+
+def test_limits_apply_to_programs_run_from_threads():
+    allocate = [sys.executable, "-c", "bytearray(1024 * 1024 * 1024)"]
+    spin = ["/bin/sh", "-c", "while :; do :; done"]
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        allocations = list(
+            executor.map(
+                lambda _: run_limited(
+                    allocate, limits=ResourceLimits(memory=256 * 1024 * 1024)
+                ),
+                range(4),
+            )
+        )
+        spun = executor.submit(
+            run_limited, spin, limits=ResourceLimits(timeout=20, cpu_time=1)
+        ).result()
+    for process, _ in allocations:
+        assert process.returncode != 0
+        assert "MemoryError" in process.stderr
+    process, usage = spun
+    assert process.returncode < 0
+    assert not usage.timed_out
+    assert usage.cpu_time > 0.5
+
+
+def test_input_and_arguments_reach_the_program():
+    process, _ = run_limited(
+        ["/bin/sh", "-c", 'echo "$1"; cat', "sh", "a b"],
+        "input",
+        limits=ResourceLimits(cpu_time=5, memory=512 * 1024 * 1024),
+    )
+    assert process.returncode == 0
+    assert process.stdout == "a b\ninput"
@@ -0,0 +1,36 @@
+import numpy as np
+from scoring import ScoreArrays, majority_vote, report, score
+
+
+def test_majority_vote_without_answers():
+    arrays = ScoreArrays.from_columns(
+        ["p", "p", "p", "q"],
+        ["0", "0", "1", "0"],
+        [None, None, None, None],
+        [1, 1, 2, 3],
+    )
+    assert not majority_vote(arrays).any()
+    assert len(majority_vote(arrays)) == len(arrays.expected)
+
+
+def test_majority_vote_with_unanswered_tests():
+    arrays = ScoreArrays.from_columns(
+        ["p", "p", "p", "p", "p"],
+        ["0", "0", "0", "1", "1"],
+        [1, 1, 2, None, None],
+        [1, 1, 1, 2, 2],
+    )
+    np.testing.assert_array_equal(majority_vote(arrays), [True, False])
+
+
+def test_score_without_answers():
+    arrays = ScoreArrays.from_columns(["p", "p"], ["0", "1"], [None, None], [1, 2])
+    assert score(arrays, {}, [1]) is not None
+
+
+def test_report_of_undefined_pass_at_k():
+    arrays = ScoreArrays.from_columns(["p", "p"], ["0", "1"], [1, 2], [1, 1])
+    scores = score(arrays, {}, [1, 3])
+    assert "PASS@3: -" in report(scores, [1, 3])
+    assert "PASS@1: 0.500" in report(scores, [1, 3])
+    assert score(arrays)["problems"].keys() == scores["problems"].keys()
@@ -0,0 +1,47 @@
+import os
+from print_results import print_results_for_problem
+from problem import Problem
+from shard import Shard, ShardedStore, problem_key
+from util import FileStore
+
+
+def write_problem(problem_path: str, tests: int, completions: int) -> None:
+    for key in ["in", "solution-in", "out", "prompt_in", "model_out"]:
+        os.makedirs(os.path.join(problem_path, Problem.dirs[key]))
+    for test in range(tests):
+        files = {
+            os.path.join(Problem.dirs["in"], f"{test}.in"): f"input {test}",
+            os.path.join(Problem.dirs["solution-in"], f"{test}.in"): f"{test}",
+            os.path.join(Problem.dirs["out"], f"{test}.out"): f"{test}",
+            os.path.join(
+                Problem.dirs["prompt_in"], f"prompt_{test}.txt"
+            ): f"prompt {test}",
+        }
+        for completion in range(completions):
+            files[
+                os.path.join(
+                    Problem.dirs["model_out"], f"prompt_{test}_{completion}.txt"
+                )
+            ] = f"answer {test}"
+        for path, content in files.items():
+            with open(os.path.join(problem_path, path), "w") as f:
+                f.write(content)
+
+
+def test_print_results_of_prompt_shards(tmp_path, capsys):
+    problem_path = str(tmp_path / "problem")
+    write_problem(problem_path, tests=8, completions=2)
+
+    printed = 0
+    for index in range(3):
+        shard = Shard(index, 3)
+        store = ShardedStore(FileStore(), shard, problem_path)
+        print_results_for_problem(problem_path, store=store)
+        output = capsys.readouterr().out
+        for test in range(8):
+            if shard.contains(f"{problem_key(problem_path)}/{test}"):
+                assert output.count(f"input {test}\n") == 2
+                printed += 1
+            else:
+                assert f"input {test}\n" not in output
+    assert printed == 8
@@ -0,0 +1,11 @@
+from telemetry import percentile
+
+
+def test_percentile_is_the_nearest_rank():
+    assert percentile(list(range(1, 11)), 0.50) == 5
+    assert percentile(list(range(1, 21)), 0.95) == 19
+    assert percentile(list(range(1, 21)), 0.99) == 20
+    assert percentile([1.0, 2.0, 3.0], 0.50) == 2.0
+    assert percentile(list(range(1, 31)), 0.10) == 3
+    assert percentile([7.0], 0.0) == 7.0
+    assert percentile([], 0.5) == 0.0
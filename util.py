@@ -1,5 +1,41 @@
 import os
-from typing import Callable, List
+import re
+import asyncio
+from typing import Awaitable, Callable, List
+
+
+# Storage of problem files, addressed by paths. The default implementation uses plain directories,
+# archive.PackedStore keeps them in a single record file.
+class FileStore:
+    # names of the files (not directories) in the directory, hidden files (temporary files of write) are skipped
+    def listdir(self, directory: str) -> List[str]:
+        return [
+            filename
+            for filename in os.listdir(directory)
+            if not filename.startswith(".")
+            and not os.path.isdir(os.path.join(directory, filename))
+        ]
+
+    def exists(self, path: str) -> bool:
+        return os.path.exists(path)
+
+    def makedirs(self, directory: str) -> None:
+        os.makedirs(directory, exist_ok=True)
+
+    def read(self, path: str) -> str:
+        with open(path, "r") as f:
+            return f.read()
+
+    # the file is replaced atomically, a crash never leaves it partially written
+    def write(self, path: str, content: str) -> None:
+        directory, filename = os.path.split(path)
+        temporary_path = os.path.join(directory, f".{filename}.tmp")
+        with open(temporary_path, "w") as f:
+            f.write(content)
+        os.replace(temporary_path, path)
+
+    def close(self) -> None:
+        pass
 
 
 # iterates over files in input_dir.
@@ -11,20 +47,47 @@ def process_files(
     output_dir: str,
     modify_content: Callable[[str], List[str]],
     modify_filename: Callable[[str], List[str]],
+    store: FileStore | None = None,
 ) -> None:
+    store = store or FileStore()
 
-    os.makedirs(output_dir, exist_ok=True)
+    store.makedirs(output_dir)
 
-    for filename in os.listdir(input_dir):
-        input_file_path = os.path.join(input_dir, filename)
+    for filename in store.listdir(input_dir):
+        content = store.read(os.path.join(input_dir, filename))
 
-        if os.path.isdir(input_file_path):
-            continue
+        modified_content_list = modify_content(content)
+        modified_filename_list = modify_filename(filename)
 
-        with open(input_file_path, "r") as f:
-            content = f.read()
+        assert len(modified_content_list) == len(modified_filename_list)
 
-        modified_content_list = modify_content(content)
+        for modified_filename, modified_content in zip(
+            modified_filename_list, modified_content_list
+        ):
+            output_file_path = os.path.join(output_dir, modified_filename)
+            store.write(output_file_path, modified_content)
+
+
+# like process_files, but calls modify_contents once with the contents of all files in input_dir,
+# which returns the list of modified contents for each file
+def process_files_batch(
+    input_dir: str,
+    output_dir: str,
+    modify_contents: Callable[[List[str]], List[List[str]]],
+    modify_filename: Callable[[str], List[str]],
+    store: FileStore | None = None,
+) -> None:
+    store = store or FileStore()
+
+    store.makedirs(output_dir)
+
+    filenames = store.listdir(input_dir)
+    contents = [store.read(os.path.join(input_dir, filename)) for filename in filenames]
+
+    modified_contents = modify_contents(contents)
+    assert len(modified_contents) == len(filenames)
+
+    for filename, modified_content_list in zip(filenames, modified_contents):
         modified_filename_list = modify_filename(filename)
 
         assert len(modified_content_list) == len(modified_filename_list)
@@ -33,8 +96,51 @@ def process_files(
             modified_filename_list, modified_content_list
         ):
             output_file_path = os.path.join(output_dir, modified_filename)
-            with open(output_file_path, "w") as f:
-                f.write(modified_content)
+            store.write(output_file_path, modified_content)
+
+
+# asynchronous version of process_files.
+# modify_content is a coroutine function, all files in input_dir are processed concurrently
+async def async_process_files(
+    input_dir: str,
+    output_dir: str,
+    modify_content: Callable[[str], Awaitable[List[str]]],
+    modify_filename: Callable[[str], List[str]],
+    store: FileStore | None = None,
+) -> None:
+    store = store or FileStore()
+
+    store.makedirs(output_dir)
+
+    async def process_file(filename: str) -> None:
+        content = store.read(os.path.join(input_dir, filename))
+
+        modified_content_list = await modify_content(content)
+        modified_filename_list = modify_filename(filename)
+
+        assert len(modified_content_list) == len(modified_filename_list)
+
+        for modified_filename, modified_content in zip(
+            modified_filename_list, modified_content_list
+        ):
+            output_file_path = os.path.join(output_dir, modified_filename)
+            store.write(output_file_path, modified_content)
+
+    await asyncio.gather(
+        *(process_file(filename) for filename in store.listdir(input_dir))
+    )
+
+
+# returns the names of the model output files for the completions of the prompt file
+# for example prompt_1.txt, num_tests = 2 -> [prompt_1_0.txt, prompt_1_1.txt]
+def create_additional_files(filename: str, num_tests: int) -> List[str]:
+    name, ext = os.path.splitext(filename)
+    return [f"{name}_{i}{ext}" for i in range(num_tests)]
+
+
+# key sorting names with numbers in numeric order, e.g. prompt_2_1.txt < prompt_10_0.txt
+def natural_sort_key(name: str) -> List[int | str]:
+    return [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", name)]
 
 
 # makes an array, which has the original elements repeated `num_tests` times.